@@ -8,23 +8,60 @@ bl_info = {
     "category": "Add Mesh",
 }
 
-import bpy
-from . import properties
-from . import ui
-from . import operators
-from . import operators_presets
-from . import operators_wind
-from . import presets
+try:
+    import bpy
+except ImportError:
+    # Imported outside Blender: only the bpy free modules (generator, gltf,
+    # utils, ...) are usable, there is nothing to register
+    bpy = None
+
+if bpy is not None:
+    from . import properties
+    from . import ui
+    from . import operators
+    from . import operators_presets
+    from . import operators_wind
+    from . import operators_forest
+    from . import operators_export
+    from . import operators_subtree
+    from . import presets
+    from . import textures
+    from . import mesh_registry
+    from . import tree_registry
+    from . import prefetch
+    from . import leaf_layer
+    from . import subtree
+    from . import batch
 
 def register():
     properties.register()
     operators.register()
     operators_presets.register()
     operators_wind.register()
+    operators_forest.register()
+    operators_export.register()
+    operators_subtree.register()
+    textures.register()
+    mesh_registry.register()
+    tree_registry.register()
+    prefetch.register()
+    leaf_layer.register()
+    subtree.register()
+    batch.register()
     ui.register()
 
 def unregister():
     ui.unregister()
+    batch.unregister()
+    subtree.unregister()
+    leaf_layer.unregister()
+    prefetch.unregister()
+    tree_registry.unregister()
+    mesh_registry.unregister()
+    textures.unregister()
+    operators_subtree.unregister()
+    operators_export.unregister()
+    operators_forest.unregister()
     operators_wind.unregister()
     operators_presets.unregister()
     operators.unregister()
@@ -0,0 +1,180 @@
+import bpy
+from bpy.app.handlers import persistent
+from .generator import TreeGenerator
+from .utils import props_to_options
+from . import mesh_registry
+from . import tree_registry
+
+# Batch edit: a change made to the active tree is copied to every selected
+# tree. Update callbacks do not say which property changed, so the active
+# props are compared against a snapshot taken before the edit, see track.
+_snapshot = {"object": None, "values": {}}
+
+
+def snapshot(group, prefix=""):
+    """Flat {"bark.tint": value, ...} copy of a PropertyGroup and its sub-groups."""
+    values = {}
+    for name in group.bl_rna.properties.keys():
+        if name in {"rna_type", "name"}:
+            continue
+        val = getattr(group, name)
+        if hasattr(val, "bl_rna"):
+            values.update(snapshot(val, f"{prefix}{name}."))
+        elif hasattr(val, "__len__") and not isinstance(val, str):
+            values[prefix + name] = tuple(val)
+        else:
+            values[prefix + name] = val
+    return values
+
+
+def _set_path(group, path, value):
+    *groups, name = path.split(".")
+    for g in groups:
+        group = getattr(group, g)
+    try:
+        setattr(group, name, value)
+    except (AttributeError, TypeError):
+        pass
+
+
+def track(obj):
+    """Remember the props of obj as the baseline for its next edit."""
+    if obj is None or _snapshot["object"] != obj.name:
+        _snapshot["object"] = obj.name if obj else None
+        _snapshot["values"] = snapshot(obj.eztree_props) if obj else {}
+
+
+@persistent
+def _on_depsgraph_update_post(scene, depsgraph=None):
+    # Selection changes update the depsgraph: take the baseline of a newly
+    # active tree before it is edited. Unchanged trees are not snapshot again
+    view_layer = getattr(bpy.context, "view_layer", None)
+    if view_layer and getattr(scene, "eztree_batch_edit", False):
+        track(tree_registry.get_branch(view_layer.objects.active))
+
+
+@persistent
+def _on_load_post(*args):
+    track(None)
+
+
+def selected_trees(context):
+    """Branch objects of the selected trees, a selected leaf counts for its tree."""
+    trees = []
+    for obj in context.selected_objects:
+        branch_obj = tree_registry.get_branch(obj)
+        if branch_obj and branch_obj not in trees:
+            trees.append(branch_obj)
+    return trees
+
+
+def update_trees(objects):
+    """Regenerate objects, each distinct geometry is generated once.
+
+    Trees with identical settings share one generator, trees whose geometry
+    is already in the mesh registry are not generated at all.
+    """
+    from .operators import update_existing_tree
+
+    jobs = {}
+    keys = {}
+    for obj in objects:
+        options = props_to_options(obj.eztree_props)
+        if obj.type == 'CURVE':
+            # Curve trees are never in the mesh registry
+            key = ('CURVES', mesh_registry.geometry_key(options))
+            if key not in jobs:
+                jobs[key] = (options, 'CURVES')
+        else:
+            key = mesh_registry.geometry_key(options)
+            if key not in jobs and not mesh_registry.lookup(key)[0]:
+                jobs[key] = (options, 'MESH')
+        keys[obj.name] = key
+
+    # In turn: generation is pure Python, threads would only share the GIL
+    generators = {}
+    for key, (options, mode) in jobs.items():
+        generators[key] = TreeGenerator(options, mode=mode)
+        generators[key].generate()
+
+    for obj in objects:
+        update_existing_tree(obj, generators.get(keys[obj.name]))
+
+
+def propagate(context, active, geometry=True, bark=True, leaves=True):
+    """Copy the props edited on the active tree to the selected trees and update them."""
+    from .operators import update_existing_materials
+
+    scene = context.scene
+    if _snapshot["object"] != active.name:
+        # No baseline for this object, nothing to diff against yet
+        track(active)
+        targets = []
+        changed = {}
+        if any(obj != active for obj in selected_trees(context)):
+            _report(context, f"Only {active.name} was changed, the selected trees follow from the next edit")
+    else:
+        current = snapshot(active.eztree_props)
+        changed = {path: val for path, val in current.items()
+                   if _snapshot["values"].get(path) != val}
+        targets = [obj for obj in selected_trees(context) if obj != active]
+
+    if changed and targets:
+        scene.eztree_loading_preset = True
+        try:
+            for obj in targets:
+                for path, val in changed.items():
+                    _set_path(obj.eztree_props, path, val)
+        finally:
+            scene.eztree_loading_preset = False
+
+    if geometry:
+        update_trees([active] + targets)
+    else:
+        # Materials are shared by name, one update covers every tree
+        update_existing_materials(active, bark=bark, leaves=leaves)
+
+    _snapshot["values"] = snapshot(active.eztree_props)
+
+
+def _report(context, message):
+    # Called from property updates, there is no operator to report through
+    def draw(menu, _context):
+        menu.layout.label(text=message)
+    context.window_manager.popup_menu(draw, title="Batch Edit", icon='ERROR')
+
+
+def apply_preset(context, json_data):
+    """Write a preset to every selected tree, then regenerate them as one batch."""
+    from .presets import write_preset
+    from .operators import update_existing_materials
+
+    trees = selected_trees(context)
+    scene = context.scene
+    scene.eztree_loading_preset = True
+    try:
+        for obj in trees:
+            write_preset(obj.eztree_props, json_data)
+    finally:
+        scene.eztree_loading_preset = False
+
+    update_trees(trees)
+    if trees:
+        update_existing_materials(trees[0])
+    track(None)
+    return len(trees)
+
+
+def register():
+    if _on_depsgraph_update_post not in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.append(_on_depsgraph_update_post)
+    if _on_load_post not in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.append(_on_load_post)
+
+
+def unregister():
+    if _on_depsgraph_update_post in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(_on_depsgraph_update_post)
+    if _on_load_post in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(_on_load_post)
+    track(None)
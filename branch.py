@@ -1,6 +1,10 @@
 from mathutils import Vector, Euler
 
 class Branch:
+    # Thousands wait in the generator's queue: no per-instance __dict__
+    __slots__ = ("origin", "orientation", "length", "radius", "level",
+                 "sectionCount", "segmentCount", "seed", "path", "chain")
+
     def __init__(
         self,
         origin=None,
@@ -10,11 +14,24 @@ class Branch:
         level=0,
         sectionCount=0,
         segmentCount=0,
+        seed=None,
+        path="0",
+        chain=(),
     ):
-        self.origin = origin.copy() if origin else Vector((0, 0, 0))
-        self.orientation = orientation.copy() if orientation else Euler((0, 0, 0))
+        # Kept as passed, not copied: the generator hands over vectors it no
+        # longer changes, and copies them before growing the branch
+        self.origin = origin if origin is not None else Vector((0, 0, 0))
+        self.orientation = orientation if orientation is not None else Euler((0, 0, 0))
         self.length = length
         self.radius = radius
         self.level = level
         self.sectionCount = sectionCount
         self.segmentCount = segmentCount
+        # Derived from the parent's seed, None uses the tree seed
+        self.seed = seed
+        # Position in the tree: "0" is the trunk, a child adds ".<section>"
+        # to its parent's path and a deciduous tip ".t"
+        self.path = path
+        # (pivot, bend weight where this branch grows from it) per ancestor,
+        # trunk first, so the wind carries the parent's sway down to the child
+        self.chain = chain
@@ -14,7 +14,7 @@ def build():
     #   ...
     
     # Files/Dirs to ignore
-    ignore_patterns = shutil.ignore_patterns("__pycache__", "*.pyc", ".git", ".gitignore", "build.py", "*.zip", ".vscode", ".idea")
+    ignore_patterns = shutil.ignore_patterns("__pycache__", "*.pyc", ".git", ".gitignore", "build.py", "benchmark.py", "*.zip", ".vscode", ".idea")
     
     # Create a temp directory for staging
     build_dir = os.path.join(base_dir, "build_temp")
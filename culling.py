@@ -0,0 +1,108 @@
+"""Removal of leaves hidden inside the crown.
+
+Each leaf casts rays from its center in a fixed set of directions against a
+BVH of all branch and leaf faces. The share of rays that leave the tree is
+its visibility, leaves below the threshold are removed from the buffers.
+
+The BVH comes from mathutils.bvhtree, which the standalone mathutils package
+does not have: there culling is skipped.
+"""
+import math
+from mathutils import Vector
+from .enums import Billboard
+from .generator import VERTEX_BUFFERS
+
+# Own faces passed through before a hit counts
+MAX_SKIPS = 4
+EPSILON = 1e-4
+
+
+def sample_directions(count):
+    """count directions spread evenly over the sphere (Fibonacci lattice)."""
+    golden = math.pi * (3.0 - math.sqrt(5.0))
+    directions = []
+    for i in range(count):
+        y = 1.0 - 2.0 * (i + 0.5) / count
+        r = math.sqrt(max(0.0, 1.0 - y * y))
+        directions.append(Vector((math.cos(golden * i) * r, y, math.sin(golden * i) * r)))
+    return directions
+
+
+def _faces(verts, indices):
+    points = [Vector(verts[p:p + 3]) for p in range(0, len(verts), 3)]
+    polygons = [tuple(indices[f:f + 4]) for f in range(0, len(indices), 4)]
+    return points, polygons
+
+
+def leaf_visibility(generator, samples):
+    """Share of sample directions in which each leaf sees out of the tree."""
+    from mathutils.bvhtree import BVHTree
+
+    quads = 2 if generator.options.leaves.billboard == Billboard.Double else 1
+    leaf_verts = quads * 4
+    leaf_count = len(generator.leaves_verts) // 3 // leaf_verts
+    if not leaf_count:
+        return []
+
+    branch_points, branch_polygons = _faces(generator.branches_verts,
+                                            [i - generator.branches_offset for i in generator.branches_indices])
+    leaf_points, leaf_polygons = _faces(generator.leaves_verts,
+                                        [i - generator.leaves_offset for i in generator.leaves_indices])
+    base = len(branch_points)
+    bvh = BVHTree.FromPolygons(branch_points + leaf_points,
+                               branch_polygons + [tuple(i + base for i in face) for face in leaf_polygons])
+
+    directions = sample_directions(samples)
+    first_leaf_face = len(branch_polygons)
+    visibility = []
+    for k in range(leaf_count):
+        corners = leaf_points[k * leaf_verts:k * leaf_verts + 4]
+        center = sum(corners, Vector()) / 4
+        own = range(first_leaf_face + k * quads, first_leaf_face + (k + 1) * quads)
+        open_rays = 0
+        for direction in directions:
+            origin = center
+            for _ in range(MAX_SKIPS):
+                location, _normal, index, _distance = bvh.ray_cast(origin, direction)
+                if index is None:
+                    open_rays += 1
+                    break
+                if index not in own:
+                    break
+                # The leaf itself, carry on past it
+                origin = location + direction * EPSILON
+        visibility.append(open_rays / len(directions))
+    return visibility
+
+
+def cull_hidden_leaves(generator, samples=16, threshold=0.1):
+    """Remove the leaves whose visibility is under threshold, returns how many."""
+    try:
+        visibility = leaf_visibility(generator, samples)
+    except ImportError:
+        # Standalone mathutils, no BVH to cast against
+        return 0
+    if not visibility:
+        return 0
+    kept = [k for k, v in enumerate(visibility) if v >= threshold]
+    culled = len(visibility) - len(kept)
+    if not culled:
+        return 0
+
+    leaf_verts = len(generator.leaves_verts) // 3 // len(visibility)
+    for name, size in VERTEX_BUFFERS:
+        values = getattr(generator, f"leaves_{name}")
+        span = leaf_verts * size
+        setattr(generator, f"leaves_{name}",
+                [v for k in kept for v in values[k * span:(k + 1) * span]])
+
+    # Leaves are contiguous: leaf n of the kept ones starts at vertex n * leaf_verts
+    quads = leaf_verts // 4
+    indices = []
+    for n in range(len(kept)):
+        start = generator.leaves_offset + n * leaf_verts
+        for q in range(quads):
+            idx = start + q * 4
+            indices.extend((idx, idx + 1, idx + 2, idx + 3))
+    generator.leaves_indices = indices
+    return culled
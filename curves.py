@@ -0,0 +1,305 @@
+import bpy
+from array import array
+from math import radians
+from .mesh import write_attributes, UV_MAP
+from .wind import new_socket, set_modifier_input, attribute_output
+from . import tree_registry
+
+# 'CURVES' output: the branch object is a curve with one poly spline per
+# branch, swept into tubes by a Geometry Nodes modifier, and the leaf object
+# is a point cloud mesh the leaf card is instanced on. Python only computes
+# points, the tube resolution is a modifier input.
+CURVE_MODIFIER = "EZTree_CurveToMesh"
+LEAF_MODIFIER = "EZTree_LeafInstances"
+CURVE_GROUP_NAME = "EZTree_CurveToMesh_NodeGroup"
+LEAF_GROUP_NAME = "EZTree_LeafInstances_NodeGroup"
+# Bump when a node setup changes, existing groups are rebuilt on next use
+CURVES_GROUP_VERSION = 3
+
+
+def _ensure_group(name, build):
+    ng = bpy.data.node_groups.get(name)
+    if ng and ng.get("eztree_version") == CURVES_GROUP_VERSION:
+        return ng
+    if ng:
+        bpy.data.node_groups.remove(ng)
+    ng = bpy.data.node_groups.new(name=name, type='GeometryNodeTree')
+    build(ng)
+    ng["eztree_version"] = CURVES_GROUP_VERSION
+    return ng
+
+
+def _build_curve_nodes(ng):
+    new_socket(ng, "Geometry", 'INPUT', 'NodeSocketGeometry')
+    resolution = new_socket(ng, "Resolution", 'INPUT', 'NodeSocketInt')
+    resolution.default_value = 8
+    resolution.min_value = 3
+    new_socket(ng, "Fill Caps", 'INPUT', 'NodeSocketBool')
+    smooth_input = new_socket(ng, "Smooth", 'INPUT', 'NodeSocketBool')
+    smooth_input.default_value = True
+    new_socket(ng, "Geometry", 'OUTPUT', 'NodeSocketGeometry')
+
+    nodes = ng.nodes
+    links = ng.links
+    group_in = nodes.new('NodeGroupInput')
+    group_in.location = (-600, 0)
+    group_out = nodes.new('NodeGroupOutput')
+    group_out.location = (1400, 0)
+
+    # Unit circle, Curve to Mesh scales it by the point radius and turns it by the tilt
+    profile = nodes.new('GeometryNodeCurvePrimitiveCircle')
+    profile.location = (-300, -200)
+    profile.inputs['Radius'].default_value = 1.0
+    links.new(group_in.outputs[1], profile.inputs['Resolution'])
+
+    sweep = nodes.new('GeometryNodeCurveToMesh')
+    sweep.location = (0, 0)
+    links.new(group_in.outputs[0], sweep.inputs['Curve'])
+    links.new(profile.outputs['Curve'], sweep.inputs['Profile Curve'])
+    if 'Fill Caps' in sweep.inputs:
+        links.new(group_in.outputs[2], sweep.inputs['Fill Caps'])
+
+    smooth = nodes.new('GeometryNodeSetShadeSmooth')
+    smooth.location = (200, 0)
+    links.new(sweep.outputs['Mesh'], smooth.inputs['Geometry'])
+    # Off for bark flatShading
+    links.new(group_in.outputs[3], smooth.inputs['Shade Smooth'])
+    try:
+        uvs = _store_uvs(ng, group_in.outputs[0], profile.outputs['Curve'], sweep, smooth.outputs['Geometry'])
+    except (RuntimeError, TypeError):
+        # Writing UV maps from Geometry Nodes needs Blender 3.5
+        uvs = smooth.outputs['Geometry']
+    links.new(uvs, group_out.inputs[0])
+
+
+def _capture(ng, geometry, value, location):
+    # Capture Attribute of one float, (geometry, attribute) outputs
+    node = ng.nodes.new('GeometryNodeCaptureAttribute')
+    node.location = location
+    if hasattr(node, "capture_items"):
+        # Blender 4.2+
+        node.capture_items.new('FLOAT', "Value")
+        value_in, value_out = node.inputs[1], node.outputs[1]
+    else:
+        node.data_type = 'FLOAT'
+        value_in = next(s for s in node.inputs if s.enabled and s.name == "Value")
+        value_out = attribute_output(node)
+    ng.links.new(geometry, node.inputs['Geometry'])
+    ng.links.new(value, value_in)
+    return node.outputs['Geometry'], value_out
+
+
+def _store_uvs(ng, curve, profile, sweep, mesh):
+    """Store the UV_MAP corner attribute on the swept mesh, returns the geometry output.
+
+    Like the generated meshes U goes once around the branch, from the
+    profile factor, and V runs along it, here the length along the spline
+    in generator units (textureScaleY sets the density).
+    """
+    nodes = ng.nodes
+    links = ng.links
+
+    parameter = nodes.new('GeometryNodeSplineParameter')
+    parameter.location = (-500, 200)
+    curve, along = _capture(ng, curve, parameter.outputs['Length'], (-300, 200))
+    links.new(curve, sweep.inputs['Curve'])
+    profile_parameter = nodes.new('GeometryNodeSplineParameter')
+    profile_parameter.location = (-500, -350)
+    profile, around = _capture(ng, profile, profile_parameter.outputs['Factor'], (-200, -350))
+    links.new(profile, sweep.inputs['Profile Curve'])
+
+    # The profile is cyclic, the faces closing it run from 1 - 1 / resolution
+    # back to 0. Their corners below the face mean (about 0.5) get U + 1,
+    # other faces span 1 / resolution around their mean and are unchanged
+    face_mean = nodes.new('GeometryNodeFieldOnDomain')
+    face_mean.location = (400, -300)
+    face_mean.domain = 'FACE'
+    face_mean.data_type = 'FLOAT'
+    links.new(around, face_mean.inputs[0])
+
+    def math_node(operation, location):
+        node = nodes.new('ShaderNodeMath')
+        node.operation = operation
+        node.location = location
+        return node
+
+    threshold = math_node('SUBTRACT', (600, -300))
+    links.new(face_mean.outputs[0], threshold.inputs[0])
+    threshold.inputs[1].default_value = 0.25
+    wraps = math_node('LESS_THAN', (800, -250))
+    links.new(around, wraps.inputs[0])
+    links.new(threshold.outputs['Value'], wraps.inputs[1])
+    u = math_node('ADD', (1000, -200))
+    links.new(around, u.inputs[0])
+    links.new(wraps.outputs['Value'], u.inputs[1])
+
+    uv = nodes.new('ShaderNodeCombineXYZ')
+    uv.location = (1000, -450)
+    links.new(u.outputs['Value'], uv.inputs['X'])
+    links.new(along, uv.inputs['Y'])
+
+    store = nodes.new('GeometryNodeStoreNamedAttribute')
+    store.location = (1200, 0)
+    store.data_type = 'FLOAT2'
+    store.domain = 'CORNER'
+    store.inputs['Name'].default_value = UV_MAP
+    links.new(mesh, store.inputs['Geometry'])
+    links.new(uv.outputs['Vector'], next(s for s in store.inputs if s.enabled and s.name == "Value"))
+    return store.outputs['Geometry']
+
+
+def _build_leaf_nodes(ng):
+    new_socket(ng, "Geometry", 'INPUT', 'NodeSocketGeometry')
+    new_socket(ng, "Card", 'INPUT', 'NodeSocketObject')
+    new_socket(ng, "Geometry", 'OUTPUT', 'NodeSocketGeometry')
+
+    nodes = ng.nodes
+    links = ng.links
+    group_in = nodes.new('NodeGroupInput')
+    group_in.location = (-600, 0)
+    group_out = nodes.new('NodeGroupOutput')
+    group_out.location = (400, 0)
+
+    card = nodes.new('GeometryNodeObjectInfo')
+    card.location = (-300, -150)
+    links.new(group_in.outputs[1], card.inputs['Object'])
+
+    rotation = nodes.new('GeometryNodeInputNamedAttribute')
+    rotation.data_type = 'FLOAT_VECTOR'
+    rotation.inputs['Name'].default_value = "eztree_rotation"
+    rotation.location = (-300, -350)
+
+    scale = nodes.new('GeometryNodeInputNamedAttribute')
+    scale.data_type = 'FLOAT'
+    scale.inputs['Name'].default_value = "eztree_scale"
+    scale.location = (-300, -500)
+
+    instance = nodes.new('GeometryNodeInstanceOnPoints')
+    instance.location = (100, 0)
+    links.new(group_in.outputs[0], instance.inputs['Points'])
+    links.new(card.outputs['Geometry'], instance.inputs['Instance'])
+    links.new(attribute_output(rotation), instance.inputs['Rotation'])
+    links.new(attribute_output(scale), instance.inputs['Scale'])
+    links.new(instance.outputs['Instances'], group_out.inputs[0])
+
+
+def get_curve_node_group():
+    return _ensure_group(CURVE_GROUP_NAME, _build_curve_nodes)
+
+
+def get_leaf_node_group():
+    return _ensure_group(LEAF_GROUP_NAME, _build_leaf_nodes)
+
+
+def get_leaf_card(double, leaf_mat):
+    """Unit leaf quad (two crossed quads when double) the leaf points instance."""
+    name = "EZTree_LeafCard_Double" if double else "EZTree_LeafCard"
+    obj = bpy.data.objects.get(name)
+    if obj and obj.type == 'MESH':
+        mesh = obj.data
+    else:
+        mesh = bpy.data.meshes.new(name)
+        # Same corners as the generated leaf quads, at size 1
+        verts = [(-0.5, 1, 0), (-0.5, 0, 0), (0.5, 0, 0), (0.5, 1, 0)]
+        faces = [(0, 1, 2, 3)]
+        if double:
+            # Turned 90 degrees about Y
+            verts += [(0, 1, 0.5), (0, 0, 0.5), (0, 0, -0.5), (0, 1, -0.5)]
+            faces.append((4, 5, 6, 7))
+        mesh.from_pydata(verts, [], faces)
+        uv_layer = mesh.uv_layers.new(name=UV_MAP)
+        uv_layer.data.foreach_set("uv", (0, 1, 0, 0, 1, 0, 1, 1) * len(faces))
+        # Only reached through the modifier, which keeps it alive
+        obj = bpy.data.objects.new(name, mesh)
+
+    if not mesh.materials:
+        mesh.materials.append(leaf_mat)
+    elif mesh.materials[0] != leaf_mat:
+        mesh.materials[0] = leaf_mat
+    return obj
+
+
+def fill_curve(curve, generator):
+    """Replace the splines of curve with the skeleton of a 'CURVES' generator."""
+    curve.splines.clear()
+    for level, points, radii, tilts in generator.splines:
+        spline = curve.splines.new('POLY')
+        spline.points.add(len(radii) - 1)
+        # Poly points are xyzw
+        co = array('f', [1.0]) * (len(radii) * 4)
+        for i in range(len(radii)):
+            co[i * 4:i * 4 + 3] = array('f', points[i * 3:i * 3 + 3])
+        spline.points.foreach_set("co", co)
+        spline.points.foreach_set("radius", radii)
+        spline.points.foreach_set("tilt", tilts)
+    curve.update_tag()
+    return curve
+
+
+def fill_leaf_points(mesh, generator):
+    """Replace mesh with one loose vertex per leaf, carrying rotation and size."""
+    mesh.clear_geometry()
+    count = len(generator.leaf_scales)
+    mesh.vertices.add(count)
+    mesh.vertices.foreach_set("co", generator.leaf_points)
+    if count:
+        write_attributes(mesh, {
+            "eztree_rotation": ('FLOAT_VECTOR', "vector", generator.leaf_rotations),
+            "eztree_scale": ('FLOAT', "value", generator.leaf_scales),
+        })
+    mesh.update()
+    return mesh
+
+
+def _add_modifier(obj, name, node_group):
+    mod = obj.modifiers.get(name)
+    if not mod:
+        mod = obj.modifiers.new(name=name, type='NODES')
+    mod.node_group = node_group
+    return mod
+
+
+def setup_modifiers(branch_obj, leaf_obj, double, leaf_mat, resolution=None, smooth=True):
+    mod = _add_modifier(branch_obj, CURVE_MODIFIER, get_curve_node_group())
+    if resolution is not None:
+        set_modifier_input(mod, "Resolution", resolution)
+    set_modifier_input(mod, "Smooth", smooth)
+    if leaf_obj:
+        mod = _add_modifier(leaf_obj, LEAF_MODIFIER, get_leaf_node_group())
+        set_modifier_input(mod, "Card", get_leaf_card(double, leaf_mat))
+
+
+def create_curve_tree_objects(collection, generator, bark_mat, leaf_mat, double, resolution,
+                              location=(0, 0, 0)):
+    """Link a curve branch object and leaf point object for a 'CURVES' generator."""
+    curve = bpy.data.curves.new("EZTree_Branches", 'CURVE')
+    curve.dimensions = '3D'
+    fill_curve(curve, generator)
+    curve.materials.append(bark_mat)
+
+    leaf_mesh = fill_leaf_points(bpy.data.meshes.new("EZTree_LeafPoints"), generator)
+    leaf_mesh.materials.append(leaf_mat)
+
+    branch_obj = bpy.data.objects.new("TreeBranch", curve)
+    leaf_obj = bpy.data.objects.new("TreeLeaf", leaf_mesh)
+    collection.objects.link(branch_obj)
+    collection.objects.link(leaf_obj)
+
+    # Y-up (Generator) to Z-up (Blender), like the mesh output
+    branch_obj.location = location
+    branch_obj.rotation_euler = (radians(90), 0, 0)
+    leaf_obj.parent = branch_obj
+
+    setup_modifiers(branch_obj, leaf_obj, double, leaf_mat, resolution,
+                    smooth=not generator.options.bark.flatShading)
+    tree_registry.tag(branch_obj, leaf_obj)
+    return branch_obj, leaf_obj
+
+
+def update_curve_tree(branch_obj, leaf_obj, generator, double, leaf_mat):
+    """Refill the curve and leaf points of an existing 'CURVES' tree."""
+    fill_curve(branch_obj.data, generator)
+    if leaf_obj and leaf_obj.type == 'MESH':
+        fill_leaf_points(leaf_obj.data, generator)
+    setup_modifiers(branch_obj, leaf_obj, double, leaf_mat,
+                    smooth=not generator.options.bark.flatShading)
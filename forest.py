@@ -0,0 +1,188 @@
+import bpy
+import json
+import math
+from bisect import bisect_left
+from types import SimpleNamespace
+from mathutils import Vector
+from .generator import TreeGenerator
+from .mesh import create_tree_meshes
+from .operators import ensure_material, create_tree_objects
+from .rng import RNG
+from .presets import hex_to_rgb
+from .utils import options_to_json
+
+# Hidden collection holding one child collection per pool, each pool holds
+# one collection per variant. Only the variants own mesh data.
+POOL_COLLECTION = "EZTree_Pool"
+# Collection holding the placement empties that instance the variants
+FOREST_COLLECTION = "EZTree_Forest"
+
+
+def ensure_collection(name, parent):
+    col = bpy.data.collections.get(name)
+    if not col:
+        col = bpy.data.collections.new(name)
+    if col.name not in parent.children:
+        parent.children.link(col)
+    return col
+
+
+def _exclude_from_view_layer(context, col):
+    # Variants only render through the placements that instance them
+    def find(layer_col):
+        if layer_col.collection == col:
+            return layer_col
+        for child in layer_col.children:
+            found = find(child)
+            if found:
+                return found
+        return None
+
+    layer_col = find(context.view_layer.layer_collection)
+    if layer_col:
+        layer_col.exclude = True
+
+
+def clear_collection(col):
+    """Remove every object in col, together with mesh data nothing else uses."""
+    objects = list(col.objects)
+    meshes = {obj.data for obj in objects if obj.type == 'MESH'}
+    bpy.data.batch_remove(objects)
+    bpy.data.batch_remove([m for m in meshes if m.users == 0])
+
+
+def _material_props(options):
+    # ensure_material reads these attribute names from the bark/leaf props
+    bark = SimpleNamespace(textured=options.bark.textured,
+                           textureScaleX=options.bark.textureScale['x'],
+                           textureScaleY=options.bark.textureScale['y'])
+    leaves = SimpleNamespace(textured=True, alphaTest=options.leaves.alphaTest)
+    return bark, leaves
+
+
+def build_variant_pool(context, options, label, count):
+    """Generate count seeds of options into the pool named label.
+
+    Returns the variant collections. Existing variants of the same pool are
+    refilled, so placements that instance them stay valid.
+    """
+    root = ensure_collection(POOL_COLLECTION, context.scene.collection)
+    _exclude_from_view_layer(context, root)
+    pool = ensure_collection(f"{POOL_COLLECTION}_{label}", root)
+
+    # Each pool gets its own materials so pools of different presets can coexist
+    bark_props, leaf_props = _material_props(options)
+    bark_mat = ensure_material(f"EZTree_Bark_{label}", hex_to_rgb(options.bark.tint),
+                               type_name=options.bark.type.value,
+                               is_bark=True,
+                               props=bark_props)
+    leaf_mat = ensure_material(f"EZTree_Leaf_{label}", hex_to_rgb(options.leaves.tint),
+                               type_name=options.leaves.type.value,
+                               is_bark=False,
+                               props=leaf_props)
+
+    base_seed = options.seed
+    variants = []
+    for i in range(count):
+        col = ensure_collection(f"EZTree_{label}_{i}", pool)
+        clear_collection(col)
+
+        options.seed = base_seed + i
+        generator = TreeGenerator(options)
+        generator.generate()
+        branch_mesh, leaf_mesh = create_tree_meshes(generator)
+
+        branch_obj, leaf_obj = create_tree_objects(col, branch_mesh, leaf_mesh, bark_mat, leaf_mat)
+        branch_obj["eztree_variant"] = options.seed
+        # Lets exporters regenerate the variant without Blender meshes
+        branch_obj["eztree_options"] = json.dumps(options_to_json(options))
+        variants.append(col)
+    options.seed = base_seed
+
+    # Drop variants left over from a larger pool
+    for col in list(pool.children):
+        if col not in variants:
+            clear_collection(col)
+            bpy.data.collections.remove(col)
+
+    return variants
+
+
+def get_variants():
+    root = bpy.data.collections.get(POOL_COLLECTION)
+    if not root:
+        return []
+    return [col for pool in root.children for col in pool.children if col.objects]
+
+
+def sample_surface(context, surface, count, rng):
+    """Return count world space points spread uniformly by area over surface, and its area."""
+    depsgraph = context.evaluated_depsgraph_get()
+    eval_obj = surface.evaluated_get(depsgraph)
+    mesh = eval_obj.to_mesh()
+    try:
+        mesh.calc_loop_triangles()
+        matrix = surface.matrix_world
+        verts = [matrix @ v.co for v in mesh.vertices]
+
+        triangles = []
+        cumulative = []
+        total = 0.0
+        for tri in mesh.loop_triangles:
+            a, b, c = (verts[i] for i in tri.vertices)
+            area = (b - a).cross(c - a).length * 0.5
+            if area <= 0.0:
+                continue
+            total += area
+            triangles.append((a, b, c))
+            cumulative.append(total)
+
+        samples = []
+        if not triangles:
+            return samples, 0.0
+
+        for _ in range(count):
+            idx = bisect_left(cumulative, rng.random(total))
+            a, b, c = triangles[min(idx, len(triangles) - 1)]
+            # Uniform barycentric sample
+            r1 = math.sqrt(rng.random())
+            r2 = rng.random()
+            point = a * (1.0 - r1) + b * (r1 * (1.0 - r2)) + c * (r1 * r2)
+            samples.append(point)
+        return samples, total
+    finally:
+        eval_obj.to_mesh_clear()
+
+
+def scatter(context, settings):
+    """Replace the forest placements with fresh instances of the variant pool.
+
+    Returns the number of placements created.
+    """
+    variants = get_variants()
+    surface = settings.surface
+    if not variants or not surface:
+        return 0
+
+    forest = ensure_collection(FOREST_COLLECTION, context.scene.collection)
+    clear_collection(forest)
+
+    rng = RNG(settings.seed)
+    # Area is only known after evaluating the surface, sample the cap first
+    # and keep as many as the density asks for
+    samples, area = sample_surface(context, surface, settings.max_count, rng)
+    count = min(len(samples), int(area * settings.density))
+
+    scale_min = min(settings.scale_min, settings.scale_max)
+    scale_max = max(settings.scale_min, settings.scale_max)
+
+    for point in samples[:count]:
+        obj = bpy.data.objects.new("EZTree_Placement", None)
+        obj.instance_type = 'COLLECTION'
+        obj.instance_collection = variants[int(rng.random(len(variants))) % len(variants)]
+        obj.location = point
+        obj.rotation_euler = (0, 0, rng.random(2.0 * math.pi))
+        obj.scale = Vector((1, 1, 1)) * rng.random(scale_max, scale_min)
+        forest.objects.link(obj)
+
+    return count
@@ -1,39 +1,194 @@
-import bpy
-import bmesh
+import copy
 import math
+from collections import deque
 from mathutils import Vector, Euler, Quaternion, Matrix
 from .rng import RNG
 from .branch import Branch
 from .enums import BarkType, Billboard, LeafType, TreeType
 from .params import TreeOptions
+from . import kernels
+
+# Screen prunePixels is measured on: vertical field of view and height in pixels
+PRUNE_FOV = math.radians(40.0)
+PRUNE_SCREEN_HEIGHT = 1080
+
+
+def prune_size(branch_options):
+    """World size under which branches and leaves are skipped, 0 for none."""
+    size = branch_options.pruneSize
+    if branch_options.prunePixels > 0:
+        pixel = 2.0 * branch_options.pruneDistance * math.tan(PRUNE_FOV / 2) / PRUNE_SCREEN_HEIGHT
+        size = max(size, branch_options.prunePixels * pixel)
+    return size
+
+
+# Ancestor levels whose sway a vertex inherits: per level k, the pivot of
+# the level k ancestor and its bend weight where the vertex's chain leaves it
+CHAIN_LEVELS = 3
+CHAIN_BUFFERS = (tuple(f"pivots_{k}" for k in range(CHAIN_LEVELS))
+                 + tuple(f"weights_{k}" for k in range(CHAIN_LEVELS)))
+# Buffers of each part, emptied by every chunk of stream()
+BUFFERS = ("verts", "normals", "indices", "uvs", "levels", "along", "pivots", "stiffness") + CHAIN_BUFFERS
+# Per-vertex buffers and their values per vertex
+VERTEX_BUFFERS = ((("verts", 3), ("normals", 3), ("uvs", 2), ("levels", 1),
+                   ("along", 1), ("pivots", 3), ("stiffness", 1))
+                  + tuple((f"pivots_{k}", 3) for k in range(CHAIN_LEVELS))
+                  + tuple((f"weights_{k}", 1) for k in range(CHAIN_LEVELS)))
+
+
+def bend_weight(stiffness, along):
+    """How far a point sways with its own branch: none at the base, most at flexible tips."""
+    return (1.0 - stiffness) * along
+
+
+def queue_order(path):
+    """Sort key putting branch paths in the order generate() queues them.
+
+    The queue is breadth first: by depth, then by parent, then children by
+    section with the tip last.
+    """
+    steps = path.split(".")
+    return len(steps), [(1, 0) if step == "t" else (0, int(step)) for step in steps]
+
+
+class GeometryChunk:
+    """Part of a streamed tree, with the buffer attributes of a generator.
+
+    Indices are global: branches_offset and leaves_offset are the index of
+    the first vertex of each part in the whole tree.
+    """
+
+    def __init__(self, generator):
+        self.options = generator.options
+        self.branches_offset = generator.branches_offset
+        self.leaves_offset = generator.leaves_offset
+        for part in ("branches", "leaves"):
+            for name in BUFFERS:
+                setattr(self, f"{part}_{name}", getattr(generator, f"{part}_{name}"))
+
 
 class TreeGenerator:
-    def __init__(self, options: TreeOptions):
+    def __init__(self, options: TreeOptions, leaves=True, mode='MESH'):
         self.options = options
+        # 'MESH' fills the vertex buffers. 'CURVES' only records the skeleton
+        # (one spline per branch) and leaf placements, meshing is left to
+        # Geometry Nodes, see curves.py
+        self.mode = mode
+        self.splines = []
+        # With leaves=False generate() only records where leaves grow, the
+        # leaf buffers are filled later by generate_leaf_layer()
+        self.build_leaves = leaves
+        self.leaves_pending = False
+        self.leaf_sites = []
         self.rng = None
-        self.branch_queue = []
-        self.branches_verts = []
-        self.branches_normals = [] # Blender calculates normals, but we might want them custom? For now, let's rely on Blender's auto smooth or calc_normals.
-        self.branches_indices = []
-        self.branches_uvs = []
-        self.leaves_verts = []
-        self.leaves_normals = []
-        self.leaves_indices = []
-        self.leaves_uvs = []
-        
-    def generate(self):
-        # Reset geometry data
+        self.branch_queue = deque()
+        # Index of the first vertex in the buffers, only non-zero while streaming
+        self.branches_offset = 0
+        self.leaves_offset = 0
+        # Size-aware pruning, set up by grow()
+        self.prune_size = 0.0
+        self.pruned_branches = 0
+        self.pruned_leaves = 0
+        # Leaves removed by cull_hidden_leaves()
+        self.culled_leaves = 0
+        # MESH mode, by branch path (see Branch.path): the Branch as it was
+        # queued, and its [vertex start, vertex end, index start, index end]
+        # in the branch buffers followed by the same for its leaves
+        self.branch_records = {}
+        self.branch_ranges = {}
+        # Geometry is kept in flat buffers (xyz / uv triples and quad index
+        # quadruples) so it can be handed to Mesh.foreach_set without conversion.
         self.branches_verts = []
+        # Analytic unit normals per vertex (xyz), applied as custom normals
         self.branches_normals = []
         self.branches_indices = []
         self.branches_uvs = []
-        
         self.leaves_verts = []
         self.leaves_normals = []
         self.leaves_indices = []
         self.leaves_uvs = []
+        # Per-vertex wind attributes: branch level, normalized distance along
+        # the branch, branch pivot (xyz) and stiffness derived from radius
+        self.branches_levels = []
+        self.branches_along = []
+        self.branches_pivots = []
+        self.branches_stiffness = []
+        self.leaves_levels = []
+        self.leaves_along = []
+        self.leaves_pivots = []
+        self.leaves_stiffness = []
+        # Sway inherited from the ancestors, see CHAIN_LEVELS
+        for part in ("branches", "leaves"):
+            for name in CHAIN_BUFFERS:
+                setattr(self, f"{part}_{name}", [])
+        # Leaf placements in 'CURVES' mode: position, euler rotation, size
+        self.leaf_points = []
+        self.leaf_rotations = []
+        self.leaf_scales = []
+        # Kernel inputs of the branches and leaves whose vertices are only
+        # reserved in the buffers so far, see flush_kernels
+        self.pending_rings = []
+        self.pending_leaves = []
         
-        self.branch_queue = []
+    def generate(self, progress=None):
+        """Generate the tree into the flat buffers.
+
+        progress is called as progress(level, done, total) after each branch,
+        with done/total counting the branches of the level being generated.
+        Generation stops early if it returns False. Returns True when the
+        whole tree was generated.
+        """
+        for level, done, total in self.grow():
+            if progress and progress(level, done, total) is False:
+                return False
+        return True
+
+    def stream(self, chunk_vertices=65536):
+        """Generate the tree as GeometryChunks of about chunk_vertices vertices.
+
+        Buffers are handed over and emptied once they reach chunk_vertices,
+        so memory is bounded by the chunk size rather than the tree. Leaves
+        are always built, with the branch that carries them.
+        """
+        self.build_leaves = True
+        for _ in self.grow():
+            if (len(self.branches_verts) + len(self.leaves_verts)) // 3 >= chunk_vertices:
+                yield self.take_chunk()
+        if self.branches_verts or self.leaves_verts:
+            yield self.take_chunk()
+
+    def take_chunk(self):
+        self.flush_kernels()
+        chunk = GeometryChunk(self)
+        self.branches_offset += len(self.branches_verts) // 3
+        self.leaves_offset += len(self.leaves_verts) // 3
+        self.reset_branches()
+        self.reset_leaves()
+        # Ranges point into the buffers handed over
+        self.branch_records = {}
+        self.branch_ranges = {}
+        return chunk
+
+    def grow(self):
+        """Generate branch by branch, yielding (level, done, total) after each.
+
+        done/total count the branches of the level being generated.
+        """
+        self.branches_offset = 0
+        self.leaves_offset = 0
+        self.reset_branches()
+        self.reset_leaves()
+        self.prune_size = prune_size(self.options.branch)
+        self.pruned_branches = 0
+        self.pruned_leaves = 0
+        self.culled_leaves = 0
+        self.branch_records = {}
+        self.branch_ranges = {}
+        
+        self.branch_queue = deque()
+        self.splines = []
+        self.leaf_sites = []
+        self.leaves_pending = not self.build_leaves
 
         # Create the trunk
         trunk_seed = self.options.seed
@@ -46,24 +201,237 @@ class TreeGenerator:
             level=0,
             sectionCount=self.options.branch.sections[0],
             segmentCount=self.options.branch.segments[0],
+            seed=trunk_seed,
         )
-        trunk.seed = trunk_seed
         
         self.branch_queue.append(trunk)
 
+        # The queue is breadth first: once the first branch of a level is
+        # reached, every branch of that level is queued
+        level = -1
+        done = total = 0
         while len(self.branch_queue) > 0:
-            branch = self.branch_queue.pop(0)
+            branch = self.branch_queue.popleft()
+            if branch.level != level:
+                level = branch.level
+                done = 0
+                total = len(self.branch_queue) + 1
             self.generate_branch(branch) # seed is in branch.seed
+            done += 1
+            yield level, done, total
+        
+        self.flush_kernels()
+        if not self.leaves_pending:
+            self.cull_hidden_leaves()
+
+    def reset_branches(self):
+        self.branches_verts = []
+        self.branches_normals = []
+        self.branches_indices = []
+        self.branches_uvs = []
+        self.branches_levels = []
+        self.branches_along = []
+        self.branches_pivots = []
+        self.branches_stiffness = []
+        for name in CHAIN_BUFFERS:
+            setattr(self, f"branches_{name}", [])
+        self.pending_rings = []
+
+    def reset_leaves(self):
+        self.leaves_verts = []
+        self.leaves_normals = []
+        self.leaves_indices = []
+        self.leaves_uvs = []
+        self.leaves_levels = []
+        self.leaves_along = []
+        self.leaves_pivots = []
+        self.leaves_stiffness = []
+        for name in CHAIN_BUFFERS:
+            setattr(self, f"leaves_{name}", [])
+        self.leaf_points = []
+        self.leaf_rotations = []
+        self.leaf_scales = []
+        self.pending_leaves = []
+
+    def generate_leaf_layer(self):
+        """Build the leaves skipped by generate() from the recorded leaf sites.
+
+        The result is identical to generating with leaves=True.
+        """
+        self.reset_leaves()
+        self.pruned_leaves = 0
+        for site in self.leaf_sites:
+            self.generate_leaf_site(*site)
+        self.flush_kernels()
+        self.leaf_sites = []
+        self.leaves_pending = False
+        self.cull_hidden_leaves()
+
+    def cull_hidden_leaves(self):
+        """Remove leaves hidden inside the crown when leaves.cullHidden is set.
+
+        Needs the whole tree in the buffers: skipped in CURVES mode and once
+        stream() has handed over a chunk. Skipped as well without
+        mathutils.bvhtree, see culling.
+        """
+        self.culled_leaves = 0
+        leaves = self.options.leaves
+        if not leaves.cullHidden or self.mode != 'MESH' or self.branches_offset or self.leaves_offset:
+            return
+        from . import culling
+        self.culled_leaves = culling.cull_hidden_leaves(self, leaves.cullSamples, leaves.cullVisibility)
+        if self.culled_leaves:
+            # The leaf ranges no longer match the buffers
+            for ranges in self.branch_ranges.values():
+                ranges[4:] = (0, 0, 0, 0)
+
+    def generate_leaf_site(self, rng, branch, tip, sections):
+        vert_start = len(self.leaves_verts) // 3
+        index_start = len(self.leaves_indices)
+        # Tip leaf first, then the leaves along the branch, both from rng
+        if tip:
+            self.generate_leaf(tip[0], tip[1], rng, tip[2])
+        if sections:
+            self.generate_leaves(sections, rng, branch)
+        if branch.path in self.branch_ranges:
+            self.branch_ranges[branch.path][4:] = (vert_start, len(self.leaves_verts) // 3,
+                                                   index_start, len(self.leaves_indices))
+
+    def copy(self):
+        """A generator regenerate_subtree can change without touching this one.
+
+        The buffers and the record and range tables are copied, options and
+        the Branch objects are shared: they are replaced, never changed.
+        """
+        other = copy.copy(self)
+        for part in ("branches", "leaves"):
+            for name in BUFFERS:
+                setattr(other, f"{part}_{name}", list(getattr(self, f"{part}_{name}")))
+        other.branch_records = dict(self.branch_records)
+        other.branch_ranges = {path: list(ranges) for path, ranges in self.branch_ranges.items()}
+        other.branch_queue = deque()
+        other.pending_rings = list(self.pending_rings)
+        other.pending_leaves = list(self.pending_leaves)
+        other.leaf_sites = list(self.leaf_sites)
+        other.splines = list(self.splines)
+        return other
 
-        return self.create_mesh()
+    def regenerate_subtree(self, path):
+        """Regenerate the branch at path and all that grows from it, in place.
+
+        In place means on this generator: whoever else holds it (prefetch,
+        a batch of trees with the same settings) sees the change, splice
+        into a copy() of a generator that is not yours alone.
+
+        Seeds only pass from parent to child, so after a seed override (see
+        BranchOptions.seedOverrides) of path the rest of the tree is unchanged.
+        The buffers before path are kept as they are, from there on they are
+        rebuilt in queue order with the new subtree in place of the old one:
+        the layout, and so the face of each branch, is the one generate()
+        gives. Indices are only shifted where they moved.
+        Falls back to a full generate() when the buffers do not hold the
+        whole tree or hidden leaves are culled, returns False then.
+        The pruned counts stay those of the full generation.
+        """
+        if (self.mode != 'MESH' or self.leaves_pending or path not in self.branch_records
+                or self.branches_offset or self.leaves_offset or self.options.leaves.cullHidden):
+            self.generate()
+            return False
+
+        root = self.branch_records[path]
+        prefix = path + "."
+        old_ranges = self.branch_ranges
+        for p in [p for p in old_ranges if p == path or p.startswith(prefix)]:
+            del self.branch_records[p]
+
+        # The subtree alone, into empty buffers. Leaves are built now even
+        # if the rest were built as a later leaf layer
+        old_buffers = self.take_buffers()
+        state = self.pruned_branches, self.pruned_leaves, self.build_leaves
+        self.build_leaves = True
+        self.branch_ranges = {}
+        self.branch_queue = deque((root,))
+        while self.branch_queue:
+            self.generate_branch(self.branch_queue.popleft())
+        self.flush_kernels()
+        self.pruned_branches, self.pruned_leaves, self.build_leaves = state
+        new_buffers = self.take_buffers()
+        new_ranges = self.branch_ranges
+        for name, values in old_buffers.items():
+            setattr(self, name, values)
+
+        # Every branch queued before path is where it was
+        order = sorted([p for p in old_ranges if p != path and not p.startswith(prefix)]
+                       + list(new_ranges), key=queue_order)
+        first = order.index(path)
+        self.branch_ranges = {p: old_ranges[p] for p in order[:first]}
+        cut = [sum(ranges[k + 1] - ranges[k] for ranges in self.branch_ranges.values())
+               for k in range(0, 8, 2)]
+        tail = [(p, new_buffers, new_ranges[p]) if p in new_ranges else (p, old_buffers, old_ranges[p])
+                for p in order[first:]]
+        for p, _buffers, _ranges in tail:
+            self.branch_ranges[p] = [0] * 8
+        self.splice("branches", 0, cut[:2], tail)
+        self.splice("leaves", 4, cut[2:], tail)
+        return True
+
+    def take_buffers(self):
+        """Hand over the part buffers as a dict, leaving them empty."""
+        buffers = {f"{part}_{name}": getattr(self, f"{part}_{name}")
+                   for part in ("branches", "leaves") for name in BUFFERS}
+        self.reset_branches()
+        self.reset_leaves()
+        return buffers
+
+    def splice(self, part, slot, cut, tail):
+        # Replace part from cut (first vertex, first index) on by the branches
+        # of tail, (path, buffers, ranges) in queue order, and record where
+        # they land. Branches stored back to back in the same buffers (see
+        # take_buffers) are copied as one run
+        vert, index = cut
+        runs = []
+        for p, buffers, ranges in tail:
+            v0, v1, i0, i1 = ranges[slot:slot + 4]
+            self.branch_ranges[p][slot:slot + 4] = (vert, vert + v1 - v0, index, index + i1 - i0)
+            if v1 > v0 or i1 > i0:
+                run = runs[-1] if runs else None
+                if run and run[0] is buffers and run[2] == v0 and run[4] == i0:
+                    run[2], run[4] = v1, i1
+                else:
+                    runs.append([buffers, v0, v1, i0, i1, vert - v0])
+            vert += v1 - v0
+            index += i1 - i0
+
+        for name, size in VERTEX_BUFFERS:
+            key = f"{part}_{name}"
+            values = []
+            for buffers, v0, v1, _i0, _i1, _shift in runs:
+                values += buffers[key][v0 * size:v1 * size]
+            getattr(self, key)[cut[0] * size:] = values
+        indices = []
+        for buffers, _v0, _v1, i0, i1, shift in runs:
+            run = buffers[f"{part}_indices"][i0:i1]
+            indices += [i + shift for i in run] if shift else run
+        getattr(self, f"{part}_indices")[cut[1]:] = indices
+
+    def branch_at_face(self, face, part="branches"):
+        """Path of the branch that face (a polygon index of part) belongs to, or None."""
+        slot = 2 if part == "branches" else 6
+        position = face * 4
+        for path, ranges in self.branch_ranges.items():
+            if ranges[slot] <= position < ranges[slot + 1]:
+                return path
+        return None
 
     def generate_branch(self, branch: Branch, seed=None):
         # Use passed seed or branch's stored seed (logic for root)
         if seed is None:
-            if hasattr(branch, 'seed'):
+            if branch.seed is not None:
                 seed = branch.seed
             else:
                 seed = self.options.seed
+        # A branch reseeded on its own, the change carries over to its children
+        seed = self.options.branch.seedOverrides.get(branch.path, seed)
         
         # 1. Independent RNGs to ensure stability regardless of child recursion
         # Geometry RNG: Used for sections, gnarliness affecting current branch shape
@@ -73,10 +441,8 @@ class TreeGenerator:
         # Making it separate ensures that if we change logic/count of children, geometry doesn't shift
         rng_struct = RNG((seed * 1664525 + 1013904223) & 0xFFFFFFFF)
         
-        # Calculate sections (Geometry) - currently a placeholder, actual logic is in the loop
-        self.calculate_sections(branch, rng_geo)
-        
-        index_offset = len(self.branches_verts)
+        index_offset = self.branches_offset + len(self.branches_verts) // 3
+        index_start = len(self.branches_indices)
         
         # Calculate children locations (Structure)
         child_branch_slots = {}
@@ -85,8 +451,6 @@ class TreeGenerator:
 
         # Generate Geometry Loop
         # We reuse rng_geo to ensure consistent gnarliness along the branch
-        # (It must match the state it would have if calculate_sections was run... wait.
-        # calculate_sections just consumes some RNG. rng_geo continues from there. Correct.)
         
         sections = []
         
@@ -101,41 +465,30 @@ class TreeGenerator:
         if divisor == 0: divisor = 1
         section_length = branch.length / branch.sectionCount / divisor
         
+        # Rings are emitted in one batch once the sections are known
+        meshing = self.mode == 'MESH'
+        ring_origins = []
+        ring_matrices = []
+        ring_radii = []
+        twist = self.options.branch.twist.get(branch.level, 0)
+        
         for i in range(branch.sectionCount + 1):
-            section_radius = branch.radius
+            section_radius = self.section_radius(branch, i)
+
+            # Segments Generation (Vertices), see flush_kernels
+            ring_origins.extend(section_origin)
+            ring_radii.append(section_radius)
             
-            # ... Taper logic ...
-            if i == branch.sectionCount and branch.level == self.options.branch.levels:
-                section_radius = 0.001
-            elif self.options.type == TreeType.Deciduous:
-                taper = self.options.branch.taper.get(branch.level, 0.7)
-                section_radius *= (1 - taper * (i / branch.sectionCount))
-            elif self.options.type == TreeType.Evergreen:
-                section_radius *= (1 - (i / branch.sectionCount))
-
-            # Segments Generation (Vertices)
-            first_vertex_data = None
-            for j in range(branch.segmentCount):
-                angle = (2.0 * math.pi * j) / branch.segmentCount
-                vertex = Vector((math.cos(angle), 0, math.sin(angle))) * section_radius
-                vertex.rotate(section_orientation)
-                vertex += section_origin
-                 
-                normal = Vector((math.cos(angle), 0, math.sin(angle)))
-                normal.rotate(section_orientation)
-                normal.normalize()
-                 
-                uv = Vector((j / branch.segmentCount, 0 if (i % 2 == 0) else 1))
-                 
-                self.branches_verts.append(vertex)
-                self.branches_uvs.append(uv)
-                 
-                if j == 0:
-                    first_vertex_data = (vertex, normal, uv)
-                     
-            if first_vertex_data:
-                self.branches_verts.append(first_vertex_data[0])
-                self.branches_uvs.append(Vector((1.0, first_vertex_data[2].y)))
+            if meshing:
+                ring_matrices.extend(x for row in section_orientation.to_matrix() for x in row)
+                
+                # Wind attributes are constant across a ring, emit them in bulk
+                ring_size = branch.segmentCount + 1
+                self.branches_levels.extend([branch.level] * ring_size)
+                self.branches_along.extend([i / branch.sectionCount] * ring_size)
+                self.branches_pivots.extend(tuple(branch.origin) * ring_size)
+                self.branches_stiffness.extend([self.stiffness(section_radius)] * ring_size)
+                self.extend_chain("branches", branch.chain, ring_size)
 
             sections.append({
                 'origin': section_origin.copy(),
@@ -249,22 +602,51 @@ class TreeGenerator:
                 # Calculate child length
                 child_length = child_info['length']
 
-                new_branch = Branch(
-                    origin=section_origin.copy(), # Use current section's origin
-                    orientation=child_orientation,
-                    length=child_length,
-                    radius=child_radius,
-                    level=child_info['level'],
-                    sectionCount=child_info['sectionCount'],
-                    segmentCount=child_info['segmentCount']
-                )
-                new_branch.seed = child_seed
-                self.branch_queue.append(new_branch)
+                # Too small to see: skipped with its children and leaves. Seeds
+                # come from the slot, the branches kept do not change
+                if child_length / divisor < self.prune_size:
+                    self.pruned_branches += 1
+                else:
+                    new_branch = Branch(
+                        origin=section_origin.copy(), # Use current section's origin
+                        orientation=child_orientation,
+                        length=child_length,
+                        radius=child_radius,
+                        level=child_info['level'],
+                        sectionCount=child_info['sectionCount'],
+                        segmentCount=child_info['segmentCount'],
+                        seed=child_seed,
+                        path=f"{branch.path}.{i}",
+                        # The child starts where ring i + 1 will be, inherit the sway there
+                        chain=branch.chain + ((branch.origin, bend_weight(
+                            self.stiffness(self.section_radius(branch, i + 1)),
+                            (i + 1) / branch.sectionCount)),)
+                    )
+                    self.branch_queue.append(new_branch)
                  
-        # Generate Indices
-        self.generate_branch_indices(index_offset, branch)
+        if meshing:
+            # Vertices and indices are reserved here and filled for the
+            # whole tree at once, see flush_kernels
+            self.pending_rings.append((ring_origins, ring_matrices, ring_radii, branch.segmentCount,
+                                       index_offset, branch.sectionCount))
+            ring_vertices = len(ring_radii) * (branch.segmentCount + 1)
+            self.branches_verts.extend([0.0] * (ring_vertices * 3))
+            self.branches_normals.extend([0.0] * (ring_vertices * 3))
+            self.branches_uvs.extend([0.0] * (ring_vertices * 2))
+            self.branches_indices.extend([0] * (branch.sectionCount * branch.segmentCount * 4))
+            
+            # Kept for regenerate_subtree, the leaf range is filled by generate_leaf_site
+            self.branch_records[branch.path] = branch
+            self.branch_ranges[branch.path] = [
+                index_offset - self.branches_offset, len(self.branches_verts) // 3,
+                index_start, len(self.branches_indices), 0, 0, 0, 0]
+        else:
+            # Twist accumulates per section, as tilt it turns the swept profile
+            tilts = [twist * i for i in range(len(ring_radii))]
+            self.splines.append((branch.level, ring_origins, ring_radii, tilts))
 
         # Handle Deciduous Tip Branch
+        tip = None
         if self.options.type == TreeType.Deciduous:
             last_section = sections[-1]
             # If not max level, extend?
@@ -274,55 +656,104 @@ class TreeGenerator:
                 # Tip is a child branch
                 # Seed for tip? Use end of section hash?
                 tip_seed = (seed + 999999) & 0xFFFFFFFF
+                tip_length = self.options.branch.length.get(branch.level + 1, 10)
                  
-                self.branch_queue.append(Branch(
-                    origin=last_section['origin'],
-                    orientation=last_section['orientation'],
-                    length=self.options.branch.length.get(branch.level + 1, 10),
-                    radius=last_section['radius'],
-                    level=branch.level + 1,
-                    sectionCount=branch.sectionCount,
-                    segmentCount=branch.segmentCount,
-                    seed=tip_seed
-                ))
+                # Pruned like the side children of the same level
+                if tip_length / divisor < self.prune_size:
+                    self.pruned_branches += 1
+                else:
+                    self.branch_queue.append(Branch(
+                        origin=last_section['origin'],
+                        orientation=last_section['orientation'],
+                        length=tip_length,
+                        radius=last_section['radius'],
+                        level=branch.level + 1,
+                        sectionCount=branch.sectionCount,
+                        segmentCount=branch.segmentCount,
+                        seed=tip_seed,
+                        path=f"{branch.path}.t",
+                        chain=branch.chain + ((branch.origin, bend_weight(
+                            self.stiffness(last_section['radius']), 1.0)),)
+                    ))
             else:
                 # Tip Leaf
                 # Use rng_geo? Or logic? 
                 # Usually tip leaf handled by generate_leaf
-                self.generate_leaf(last_section['origin'], last_section['orientation'], rng_geo)
+                wind = (branch.level, 1.0, branch.origin, self.stiffness(last_section['radius']), branch.chain)
+                tip = (last_section['origin'], last_section['orientation'], wind)
 
         # Leaves along branch?
         # Only at max level?
-        if branch.level == self.options.branch.levels:
-            self.generate_leaves(sections, rng_geo)
-            
+        leaf_sections = sections if branch.level == self.options.branch.levels else None
+        
+        if tip or leaf_sections:
+            if self.build_leaves:
+                self.generate_leaf_site(rng_geo, branch, tip, leaf_sections)
+            else:
+                # rng_geo is not used after the leaves, a copy of its state
+                # reproduces them exactly when the layer is built later
+                self.leaf_sites.append((copy.copy(rng_geo), branch, tip, leaf_sections))
 
-    def generate_branch_indices(self, index_offset, branch):
-        # N = segmentCount + 1 (because of duplicated vertex for UVs)
-        N = branch.segmentCount + 1
-        for i in range(branch.sectionCount):
-            for j in range(branch.segmentCount):
-                v1 = index_offset + i * N + j
-                v2 = index_offset + i * N + (j + 1)
-                v3 = v1 + N
-                v4 = v2 + N
-                
-                # Faces: (v1, v3, v2) and (v2, v3, v4) - CCW winding?
-                # Blender faces are usually lists of 3 or 4 indices.
-                # Three.js: indices.push(v1, v3, v2, v2, v3, v4); 
-                # This is triangles. Blender from_pydata handles quads naturally.
-                # Let's try quads for cleaner geometry: (v1, v2, v4, v3) or similar.
-                # v1-v2 is bottom edge. v3-v4 is top edge.
-                # Quad: v1, v2, v4, v3 
-                
-                self.branches_indices.append((v1, v2, v4, v3))
+    def flush_kernels(self):
+        """Fill the vertices reserved since the last flush, one kernel call per buffer.
+
+        Reserved vertices are always the last ones of their buffers: rings
+        are the only branch vertices, leaf quads the only leaf vertices.
+        Called once per tree (per chunk when streaming), so the Numba
+        kernels pay their conversions once instead of once per branch.
+        """
+        if self.pending_rings:
+            origins, matrices, radii, ring_counts, segment_counts = [], [], [], [], []
+            index_offsets, section_counts = [], []
+            for ring_origins, ring_matrices, ring_radii, segments, index_offset, sections in self.pending_rings:
+                origins += ring_origins
+                matrices += ring_matrices
+                radii += ring_radii
+                ring_counts.append(len(ring_radii))
+                segment_counts.append(segments)
+                index_offsets.append(index_offset)
+                section_counts.append(sections)
+            self.pending_rings = []
+            verts, normals, uvs = kernels.rings(origins, matrices, radii, ring_counts, segment_counts)
+            # Outward facing quads (v1, v3, v4, v2) between consecutive rings of
+            # segmentCount + 1 vertices (the last one is duplicated for UVs)
+            indices = kernels.quad_indices(index_offsets, section_counts, segment_counts)
+            for name, values in (("verts", verts), ("normals", normals), ("uvs", uvs), ("indices", indices)):
+                buffer = getattr(self, f"branches_{name}")
+                buffer[len(buffer) - len(values):] = values
+
+        if self.pending_leaves:
+            origins, matrices, sizes = [], [], []
+            for leaf_origins, leaf_matrices, leaf_sizes in self.pending_leaves:
+                origins += leaf_origins
+                matrices += leaf_matrices
+                sizes += leaf_sizes
+            self.pending_leaves = []
+            double = self.options.leaves.billboard == Billboard.Double
+            verts, normals = kernels.leaf_quads(origins, matrices, sizes, double)
+            for name, values in (("verts", verts), ("normals", normals)):
+                buffer = getattr(self, f"leaves_{name}")
+                buffer[len(buffer) - len(values):] = values
+
+    def stiffness(self, radius):
+        # 1 at the trunk base, towards 0 for thin twigs
+        trunk_radius = self.options.branch.radius.get(0, 1.0)
+        if trunk_radius <= 0:
+            return 0.0
+        return max(0.0, min(1.0, radius / trunk_radius))
 
-    def generate_leaves(self, sections, rng):
+    def generate_leaves(self, sections, rng, branch):
         radial_offset = rng.random(1, 0)
         
         leaf_count = self.options.leaves.count
         leaf_start_limit = self.options.leaves.start
         
+        # Emitted in one batch after the loop, see emit_leaves
+        origins = []
+        orientations = []
+        sizes = []
+        winds = []
+        
         for i in range(leaf_count):
             leaf_start = rng.random(1.0, leaf_start_limit)
             
@@ -354,103 +785,97 @@ class TreeGenerator:
             final_quat = q3 @ q2 @ q1
             leaf_orientation = final_quat.to_euler()
             
-            self.generate_leaf(origin, leaf_orientation, rng)
+            # Leaves follow the wind motion of the point they hang from
+            radius = sectionA['radius'] + (sectionB['radius'] - sectionA['radius']) * alpha
+            wind = (branch.level, leaf_start, branch.origin, self.stiffness(radius), branch.chain)
+            
+            origins.append(origin)
+            orientations.append(leaf_orientation)
+            sizes.append(self.leaf_size(rng))
+            winds.append(wind)
+        
+        self.emit_leaves(origins, orientations, sizes, winds)
 
-    def generate_leaf(self, origin, orientation, rng):
+    def generate_leaf(self, origin, orientation, rng, wind):
         # Create a single or double quad
-        
+        self.emit_leaves([origin], [orientation], [self.leaf_size(rng)], [wind])
+
+    def leaf_size(self, rng):
         size = self.options.leaves.size
         # Variance
         variance = self.options.leaves.sizeVariance
         # random(var, -var)
         scale = 1 + rng.random(variance, -variance)
-        leaf_size = size * scale
-        
-        W = leaf_size
-        L = leaf_size
-        
-        def create_quad_leaf(rot_offset_y):
-            # Vertices
-            # v0: -W/2, L, 0
-            # v1: -W/2, 0, 0
-            # v2: W/2, 0, 0
-            # v3: W/2, L, 0
-            
-            local_verts = [
-                Vector((-W/2, L, 0)),
-                Vector((-W/2, 0, 0)),
-                Vector((W/2, 0, 0)),
-                Vector((W/2, L, 0))
-            ]
-            
-            # Transform
-            rot_offset_quat = Quaternion(Vector((0,1,0)), rot_offset_y)
-            base_quat = orientation.to_quaternion()
-            
-            transformed_verts = []
-            for v in local_verts:
-                # Apply local rotation then base orientation then add origin
-                v_rot = v.copy()
-                v_rot.rotate(rot_offset_quat) # Apply Y rotation
-                v_rot.rotate(base_quat)       # Apply orientation
-                transformed_verts.append(v_rot + origin)
-                
-            start_idx = len(self.leaves_verts)
-            self.leaves_verts.extend(transformed_verts)
-            
-            # UVs
-            self.leaves_uvs.extend([
-                Vector((0, 1)),
-                Vector((0, 0)),
-                Vector((1, 0)),
-                Vector((1, 1))
-            ])
-            
-            # Face
-            self.leaves_indices.append((start_idx, start_idx+1, start_idx+2, start_idx+3))
-            
-        create_quad_leaf(0)
-        
-        if self.options.leaves.billboard == Billboard.Double:
-            create_quad_leaf(math.pi / 2)
-
-    def create_mesh(self):
-        # Create Blender Mesh for Branches
-        mesh_branches = bpy.data.meshes.new("EZTree_Branches")
-        mesh_branches.from_pydata(self.branches_verts, [], self.branches_indices)
-        mesh_branches.uv_layers.new(name="UVMap")
-        
-        # Assign UVs
-        bm = bmesh.new()
-        bm.from_mesh(mesh_branches)
-        uv_layer = bm.loops.layers.uv.verify()
-        
-        for face in bm.faces:
-            for loop in face.loops:
-                v_idx = loop.vert.index
-                uv = self.branches_uvs[v_idx]
-                loop[uv_layer].uv = uv
-        
-        bm.to_mesh(mesh_branches)
-        bm.free()
+        return size * scale
+
+    def emit_leaves(self, origins, orientations, sizes, winds):
+        if self.prune_size > 0 and min(sizes, default=0) < self.prune_size:
+            # Dropped after their sizes were drawn, the rng sequence is unchanged
+            kept = [k for k, size in enumerate(sizes) if size >= self.prune_size]
+            self.pruned_leaves += len(sizes) - len(kept)
+            origins = [origins[k] for k in kept]
+            orientations = [orientations[k] for k in kept]
+            sizes = [sizes[k] for k in kept]
+            winds = [winds[k] for k in kept]
+            if not sizes:
+                return
         
-        # Leaves
-        mesh_leaves = bpy.data.meshes.new("EZTree_Leaves")
-        mesh_leaves.from_pydata(self.leaves_verts, [], self.leaves_indices)
+        if self.mode != 'MESH':
+            # The leaf card is instanced on these points
+            for origin, orientation, size in zip(origins, orientations, sizes):
+                self.leaf_points.extend(origin)
+                self.leaf_rotations.extend(orientation)
+                self.leaf_scales.append(size)
+            return
         
-        bm_l = bmesh.new()
-        bm_l.from_mesh(mesh_leaves)
-        uv_layer_l = bm_l.loops.layers.uv.verify()
+        # Quad corners (-W/2, L), (-W/2, 0), (W/2, 0), (W/2, L) turned by the
+        # leaf orientation, a second quad turned 90 degrees about Y for Double
+        double = self.options.leaves.billboard == Billboard.Double
+        quads = 2 if double else 1
         
-        for face in bm_l.faces:
-            for loop in face.loops:
-                v_idx = loop.vert.index
-                uv = self.leaves_uvs[v_idx]
-                loop[uv_layer_l].uv = uv
-                
-        bm_l.to_mesh(mesh_leaves)
-        bm_l.free()
+        start_idx = self.leaves_offset + len(self.leaves_verts) // 3
+        # Reserved, filled by flush_kernels
+        self.pending_leaves.append((
+            [c for origin in origins for c in origin],
+            [x for orientation in orientations for row in orientation.to_matrix() for x in row],
+            sizes))
+        self.leaves_verts.extend([0.0] * (len(sizes) * quads * 12))
+        self.leaves_normals.extend([0.0] * (len(sizes) * quads * 12))
         
+        for k, (level, along, pivot, stiffness, chain) in enumerate(winds):
+            for q in range(quads):
+                idx = start_idx + (k * quads + q) * 4
+                # UVs
+                self.leaves_uvs.extend((0, 1, 0, 0, 1, 0, 1, 1))
+                # Face
+                self.leaves_indices.extend((idx, idx + 1, idx + 2, idx + 3))
+            
+            # Wind
+            count = 4 * quads
+            self.leaves_levels.extend((level,) * count)
+            self.leaves_along.extend((along,) * count)
+            self.leaves_pivots.extend(tuple(pivot) * count)
+            self.leaves_stiffness.extend((stiffness,) * count)
+            self.extend_chain("leaves", chain, count)
+
+    def section_radius(self, branch, i):
+        """Radius of ring i of branch after the taper."""
+        if i == branch.sectionCount and branch.level == self.options.branch.levels:
+            return 0.001
+        if self.options.type == TreeType.Deciduous:
+            taper = self.options.branch.taper.get(branch.level, 0.7)
+            return branch.radius * (1 - taper * (i / branch.sectionCount))
+        if self.options.type == TreeType.Evergreen:
+            return branch.radius * (1 - (i / branch.sectionCount))
+        return branch.radius
+
+    def extend_chain(self, part, chain, count):
+        # Ancestors past the branch's own level do not exist, zero weight
+        for k in range(CHAIN_LEVELS):
+            pivot, weight = chain[k] if k < len(chain) else ((0.0, 0.0, 0.0), 0.0)
+            getattr(self, f"{part}_pivots_{k}").extend(tuple(pivot) * count)
+            getattr(self, f"{part}_weights_{k}").extend((weight,) * count)
+
     def calculate_child_branches(self, branch, rng):
         # Calculate where children should be placed
         branch_slots = {}
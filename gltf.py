@@ -0,0 +1,323 @@
+"""Binary glTF (.glb) export straight from the generator buffers.
+
+Standard library only, no bpy: trees are written from TreeGenerator buffers
+without creating Blender meshes, so exports also run outside Blender (the
+generator itself only needs mathutils). Repeated placements of a tree are
+written once, with EXT_mesh_gpu_instancing carrying the transforms.
+
+Coordinates: the generator is Y-up like glTF, its buffers are written as is.
+Placements are glTF space transforms: translation (x, y, z), rotation
+quaternion (x, y, z, w) and scale (x, y, z).
+"""
+import json
+import math
+import os
+import struct
+from array import array
+
+GLB_MAGIC = 0x46546C67
+GLB_VERSION = 2
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+
+FLOAT = 5126
+UNSIGNED_INT = 5125
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+
+INSTANCING = "EXT_mesh_gpu_instancing"
+TEXTURE_TRANSFORM = "KHR_texture_transform"
+
+ASSET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+
+IDENTITY = ((0.0, 0.0, 0.0), (0.0, 0.0, 0.0, 1.0), (1.0, 1.0, 1.0))
+
+
+def triangulate(quads):
+    """Split quad indices (a, b, c, d) into triangles (a, b, c) and (a, c, d)."""
+    tris = array('I')
+    for i in range(0, len(quads), 4):
+        a, b, c, d = quads[i:i + 4]
+        tris.extend((a, b, c, a, c, d))
+    return tris
+
+
+def vertex_normals(verts, tris, weld=False):
+    """Area weighted vertex normals of a triangle list.
+
+    With weld, vertices at the same position share their normal, which
+    hides the duplicated seam vertex of the branch rings.
+    """
+    count = len(verts) // 3
+    sums = [0.0] * (count * 3)
+    for i in range(0, len(tris), 3):
+        a, b, c = tris[i] * 3, tris[i + 1] * 3, tris[i + 2] * 3
+        ux, uy, uz = verts[b] - verts[a], verts[b + 1] - verts[a + 1], verts[b + 2] - verts[a + 2]
+        vx, vy, vz = verts[c] - verts[a], verts[c + 1] - verts[a + 1], verts[c + 2] - verts[a + 2]
+        # Unnormalized cross product, its length is twice the triangle area
+        nx, ny, nz = uy * vz - uz * vy, uz * vx - ux * vz, ux * vy - uy * vx
+        for p in (a, b, c):
+            sums[p] += nx
+            sums[p + 1] += ny
+            sums[p + 2] += nz
+
+    if weld:
+        shared = {}
+        for p in range(0, len(verts), 3):
+            key = (verts[p], verts[p + 1], verts[p + 2])
+            total = shared.setdefault(key, [0.0, 0.0, 0.0])
+            total[0] += sums[p]
+            total[1] += sums[p + 1]
+            total[2] += sums[p + 2]
+        for p in range(0, len(verts), 3):
+            sums[p:p + 3] = shared[(verts[p], verts[p + 1], verts[p + 2])]
+
+    normals = array('f', [0.0]) * len(sums)
+    for p in range(0, len(sums), 3):
+        x, y, z = sums[p:p + 3]
+        length = math.sqrt(x * x + y * y + z * z)
+        if length > 0.0:
+            normals[p], normals[p + 1], normals[p + 2] = x / length, y / length, z / length
+        else:
+            normals[p + 1] = 1.0
+    return normals
+
+
+def _hex_to_factor(hex_val):
+    # Tints are used as is by the Blender materials, no sRGB decoding
+    return [((hex_val >> 16) & 255) / 255.0, ((hex_val >> 8) & 255) / 255.0,
+            (hex_val & 255) / 255.0, 1.0]
+
+
+class GlbWriter:
+    """Accumulates the glTF document and its binary chunk."""
+
+    def __init__(self, filepath, textures='EMBED'):
+        # textures: 'EMBED' into the .glb, 'REFERENCE' the assets by relative
+        # path, or 'NONE' for tint only materials
+        self.filepath = filepath
+        self.textures = textures
+        self.binary = bytearray()
+        self.doc = {
+            "asset": {"version": "2.0", "generator": "EZ-Tree"},
+            "scene": 0,
+            "scenes": [{"nodes": []}],
+            "nodes": [],
+            "meshes": [],
+            "materials": [],
+            "accessors": [],
+            "bufferViews": [],
+        }
+        self.extensions = set()
+        self._images = {}
+        self._materials = {}
+
+    def _list(self, name):
+        return self.doc.setdefault(name, [])
+
+    def add_view(self, data, target=None):
+        # Every view starts 4-byte aligned, as float and uint32 accessors require
+        self.binary.extend(b"\0" * (-len(self.binary) % 4))
+        view = {"buffer": 0, "byteOffset": len(self.binary), "byteLength": len(data)}
+        if target is not None:
+            view["target"] = target
+        self.binary.extend(data)
+        self.doc["bufferViews"].append(view)
+        return len(self.doc["bufferViews"]) - 1
+
+    def add_accessor(self, values, type_name, size, target=None, bounds=False):
+        """Accessor over a flat array('f') or array('I') of size components per element."""
+        accessor = {
+            "bufferView": self.add_view(values.tobytes(), target),
+            "componentType": UNSIGNED_INT if values.typecode == 'I' else FLOAT,
+            "count": len(values) // size,
+            "type": type_name,
+        }
+        if bounds and len(values):
+            # Required on POSITION
+            accessor["min"] = [min(values[i::size]) for i in range(size)]
+            accessor["max"] = [max(values[i::size]) for i in range(size)]
+        self.doc["accessors"].append(accessor)
+        return len(self.doc["accessors"]) - 1
+
+    def add_texture(self, path, transform=None):
+        """Texture info for the image at path, None if it does not exist."""
+        if self.textures == 'NONE' or not os.path.exists(path):
+            return None
+        if path not in self._images:
+            image = {}
+            uri = None
+            if self.textures == 'REFERENCE':
+                try:
+                    uri = os.path.relpath(path, os.path.dirname(os.path.abspath(self.filepath)))
+                except ValueError:
+                    # Another drive, embed it instead
+                    uri = None
+            if uri is not None:
+                image["uri"] = uri.replace(os.sep, "/")
+            else:
+                with open(path, "rb") as f:
+                    image["bufferView"] = self.add_view(f.read())
+                image["mimeType"] = "image/png" if path.lower().endswith(".png") else "image/jpeg"
+            self._list("images").append(image)
+            self._list("textures").append({"source": len(self.doc["images"]) - 1})
+            self._images[path] = len(self.doc["textures"]) - 1
+
+        info = {"index": self._images[path]}
+        if transform and transform != (1.0, 1.0):
+            info["extensions"] = {TEXTURE_TRANSFORM: {"scale": list(transform)}}
+            self.extensions.add(TEXTURE_TRANSFORM)
+        return info
+
+    def bark_material(self, bark):
+        """Material matching the Blender bark material of BarkOptions bark."""
+        scale = (float(bark.textureScale['x']), float(bark.textureScale['y']))
+        key = ("bark", bark.type.value, bark.tint, bark.textured, scale)
+        if key in self._materials:
+            return self._materials[key]
+
+        pbr = {"baseColorFactor": _hex_to_factor(bark.tint), "metallicFactor": 0.0, "roughnessFactor": 1.0}
+        material = {"name": "EZTree_Bark", "pbrMetallicRoughness": pbr}
+        if bark.textured:
+            folder = os.path.join(ASSET_DIR, "bark")
+            name = bark.type.value
+            color = self.add_texture(os.path.join(folder, f"{name}_color_1k.jpg"), scale)
+            if color:
+                pbr["baseColorTexture"] = color
+            normal = self.add_texture(os.path.join(folder, f"{name}_normal_1k.jpg"), scale)
+            if normal:
+                material["normalTexture"] = normal
+            # Roughness is read from green, metallicFactor 0 ignores blue
+            rough = self.add_texture(os.path.join(folder, f"{name}_roughness_1k.jpg"), scale)
+            if rough:
+                pbr["metallicRoughnessTexture"] = rough
+        return self._add_material(key, material)
+
+    def leaf_material(self, leaves):
+        """Alpha tested, double sided material matching the Blender leaf material."""
+        key = ("leaves", leaves.type.value, leaves.tint, round(leaves.alphaTest, 4))
+        if key in self._materials:
+            return self._materials[key]
+
+        pbr = {"baseColorFactor": _hex_to_factor(leaves.tint), "metallicFactor": 0.0, "roughnessFactor": 0.5}
+        material = {"name": "EZTree_Leaf", "pbrMetallicRoughness": pbr, "doubleSided": True}
+        color = self.add_texture(os.path.join(ASSET_DIR, "leaves", f"{leaves.type.value}_color.png"))
+        if color:
+            pbr["baseColorTexture"] = color
+            material["alphaMode"] = "MASK"
+            material["alphaCutoff"] = leaves.alphaTest
+        return self._add_material(key, material)
+
+    def _add_material(self, key, material):
+        self.doc["materials"].append(material)
+        self._materials[key] = len(self.doc["materials"]) - 1
+        return self._materials[key]
+
+    def add_primitive(self, verts, quads, uvs, material, normals=None, smooth=True, weld=False):
+        tris = triangulate(quads)
+        positions = array('f', verts)
+        # glTF UVs start top left, Blender's bottom left
+        texcoords = array('f', uvs)
+        for i in range(1, len(texcoords), 2):
+            texcoords[i] = 1.0 - texcoords[i]
+
+        attributes = {
+            "POSITION": self.add_accessor(positions, "VEC3", 3, ARRAY_BUFFER, bounds=True),
+            "TEXCOORD_0": self.add_accessor(texcoords, "VEC2", 2, ARRAY_BUFFER),
+        }
+        if smooth:
+            # Without NORMAL, viewers shade flat
+            if normals and len(normals) == len(verts):
+                normals = array('f', normals)
+            else:
+                normals = vertex_normals(positions, tris, weld)
+            attributes["NORMAL"] = self.add_accessor(normals, "VEC3", 3, ARRAY_BUFFER)
+        return {
+            "attributes": attributes,
+            "indices": self.add_accessor(tris, "SCALAR", 1, ELEMENT_ARRAY_BUFFER),
+            "material": material,
+        }
+
+    def add_tree(self, generator, name="EZTree"):
+        """Mesh of a generator that has run in 'MESH' mode, returns its index."""
+        options = generator.options
+        primitives = [self.add_primitive(generator.branches_verts, generator.branches_indices,
+                                         generator.branches_uvs, self.bark_material(options.bark),
+                                         generator.branches_normals,
+                                         smooth=not options.bark.flatShading, weld=True)]
+        if generator.leaves_indices:
+            primitives.append(self.add_primitive(generator.leaves_verts, generator.leaves_indices,
+                                                 generator.leaves_uvs, self.leaf_material(options.leaves),
+                                                 generator.leaves_normals))
+        self.doc["meshes"].append({"name": name, "primitives": primitives})
+        return len(self.doc["meshes"]) - 1
+
+    def add_placements(self, mesh, placements, name="EZTree"):
+        """Node showing mesh at every (translation, rotation, scale) of placements."""
+        node = {"name": name, "mesh": mesh}
+        if len(placements) == 1:
+            translation, rotation, scale = placements[0]
+            node.update(translation=list(translation), rotation=list(rotation), scale=list(scale))
+        else:
+            def accessor(index, size):
+                values = array('f', (c for placement in placements for c in placement[index]))
+                return self.add_accessor(values, f"VEC{size}", size)
+
+            node["extensions"] = {INSTANCING: {"attributes": {
+                "TRANSLATION": accessor(0, 3),
+                "ROTATION": accessor(1, 4),
+                "SCALE": accessor(2, 3),
+            }}}
+            self.extensions.add(INSTANCING)
+        self.doc["nodes"].append(node)
+        self.doc["scenes"][0]["nodes"].append(len(self.doc["nodes"]) - 1)
+
+    def write(self):
+        self.binary.extend(b"\0" * (-len(self.binary) % 4))
+        self.doc["buffers"] = [{"byteLength": len(self.binary)}]
+        if self.extensions:
+            # Used, not required: viewers without them still show one tree per node
+            self.doc["extensionsUsed"] = sorted(self.extensions)
+        for name in ("meshes", "materials", "accessors", "bufferViews"):
+            if not self.doc[name]:
+                del self.doc[name]
+
+        header = json.dumps(self.doc, separators=(",", ":")).encode()
+        header += b" " * (-len(header) % 4)
+        length = 12 + 8 + len(header) + 8 + len(self.binary)
+        with open(self.filepath, "wb") as f:
+            f.write(struct.pack("<III", GLB_MAGIC, GLB_VERSION, length))
+            f.write(struct.pack("<II", len(header), CHUNK_JSON))
+            f.write(header)
+            f.write(struct.pack("<II", len(self.binary), CHUNK_BIN))
+            f.write(self.binary)
+        return length
+
+
+def write_glb(filepath, generators, placements=None, textures='EMBED'):
+    """Write generators (TreeGenerators that have run) to a .glb file.
+
+    placements is a list per generator of (translation, rotation, scale),
+    each tree at the origin when omitted. Trees without placements are left
+    out. Returns the file size.
+    """
+    writer = GlbWriter(filepath, textures)
+    for i, generator in enumerate(generators):
+        tree_placements = placements[i] if placements is not None else [IDENTITY]
+        if not tree_placements:
+            continue
+        name = f"EZTree_{generator.options.seed}"
+        writer.add_placements(writer.add_tree(generator, name), tree_placements, name)
+    return writer.write()
+
+
+def export_trees(filepath, options_list, placements=None, textures='EMBED'):
+    """Generate every TreeOptions of options_list and write them to a .glb file."""
+    from .generator import TreeGenerator
+
+    generators = []
+    for options in options_list:
+        generator = TreeGenerator(options)
+        generator.generate()
+        generators.append(generator)
+    return write_glb(filepath, generators, placements, textures)
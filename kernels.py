@@ -0,0 +1,256 @@
+"""Geometry kernels of the generator, compiled with Numba when it is available.
+
+Section marching stays in the generator: every section consumes the branch
+RNG and mathutils rotations, one after the other. What it produces per
+section (origin, rotation matrix, radius) is collected for the whole tree
+and handed here in one batch (see TreeGenerator.flush_kernels), so the rings,
+quad indices and leaf quads of all branches are emitted in one call each.
+
+Every kernel has a pure Python version with the same output, used when Numba
+is not installed or has been switched off with use_numba(False).
+"""
+import math
+
+try:
+    import numpy as np
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+_enabled = HAS_NUMBA
+
+
+def use_numba(enabled):
+    """Switch between the compiled and the pure Python kernels, returns the previous state."""
+    global _enabled
+    previous = _enabled
+    _enabled = enabled and HAS_NUMBA
+    return previous
+
+
+def numba_enabled():
+    return _enabled
+
+
+# --- Pure Python ---
+
+def _py_rings(origins, matrices, radii, segment_count):
+    verts = []
+    normals = []
+    uvs = []
+    cos_sin = [(math.cos(2.0 * math.pi * j / segment_count),
+                math.sin(2.0 * math.pi * j / segment_count)) for j in range(segment_count)]
+    for i, radius in enumerate(radii):
+        ox, oy, oz = origins[i * 3:i * 3 + 3]
+        m = matrices[i * 9:i * 9 + 9]
+        v = 0 if i % 2 == 0 else 1
+        for j, (c, s) in enumerate(cos_sin):
+            x = c * radius
+            z = s * radius
+            verts.extend((m[0] * x + m[2] * z + ox,
+                          m[3] * x + m[5] * z + oy,
+                          m[6] * x + m[8] * z + oz))
+            # The radial direction, unit length as the matrix is a rotation
+            normals.extend((m[0] * c + m[2] * s,
+                            m[3] * c + m[5] * s,
+                            m[6] * c + m[8] * s))
+            uvs.extend((j / segment_count, v))
+        # Duplicate of the first vertex closes the UV seam
+        first = len(verts) - segment_count * 3
+        verts.extend(verts[first:first + 3])
+        normals.extend(normals[first:first + 3])
+        uvs.extend((1.0, v))
+    return verts, normals, uvs
+
+
+def _py_tree_rings(origins, matrices, radii, ring_counts, segment_counts):
+    verts = []
+    normals = []
+    uvs = []
+    first = 0
+    for count, segment_count in zip(ring_counts, segment_counts):
+        last = first + count
+        branch = _py_rings(origins[first * 3:last * 3], matrices[first * 9:last * 9],
+                           radii[first:last], segment_count)
+        verts += branch[0]
+        normals += branch[1]
+        uvs += branch[2]
+        first = last
+    return verts, normals, uvs
+
+
+def _py_quad_indices(index_offset, section_count, segment_count):
+    indices = []
+    n = segment_count + 1
+    for i in range(section_count):
+        for j in range(segment_count):
+            v1 = index_offset + i * n + j
+            v2 = index_offset + i * n + (j + 1)
+            v3 = v1 + n
+            v4 = v2 + n
+            # Wound to face outwards, along the ring normals
+            indices.extend((v1, v3, v4, v2))
+    return indices
+
+
+def _py_tree_quad_indices(index_offsets, section_counts, segment_counts):
+    indices = []
+    for index_offset, section_count, segment_count in zip(index_offsets, section_counts, segment_counts):
+        indices += _py_quad_indices(index_offset, section_count, segment_count)
+    return indices
+
+
+def _py_leaf_quads(origins, matrices, sizes, double):
+    verts = []
+    normals = []
+    angles = (0.0, math.pi / 2) if double else (0.0,)
+    for k, size in enumerate(sizes):
+        ox, oy, oz = origins[k * 3:k * 3 + 3]
+        m = matrices[k * 9:k * 9 + 9]
+        half = size / 2
+        for angle in angles:
+            c = math.cos(angle)
+            s = math.sin(angle)
+            # Local +Z turned about Y by angle, the side the corner order faces
+            normal = (m[0] * s + m[2] * c, m[3] * s + m[5] * c, m[6] * s + m[8] * c)
+            for lx, ly in ((-half, size), (-half, 0.0), (half, 0.0), (half, size)):
+                # Rotate about Y by angle, then by the leaf orientation
+                x = c * lx
+                z = -s * lx
+                verts.extend((m[0] * x + m[1] * ly + m[2] * z + ox,
+                              m[3] * x + m[4] * ly + m[5] * z + oy,
+                              m[6] * x + m[7] * ly + m[8] * z + oz))
+                normals.extend(normal)
+    return verts, normals
+
+
+# --- Numba ---
+
+if HAS_NUMBA:
+    @njit(cache=True)
+    def _nb_rings(origins, matrices, radii, ring_counts, segment_counts):
+        total = 0
+        for b in range(ring_counts.shape[0]):
+            total += ring_counts[b] * (segment_counts[b] + 1)
+        verts = np.empty(total * 3)
+        normals = np.empty(total * 3)
+        uvs = np.empty(total * 2)
+        # r: ring of the tree, base: its first vertex
+        r = 0
+        base = 0
+        for b in range(ring_counts.shape[0]):
+            segment_count = segment_counts[b]
+            ring_size = segment_count + 1
+            for i in range(ring_counts[b]):
+                v = 0.0 if i % 2 == 0 else 1.0
+                for j in range(ring_size):
+                    # The last vertex repeats the first one
+                    k = j if j < segment_count else 0
+                    angle = 2.0 * math.pi * k / segment_count
+                    c = math.cos(angle)
+                    s = math.sin(angle)
+                    x = c * radii[r]
+                    z = s * radii[r]
+                    p = (base + j) * 3
+                    verts[p] = matrices[r * 9] * x + matrices[r * 9 + 2] * z + origins[r * 3]
+                    verts[p + 1] = matrices[r * 9 + 3] * x + matrices[r * 9 + 5] * z + origins[r * 3 + 1]
+                    verts[p + 2] = matrices[r * 9 + 6] * x + matrices[r * 9 + 8] * z + origins[r * 3 + 2]
+                    normals[p] = matrices[r * 9] * c + matrices[r * 9 + 2] * s
+                    normals[p + 1] = matrices[r * 9 + 3] * c + matrices[r * 9 + 5] * s
+                    normals[p + 2] = matrices[r * 9 + 6] * c + matrices[r * 9 + 8] * s
+                    uvs[(base + j) * 2] = j / segment_count if j < segment_count else 1.0
+                    uvs[(base + j) * 2 + 1] = v
+                r += 1
+                base += ring_size
+        return verts, normals, uvs
+
+    @njit(cache=True)
+    def _nb_quad_indices(index_offsets, section_counts, segment_counts):
+        total = 0
+        for b in range(index_offsets.shape[0]):
+            total += section_counts[b] * segment_counts[b] * 4
+        indices = np.empty(total, dtype=np.int64)
+        p = 0
+        for b in range(index_offsets.shape[0]):
+            n = segment_counts[b] + 1
+            for i in range(section_counts[b]):
+                for j in range(segment_counts[b]):
+                    v1 = index_offsets[b] + i * n + j
+                    v2 = v1 + 1
+                    indices[p] = v1
+                    indices[p + 1] = v1 + n
+                    indices[p + 2] = v2 + n
+                    indices[p + 3] = v2
+                    p += 4
+        return indices
+
+    @njit(cache=True)
+    def _nb_leaf_quads(origins, matrices, sizes, double):
+        quads = 2 if double else 1
+        verts = np.empty(sizes.shape[0] * quads * 12)
+        normals = np.empty(sizes.shape[0] * quads * 12)
+        p = 0
+        for k in range(sizes.shape[0]):
+            size = sizes[k]
+            half = size / 2
+            for q in range(quads):
+                angle = q * math.pi / 2
+                c = math.cos(angle)
+                s = math.sin(angle)
+                nx = matrices[k * 9] * s + matrices[k * 9 + 2] * c
+                ny = matrices[k * 9 + 3] * s + matrices[k * 9 + 5] * c
+                nz = matrices[k * 9 + 6] * s + matrices[k * 9 + 8] * c
+                for corner in range(4):
+                    lx = -half if corner < 2 else half
+                    ly = size if corner == 0 or corner == 3 else 0.0
+                    x = c * lx
+                    z = -s * lx
+                    verts[p] = matrices[k * 9] * x + matrices[k * 9 + 1] * ly + matrices[k * 9 + 2] * z + origins[k * 3]
+                    verts[p + 1] = matrices[k * 9 + 3] * x + matrices[k * 9 + 4] * ly + matrices[k * 9 + 5] * z + origins[k * 3 + 1]
+                    verts[p + 2] = matrices[k * 9 + 6] * x + matrices[k * 9 + 7] * ly + matrices[k * 9 + 8] * z + origins[k * 3 + 2]
+                    normals[p] = nx
+                    normals[p + 1] = ny
+                    normals[p + 2] = nz
+                    p += 3
+        return verts, normals
+
+
+# --- Dispatch, inputs and outputs are flat Python lists ---
+
+def rings(origins, matrices, radii, ring_counts, segment_counts):
+    """Ring vertices, normals and UVs of a run of branches.
+
+    origins (xyz) and matrices (row-major 3x3) are flat, one entry per section
+    of every branch in turn. Branch b has ring_counts[b] rings of
+    segment_counts[b] vertices plus a seam vertex. Normals point straight out
+    from the section center.
+    """
+    if _enabled:
+        verts, normals, uvs = _nb_rings(np.asarray(origins, dtype=np.float64),
+                                        np.asarray(matrices, dtype=np.float64),
+                                        np.asarray(radii, dtype=np.float64),
+                                        np.asarray(ring_counts, dtype=np.int64),
+                                        np.asarray(segment_counts, dtype=np.int64))
+        return verts.tolist(), normals.tolist(), uvs.tolist()
+    return _py_tree_rings(origins, matrices, radii, ring_counts, segment_counts)
+
+
+def quad_indices(index_offsets, section_counts, segment_counts):
+    """Quads joining consecutive rings of a run of branches, whose first vertices are index_offsets."""
+    if _enabled:
+        return _nb_quad_indices(np.asarray(index_offsets, dtype=np.int64),
+                                np.asarray(section_counts, dtype=np.int64),
+                                np.asarray(segment_counts, dtype=np.int64)).tolist()
+    return _py_tree_quad_indices(index_offsets, section_counts, segment_counts)
+
+
+def leaf_quads(origins, matrices, sizes, double):
+    """Four corners and their normals per leaf quad, a second quad turned 90 degrees when double."""
+    if _enabled:
+        verts, normals = _nb_leaf_quads(np.asarray(origins, dtype=np.float64),
+                                        np.asarray(matrices, dtype=np.float64),
+                                        np.asarray(sizes, dtype=np.float64),
+                                        double)
+        return verts.tolist(), normals.tolist()
+    return _py_leaf_quads(origins, matrices, sizes, double)
@@ -0,0 +1,91 @@
+import bpy
+from bpy.app.handlers import persistent
+from . import mesh_registry
+from . import tree_registry
+
+# Trees whose leaf object was hidden when they were regenerated: the branches
+# are up to date, the leaves are built from the generator's recorded leaf
+# sites once the leaf object is shown or rendered.
+# tree id -> (geometry key, TreeGenerator with leaves_pending)
+_deferred = {}
+
+
+def is_hidden(leaf_obj):
+    """True if leaf_obj is hidden or disabled in the viewport."""
+    if leaf_obj.hide_viewport:
+        return True
+    try:
+        return leaf_obj.hide_get()
+    except RuntimeError:
+        # Not in the view layer at all
+        return True
+
+
+def defer(branch_obj, key, generator):
+    _deferred[branch_obj["eztree_id"]] = (key, generator)
+
+
+def discard(branch_obj):
+    _deferred.pop(branch_obj.get("eztree_id"), None)
+
+
+def build(tree_id):
+    """Fill the leaf mesh of a deferred tree, returns False if the tree is gone."""
+    from .operators import refill_mesh
+
+    key, generator = _deferred.pop(tree_id)
+    branch_obj, leaf_obj = tree_registry.lookup(tree_id)
+    if not branch_obj or not leaf_obj:
+        return False
+
+    generator.generate_leaf_layer()
+    leaf_mesh = refill_mesh(leaf_obj, "EZTree_Leaves", generator, "leaves")
+    if mesh_registry.is_current(branch_obj.data, key):
+        mesh_registry.tag_meshes(key, branch_obj.data, leaf_mesh)
+    return True
+
+
+def _build_where(visible):
+    for tree_id in list(_deferred):
+        leaf_obj = tree_registry.lookup(tree_id)[1]
+        if leaf_obj is None:
+            _deferred.pop(tree_id)
+        elif visible(leaf_obj):
+            build(tree_id)
+
+
+@persistent
+def _on_depsgraph_update_post(scene, depsgraph=None):
+    if _deferred:
+        _build_where(lambda obj: not is_hidden(obj))
+
+
+@persistent
+def _on_render_pre(*args):
+    if _deferred:
+        _build_where(lambda obj: not obj.hide_render)
+
+
+@persistent
+def _on_load_post(*args):
+    # Generators do not survive a reload, those trees regenerate on their next edit
+    _deferred.clear()
+
+
+def register():
+    if _on_depsgraph_update_post not in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.append(_on_depsgraph_update_post)
+    if _on_render_pre not in bpy.app.handlers.render_pre:
+        bpy.app.handlers.render_pre.append(_on_render_pre)
+    if _on_load_post not in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.append(_on_load_post)
+
+
+def unregister():
+    if _on_depsgraph_update_post in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(_on_depsgraph_update_post)
+    if _on_render_pre in bpy.app.handlers.render_pre:
+        bpy.app.handlers.render_pre.remove(_on_render_pre)
+    if _on_load_post in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(_on_load_post)
+    _deferred.clear()
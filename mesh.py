@@ -0,0 +1,167 @@
+import bpy
+from array import array
+from .generator import CHAIN_LEVELS
+
+# UV map of the tree meshes, the materials look it up by name (the swept
+# 'CURVES' output has no active UV map, see curves.py)
+UV_MAP = "UVMap"
+
+# All generated faces are quads
+FACE_SIZE = 4
+
+# Point attributes read by the wind node group:
+# (attribute name, attribute type, foreach key, generator buffer suffix)
+WIND_ATTRIBUTES = (
+    ("eztree_level", 'INT', "value", "levels"),
+    ("eztree_along", 'FLOAT', "value", "along"),
+    ("eztree_pivot", 'FLOAT_VECTOR', "vector", "pivots"),
+    ("eztree_stiffness", 'FLOAT', "value", "stiffness"),
+) + tuple(
+    # Pivot and bend weight of the ancestor at each level, see generator.CHAIN_LEVELS
+    attribute for k in range(CHAIN_LEVELS) for attribute in (
+        (f"eztree_pivot_{k}", 'FLOAT_VECTOR', "vector", f"pivots_{k}"),
+        (f"eztree_weight_{k}", 'FLOAT', "value", f"weights_{k}"),
+    )
+)
+
+
+def _loop_total_writable():
+    # Blender 4.0 derives loop_total from loop_start and made it read-only
+    return not bpy.types.MeshPolygon.bl_rna.properties["loop_total"].is_readonly
+
+
+def same_topology(mesh, verts, indices):
+    """True if mesh already has exactly this vertex count and face layout."""
+    if len(mesh.vertices) != len(verts) // 3 or len(mesh.loops) != len(indices):
+        return False
+    if len(mesh.polygons) != len(indices) // FACE_SIZE:
+        return False
+
+    current = array('i', [0]) * len(indices)
+    mesh.loops.foreach_get("vertex_index", current)
+    return current == array('i', indices)
+
+
+def write_uvs(mesh, indices, uvs, name=UV_MAP):
+    # Generator UVs are per vertex, Blender stores them per loop
+    uv_layer = mesh.uv_layers.get(name) or mesh.uv_layers.new(name=name)
+    loop_uvs = array('f', [0.0]) * (len(indices) * 2)
+    for loop, v in enumerate(indices):
+        loop_uvs[loop * 2] = uvs[v * 2]
+        loop_uvs[loop * 2 + 1] = uvs[v * 2 + 1]
+    uv_layer.data.foreach_set("uv", loop_uvs)
+
+
+def write_attributes(mesh, attributes):
+    # attributes: {name: (type, foreach key, flat values)}
+    for name, (attr_type, key, values) in attributes.items():
+        attr = mesh.attributes.get(name)
+        if attr and (attr.data_type != attr_type or attr.domain != 'POINT'):
+            mesh.attributes.remove(attr)
+            attr = None
+        if not attr:
+            attr = mesh.attributes.new(name, attr_type, 'POINT')
+        attr.data.foreach_set(key, values)
+
+
+def write_normals(mesh, normals, smooth):
+    """Shade smooth with normals (flat xyz per vertex) as custom normals, or flat.
+
+    Blender keeps the given normals instead of deriving them from the faces.
+    """
+    n_faces = len(mesh.polygons)
+    if n_faces and mesh.polygons[0].use_smooth != smooth:
+        mesh.polygons.foreach_set("use_smooth", [smooth] * n_faces)
+    if smooth and normals:
+        if hasattr(mesh, "use_auto_smooth"):
+            # Custom normals are only used with auto smooth before Blender 4.1
+            mesh.use_auto_smooth = True
+        mesh.normals_split_custom_set_from_vertices(tuple(zip(*[iter(normals)] * 3)))
+    elif mesh.has_custom_normals:
+        # Zero vectors reset to the normals Blender derives
+        mesh.normals_split_custom_set_from_vertices(((0.0, 0.0, 0.0),) * len(mesh.vertices))
+
+
+def update_mesh(mesh, verts, indices, uvs, attributes=None, normals=None, smooth=False):
+    """Fill mesh in place from flat vertex, quad index and per-vertex UV buffers.
+
+    If the topology is unchanged the existing allocation is kept and only the
+    vertex positions are rewritten, otherwise the geometry is cleared and
+    refilled. The datablock itself, and its material slots, are always reused.
+    With smooth, normals are applied as custom normals, see write_normals.
+    """
+    if same_topology(mesh, verts, indices):
+        mesh.vertices.foreach_set("co", verts)
+        if attributes:
+            write_attributes(mesh, attributes)
+        write_normals(mesh, normals, smooth)
+        mesh.update()
+        return mesh
+
+    n_verts = len(verts) // 3
+    n_loops = len(indices)
+    n_faces = n_loops // FACE_SIZE
+
+    # clear_geometry keeps the material slots
+    mesh.clear_geometry()
+    mesh.vertices.add(n_verts)
+    mesh.loops.add(n_loops)
+    mesh.polygons.add(n_faces)
+
+    mesh.vertices.foreach_set("co", verts)
+    mesh.loops.foreach_set("vertex_index", indices)
+    mesh.polygons.foreach_set("loop_start", array('i', range(0, n_loops, FACE_SIZE)))
+    if _loop_total_writable():
+        mesh.polygons.foreach_set("loop_total", [FACE_SIZE] * n_faces)
+
+    mesh.update(calc_edges=True)
+    if n_loops:
+        write_uvs(mesh, indices, uvs)
+        write_normals(mesh, normals, smooth)
+    if attributes and n_verts:
+        write_attributes(mesh, attributes)
+    return mesh
+
+
+def create_mesh(name, verts, indices, uvs, attributes=None, normals=None, smooth=False):
+    mesh = bpy.data.meshes.new(name)
+    return update_mesh(mesh, verts, indices, uvs, attributes, normals, smooth)
+
+
+def part_buffers(generator, part):
+    """Buffers of the 'branches' or 'leaves' part of a generator, in update_mesh order."""
+    attributes = {
+        name: (attr_type, key, getattr(generator, f"{part}_{suffix}"))
+        for name, attr_type, key, suffix in WIND_ATTRIBUTES
+    }
+    # Leaf quads are planar, flat shading gives their normals without custom data
+    smooth = part == "branches" and not generator.options.bark.flatShading
+    return (getattr(generator, f"{part}_verts"),
+            getattr(generator, f"{part}_indices"),
+            getattr(generator, f"{part}_uvs"),
+            attributes,
+            getattr(generator, f"{part}_normals"),
+            smooth)
+
+
+def create_part_mesh(name, generator, part):
+    return create_mesh(name, *part_buffers(generator, part))
+
+
+def update_part_mesh(mesh, generator, part):
+    return update_mesh(mesh, *part_buffers(generator, part))
+
+
+def create_tree_meshes(generator):
+    """Create new branch and leaf meshes from a generator that has run."""
+    branch_mesh = create_part_mesh("EZTree_Branches", generator, "branches")
+    leaf_mesh = create_part_mesh("EZTree_Leaves", generator, "leaves")
+    return branch_mesh, leaf_mesh
+
+
+def assign_material(mesh, mat):
+    # Only touch the slot when it changes, reassigning dirties the mesh
+    if not mesh.materials:
+        mesh.materials.append(mat)
+    elif mesh.materials[0] != mat:
+        mesh.materials[0] = mat
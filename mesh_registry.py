@@ -0,0 +1,95 @@
+import bpy
+from bpy.app.handlers import persistent
+from .utils import options_hash
+
+# Bump when the generator output changes, so meshes saved by an older
+# version are not shared with trees generated by the current one.
+GEOMETRY_VERSION = 5
+
+# options hash -> (branch mesh name, leaf mesh name)
+_registry = {}
+
+
+def geometry_key(options):
+    return f"{GEOMETRY_VERSION}:{options_hash(options)}"
+
+
+def _get_mesh(name, key, part):
+    mesh = bpy.data.meshes.get(name) if name else None
+    if mesh and mesh.get("eztree_hash") == key and mesh.get("eztree_part") == part:
+        return mesh
+    return None
+
+
+def tag_mesh(mesh, key, part):
+    """Mark mesh as holding the key geometry without sharing it yet."""
+    mesh["eztree_hash"] = key
+    mesh["eztree_part"] = part
+
+
+def tag_meshes(key, branch_mesh, leaf_mesh):
+    """Record that branch_mesh/leaf_mesh hold the geometry for key and share them."""
+    if branch_mesh:
+        tag_mesh(branch_mesh, key, "branch")
+    if leaf_mesh:
+        tag_mesh(leaf_mesh, key, "leaf")
+    _registry[key] = (branch_mesh.name if branch_mesh else None,
+                      leaf_mesh.name if leaf_mesh else None)
+
+
+def is_current(mesh, key):
+    return mesh is not None and mesh.get("eztree_hash") == key
+
+
+def lookup(key):
+    """Return the shared (branch_mesh, leaf_mesh) for key, or (None, None)."""
+    entry = _registry.get(key)
+    if not entry:
+        return None, None
+
+    branch_mesh = _get_mesh(entry[0], key, "branch")
+    leaf_mesh = _get_mesh(entry[1], key, "leaf")
+    if not branch_mesh or not leaf_mesh:
+        # Removed, renamed or edited in place since it was registered
+        del _registry[key]
+        return None, None
+    return branch_mesh, leaf_mesh
+
+
+def release(mesh):
+    """Remove mesh once no object uses it anymore."""
+    if mesh and mesh.users == 0:
+        bpy.data.meshes.remove(mesh)
+
+
+def rebuild():
+    _registry.clear()
+    found = {}
+    for mesh in bpy.data.meshes:
+        key = mesh.get("eztree_hash")
+        part = mesh.get("eztree_part")
+        if not key or part not in {"branch", "leaf"}:
+            continue
+        entry = found.setdefault(key, {})
+        # Keep the first mesh per part, duplicates get merged when they are regenerated
+        entry.setdefault(part, mesh.name)
+
+    for key, entry in found.items():
+        if "branch" in entry and "leaf" in entry:
+            _registry[key] = (entry["branch"], entry["leaf"])
+
+
+@persistent
+def _on_load_post(*args):
+    rebuild()
+
+
+def register():
+    if _on_load_post not in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.append(_on_load_post)
+
+
+def unregister():
+    if _on_load_post in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(_on_load_post)
+    _registry.clear()
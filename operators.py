@@ -1,8 +1,18 @@
 import bpy
 import bmesh
+import threading
 from math import radians
 from .generator import TreeGenerator
+from .mesh import create_part_mesh, create_tree_meshes, update_part_mesh, assign_material, UV_MAP
 from .utils import props_to_options
+from . import mesh_registry
+from . import tree_registry
+from . import prefetch
+from . import leaf_layer
+from . import subtree
+from . import curves
+from .enums import Billboard
+from . import textures
 
 
 def copy_props(source, target):
@@ -24,84 +34,114 @@ def copy_props(source, target):
                 pass
 
 
-def update_existing_tree(obj):
-    if not obj or not hasattr(obj, "eztree_props"):
-        return
+def refill_mesh(obj, name, generator, part):
+    mesh = obj.data
+    if mesh.users > 1:
+        # Shared with other trees: copy on write, leave their geometry alone
+        new_mesh = create_part_mesh(name, generator, part)
+        for mat in mesh.materials:
+            new_mesh.materials.append(mat)
+        obj.data = new_mesh
+    else:
+        update_part_mesh(mesh, generator, part)
+    return obj.data
 
-    # Check if we are already updating (avoid recursion loop if property update triggers another update)
-    # Using a simple check if possible, or assume Blender handles property update loop prevention reasonably well
-    # (it does usually, unless we set property inside update).
-    
-    # We are setting mesh data, not properties, so safe.
+
+def _link_mesh(obj, mesh):
+    old_mesh = obj.data
+    if old_mesh != mesh:
+        obj.data = mesh
+        mesh_registry.release(old_mesh)
+
+
+def update_existing_tree(obj, generated=None):
+    """Regenerate the tree obj belongs to from its props.
+
+    generated is an optional TreeGenerator that has already run with these
+    props, e.g. on a worker thread, and is used instead of generating here.
+    """
+    # The `obj` passed might be the parent (branch) or child (leaf),
+    # the props live on the branch
+    branch_obj, leaf_obj = tree_registry.get_pair(obj)
+    if not branch_obj:
+        return
     
-    props = obj.eztree_props
+    props = branch_obj.eztree_props
     options = props_to_options(props)
     
-    # Generate new mesh data
-    generator = TreeGenerator(options)
-    # We need to access generating geometry only, not creating new objects
-    # generator.generate() creates mesh datablocks currently.
-    # We should reuse existing meshes if possible or swap them.
-    
-    # Generator returns (branch_mesh, leaf_mesh)
-    new_branch_mesh, new_leaf_mesh = generator.generate()
-    
-    # Identify which object part this is
-    # The `obj` passed might be the parent (branch) or child (leaf).
-    # Current structure: Branch Object -> Leaf Object (child)
+    if branch_obj.type == 'CURVE':
+        # Skeleton output, meshed by Geometry Nodes and not shared through the registry
+        generator = generated if generated is not None and generated.mode == 'CURVES' else None
+        if generator is None:
+            generator = TreeGenerator(options, mode='CURVES')
+            generator.generate()
+        bark_mat, leaf_mat = tree_materials(props)
+        curves.update_curve_tree(branch_obj, leaf_obj, generator,
+                                 props.leaves.billboard == Billboard.Double.value, leaf_mat)
+        tree_registry.tag(branch_obj, leaf_obj)
+        return
     
-    branch_obj = None
-    leaf_obj = None
+    key = mesh_registry.geometry_key(options)
+    shared_branch, shared_leaf = mesh_registry.lookup(key)
+    generator = None
+    leaves_deferred = False
     
-    if "TreeBranch" in obj.name or (obj.children and "TreeLeaf" in obj.children[0].name):
-        branch_obj = obj
-        if obj.children:
-            leaf_obj = obj.children[0]
-    elif "TreeLeaf" in obj.name and obj.parent:
-        leaf_obj = obj
-        branch_obj = obj.parent
+    if shared_branch:
+        # Another tree already has this geometry, link to it
+        if branch_obj:
+            _link_mesh(branch_obj, shared_branch)
+        if leaf_obj:
+            _link_mesh(leaf_obj, shared_leaf)
+    elif (branch_obj and mesh_registry.is_current(branch_obj.data, key)
+            and leaf_obj and mesh_registry.is_current(leaf_obj.data, key)):
+        # Already showing this geometry, just make it shareable again
+        mesh_registry.tag_meshes(key, branch_obj.data, leaf_obj.data)
+    else:
+        # Generate new geometry buffers, the existing meshes are refilled in place
+        generator = generated
+        if generator is None:
+            # A neighbouring seed generated ahead of time, see prefetch
+            generator = prefetch.take(key)
+        if generator is None:
+            # Hidden leaves are built once they are shown again, see leaf_layer
+            generator = TreeGenerator(options, leaves=not (leaf_obj and leaf_layer.is_hidden(leaf_obj)))
+            generator.generate()
+        leaves_deferred = generator.leaves_pending
         
-    # If we can't find the pair, maybe it was separated.
-    # We'll rely on the object passed being the one holding properties (Branch).
-    # If `obj` is leaf, it might not have props if we only copy to root.
-    # We should enable copy on root only.
+        branch_mesh = leaf_mesh = None
+        if branch_obj:
+            branch_mesh = refill_mesh(branch_obj, "EZTree_Branches", generator, "branches")
+        if leaf_obj and not leaves_deferred:
+            leaf_mesh = refill_mesh(leaf_obj, "EZTree_Leaves", generator, "leaves")
+        if branch_mesh and leaf_mesh:
+            mesh_registry.tag_meshes(key, branch_mesh, leaf_mesh)
+        elif branch_mesh:
+            # Not shareable until the leaves match
+            mesh_registry.tag_mesh(branch_mesh, key, "branch")
     
     if branch_obj:
-        # Swap mesh data
-        old_mesh = branch_obj.data
-        branch_obj.data = new_branch_mesh
-        
         # Assign Material
         bark_mat = ensure_material("EZTree_Bark", props.bark.tint,
                                    type_name=props.bark.type,
                                    is_bark=True,
                                    props=props.bark)
-        if branch_obj.data.materials:
-            branch_obj.data.materials[0] = bark_mat
-        else:
-            branch_obj.data.materials.append(bark_mat)
-
-        if old_mesh.users == 0:
-            bpy.data.meshes.remove(old_mesh)
+        assign_material(branch_obj.data, bark_mat)
             
     if leaf_obj:
-         old_mesh = leaf_obj.data
-         leaf_obj.data = new_leaf_mesh
-         
          # Assign Material
          leaf_mat = ensure_material("EZTree_Leaf", props.leaves.tint,
                                     type_name=props.leaves.type,
                                     is_bark=False,
                                     props=props.leaves)
-         if leaf_obj.data.materials:
-            leaf_obj.data.materials[0] = leaf_mat
-         else:
-            leaf_obj.data.materials.append(leaf_mat)
-
-         if old_mesh.users == 0:
-            bpy.data.meshes.remove(old_mesh)
-    elif new_leaf_mesh and len(new_leaf_mesh.vertices) > 0:
+         assign_material(leaf_obj.data, leaf_mat)
+    elif shared_leaf or (generator and generator.leaves_verts):
          # If leaf object didn't exist but now we have leaves, create it.
+         if shared_leaf:
+             new_leaf_mesh = shared_leaf
+         else:
+             new_leaf_mesh = create_part_mesh("EZTree_Leaves", generator, "leaves")
+             if branch_obj:
+                 mesh_registry.tag_meshes(key, branch_obj.data, new_leaf_mesh)
          leaf_obj = bpy.data.objects.new("TreeLeaf", new_leaf_mesh)
          
          # Link to parent's collection
@@ -122,25 +162,57 @@ def update_existing_tree(obj):
                                     type_name=props.leaves.type,
                                     is_bark=False,
                                     props=props.leaves)
-         leaf_obj.data.materials.append(leaf_mat)
+         assign_material(leaf_obj.data, leaf_mat)
+    
+    tree_registry.tag(branch_obj, leaf_obj)
+    if leaves_deferred:
+        leaf_layer.defer(branch_obj, key, generator)
+    else:
+        leaf_layer.discard(branch_obj)
+    if generator is not None:
+        # Kept for Reseed Branch to splice into
+        subtree.remember(branch_obj, key, generator)
+    else:
+        subtree.discard(branch_obj)
 
 
 import os
+import hashlib
+
+# Bump when ensure_material changes the node setup it builds, so materials
+# saved by an older version are rebuilt once instead of being trusted.
+MATERIAL_VERSION = 1
 
 def get_asset_path():
     return os.path.join(os.path.dirname(__file__), "assets")
 
 def load_image(filepath):
-    if not os.path.exists(filepath):
-        return None
-    filename = os.path.basename(filepath)
-    if filename in bpy.data.images:
-        return bpy.data.images[filename]
-    return bpy.data.images.load(filepath)
+    # Cached by path and mtime, may return a low-res viewport proxy
+    return textures.get_image(filepath)
+
+def material_state_hash(color, type_name=None, is_bark=True, props=None):
+    """Hash every input that affects the node setup built by ensure_material."""
+    state = [MATERIAL_VERSION, is_bark, type_name, tuple(round(c, 4) for c in color)]
+    if props:
+        state.append(getattr(props, 'textured', True))
+        if is_bark:
+            state.append(round(getattr(props, 'textureScaleX', 1.0), 4))
+            state.append(round(getattr(props, 'textureScaleY', 1.0), 4))
+        else:
+            state.append(round(getattr(props, 'alphaTest', 0.5), 4))
+    # hashlib rather than hash(): the result is saved with the .blend and
+    # must stay stable across sessions.
+    return hashlib.md5(repr(state).encode()).hexdigest()
 
 def ensure_material(name, color, type_name=None, is_bark=True, props=None):
     # type_name: e.g. 'oak', 'pine'
+    state_hash = material_state_hash(color, type_name, is_bark, props)
+    
     mat = bpy.data.materials.get(name)
+    if mat and mat.use_nodes and mat.node_tree and mat.get("eztree_state") == state_hash:
+        # Nothing relevant changed since the last build, skip the node work
+        return mat
+    
     if not mat:
         mat = bpy.data.materials.new(name=name)
         mat.use_nodes = True
@@ -184,22 +256,29 @@ def ensure_material(name, color, type_name=None, is_bark=True, props=None):
     # Texture Logic
     should_texture = type_name and props and getattr(props, 'textured', True)
     
-    # Mapping and Coord Nodes
-    tex_coord = tree.nodes.get('EZ_TexCoord')
+    # Mapping and UV Nodes
+    uv_map = tree.nodes.get('EZ_UVMap')
     mapping = tree.nodes.get('EZ_Mapping')
     
     if should_texture:
-        if not tex_coord:
-            tex_coord = tree.nodes.new('ShaderNodeTexCoord')
-            tex_coord.name = 'EZ_TexCoord'
-            tex_coord.location = (-900, 0)
+        if not uv_map:
+            # By name, not the active map: Curves trees store UVs as an attribute
+            uv_map = tree.nodes.new('ShaderNodeUVMap')
+            uv_map.name = 'EZ_UVMap'
+            uv_map.uv_map = UV_MAP
+            uv_map.location = (-900, 0)
+            # Replaces the Texture Coordinate node of older files
+            tex_coord = tree.nodes.get('EZ_TexCoord')
+            if tex_coord:
+                tree.nodes.remove(tex_coord)
             
         if not mapping:
             mapping = tree.nodes.new('ShaderNodeMapping')
             mapping.name = 'EZ_Mapping'
             mapping.label = "EZ Mapping"
             mapping.location = (-700, 0)
-            tree.links.new(tex_coord.outputs['UV'], mapping.inputs['Vector'])
+        if not mapping.inputs['Vector'].is_linked:
+            tree.links.new(uv_map.outputs['UV'], mapping.inputs['Vector'])
             
         # Update Scale
         if is_bark and props:
@@ -336,41 +415,114 @@ def ensure_material(name, color, type_name=None, is_bark=True, props=None):
          if bsdf.inputs['Roughness'].is_linked:
              tree.links.remove(bsdf.inputs['Roughness'].links[0])
 
+    mat["eztree_state"] = state_hash
     return mat
 
-def update_existing_materials(obj):
-    if not obj or not hasattr(obj, "eztree_props"):
+def update_existing_materials(obj, bark=True, leaves=True):
+    branch_obj, leaf_obj = tree_registry.get_pair(obj)
+    if not branch_obj:
         return
     
-    props = obj.eztree_props
+    props = branch_obj.eztree_props
     
-    # Update Bark
-    # Need to find bark material. Usually slot 0 on branch obj.
-    # Determine which object is branch.
-    branch_obj = None
-    leaf_obj = None
-    
-    if "TreeBranch" in obj.name:
-        branch_obj = obj
-        if obj.children and "TreeLeaf" in obj.children[0].name:
-             leaf_obj = obj.children[0]
-    elif "TreeLeaf" in obj.name and obj.parent:
-        leaf_obj = obj
-        branch_obj = obj.parent
-        
-    if branch_obj:
+    if branch_obj and bark:
         ensure_material("EZTree_Bark", props.bark.tint, 
                         type_name=props.bark.type, 
                         is_bark=True, 
                         props=props.bark)
                         
-    if leaf_obj:
+    if leaf_obj and leaves:
         ensure_material("EZTree_Leaf", props.leaves.tint, 
                        type_name=props.leaves.type, 
                        is_bark=False, 
                        props=props.leaves)
 
 
+def create_tree_objects(collection, branch_mesh, leaf_mesh, bark_mat, leaf_mat, location=(0, 0, 0)):
+    """Link a TreeBranch/TreeLeaf object pair for the given meshes into collection."""
+    branch_obj = bpy.data.objects.new("TreeBranch", branch_mesh)
+    leaf_obj = bpy.data.objects.new("TreeLeaf", leaf_mesh)
+    
+    collection.objects.link(branch_obj)
+    collection.objects.link(leaf_obj)
+    
+    branch_obj.location = location
+    leaf_obj.location = location
+    
+    # Rotation conversion: Y-up (Generator) to Z-up (Blender)
+    # Rotate Parent (Branch) X +90
+    # Child (Leaf) stays 0 relative to parent if generated in same space
+    branch_obj.rotation_euler = (radians(90), 0, 0)
+    leaf_obj.rotation_euler = (0, 0, 0)
+    
+    assign_material(branch_obj.data, bark_mat)
+    assign_material(leaf_obj.data, leaf_mat)
+    
+    # Parent leaves to branches
+    leaf_obj.parent = branch_obj
+    tree_registry.tag(branch_obj, leaf_obj)
+    
+    return branch_obj, leaf_obj
+
+
+def tree_materials(props):
+    """The (bark, leaf) materials for props, rebuilt only when they changed."""
+    bark_mat = ensure_material("EZTree_Bark", props.bark.tint, 
+                               type_name=props.bark.type, 
+                               is_bark=True, 
+                               props=props.bark)
+    leaf_mat = ensure_material("EZTree_Leaf", props.leaves.tint, 
+                               type_name=props.leaves.type, 
+                               is_bark=False, 
+                               props=props.leaves)
+    return bark_mat, leaf_mat
+
+
+def add_tree(context, props, key, generator=None):
+    """Link a new tree for props at the 3D cursor and select it.
+
+    The meshes come from the registry when key is known, otherwise from
+    generator (a TreeGenerator that has run), or are generated here.
+    """
+    bark_mat, leaf_mat = tree_materials(props)
+    
+    if props.output_mode == 'CURVES':
+        if generator is None or generator.mode != 'CURVES':
+            generator = TreeGenerator(props_to_options(props), mode='CURVES')
+            generator.generate()
+        branch_obj, leaf_obj = curves.create_curve_tree_objects(
+            context.collection, generator, bark_mat, leaf_mat,
+            double=props.leaves.billboard == Billboard.Double.value,
+            resolution=props.branch.segments_0,
+            location=context.scene.cursor.location)
+    else:
+        branch_mesh, leaf_mesh = mesh_registry.lookup(key)
+        if not branch_mesh:
+            if generator is None:
+                generator = TreeGenerator(props_to_options(props))
+                generator.generate()
+            branch_mesh, leaf_mesh = create_tree_meshes(generator)
+            mesh_registry.tag_meshes(key, branch_mesh, leaf_mesh)
+        
+        # Link to Scene
+        branch_obj, leaf_obj = create_tree_objects(context.collection, branch_mesh, leaf_mesh,
+                                                   bark_mat, leaf_mat,
+                                                   location=context.scene.cursor.location)
+    
+    # Copy properties, the new tree already matches them
+    context.scene.eztree_loading_preset = True
+    try:
+        copy_props(props, branch_obj.eztree_props)
+    finally:
+        context.scene.eztree_loading_preset = False
+    
+    # Select the tree
+    bpy.ops.object.select_all(action='DESELECT')
+    branch_obj.select_set(True)
+    context.view_layer.objects.active = branch_obj
+    return branch_obj
+
+
 class EZTree_OT_Generate(bpy.types.Operator):
     bl_idname = "eztree.generate"
     bl_label = "Generate Tree"
@@ -378,66 +530,103 @@ class EZTree_OT_Generate(bpy.types.Operator):
     bl_options = {'REGISTER', 'UNDO'}
 
     def execute(self, context):
+        props = context.scene.eztree_props
+        key = mesh_registry.geometry_key(props_to_options(props))
+        add_tree(context, props, key)
+        return {'FINISHED'}
+
+
+class EZTree_OT_GenerateModal(bpy.types.Operator):
+    bl_idname = "eztree.generate_modal"
+    bl_label = "Generate Tree"
+    bl_description = "Generate a tree with current settings in the background, Esc cancels"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def invoke(self, context, event):
         props = context.scene.eztree_props
         options = props_to_options(props)
+        self._key = mesh_registry.geometry_key(options)
+        if props.output_mode == 'MESH' and mesh_registry.lookup(self._key)[0]:
+            # Nothing to wait for
+            add_tree(context, props, self._key)
+            return {'FINISHED'}
         
-        generator = TreeGenerator(options)
-        branch_mesh, leaf_mesh = generator.generate()
-        
-        # Link to Scene
-        col = context.collection
-        
-        branch_obj = bpy.data.objects.new("TreeBranch", branch_mesh)
-        leaf_obj = bpy.data.objects.new("TreeLeaf", leaf_mesh)
-        
-        col.objects.link(branch_obj)
-        col.objects.link(leaf_obj)
-        
-        branch_obj.location = context.scene.cursor.location
-        leaf_obj.location = context.scene.cursor.location
-        
-        # Rotation conversion: Y-up (Generator) to Z-up (Blender)
-        # Rotate Parent (Branch) X +90
-        # Child (Leaf) stays 0 relative to parent if generated in same space
-        branch_obj.rotation_euler = (radians(90), 0, 0)
-        leaf_obj.rotation_euler = (0, 0, 0)
-        
-        # Materials
-        bark_mat = ensure_material("EZTree_Bark", props.bark.tint, 
-                                   type_name=props.bark.type, 
-                                   is_bark=True, 
-                                   props=props.bark)
-                                   
-        leaf_mat = ensure_material("EZTree_Leaf", props.leaves.tint, 
-                                   type_name=props.leaves.type, 
-                                   is_bark=False, 
-                                   props=props.leaves)
+        self._levels = options.branch.levels
+        self._progress = (0, 0, 1)
+        self._cancel = threading.Event()
+        self._error = None
+        self._generator = TreeGenerator(options, mode=props.output_mode)
+        # Only the generator runs on the thread, meshes are built on the main thread
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
         
-        if branch_obj.data.materials:
-            branch_obj.data.materials[0] = bark_mat
-        else:
-            branch_obj.data.materials.append(bark_mat)
-            
-        if leaf_obj.data.materials:
-            leaf_obj.data.materials[0] = leaf_mat
-        else:
-            leaf_obj.data.materials.append(leaf_mat)
+        wm = context.window_manager
+        wm.progress_begin(0, 100)
+        self._timer = wm.event_timer_add(0.1, window=context.window)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def _run(self):
+        def progress(level, done, total):
+            self._progress = (level, done, total)
+            return not self._cancel.is_set()
+        try:
+            self._generator.generate(progress)
+        except Exception as e:
+            self._error = e
+
+    def _finish(self, context):
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        wm.progress_end()
+        context.workspace.status_text_set(None)
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            self._cancel.set()
+            self._thread.join()
+            self._finish(context)
+            self.report({'INFO'}, "Tree generation cancelled")
+            return {'CANCELLED'}
         
-        # Parent leaves to branches
-        leaf_obj.parent = branch_obj
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
         
-        # Copy properties
-        copy_props(props, branch_obj.eztree_props)
+        if self._thread.is_alive():
+            level, done, total = self._progress
+            fraction = (level + done / max(total, 1)) / (self._levels + 1)
+            context.window_manager.progress_update(int(fraction * 100))
+            context.workspace.status_text_set(
+                f"Generating tree: level {level} of {self._levels}, branch {done}/{total} (Esc to cancel)")
+            return {'RUNNING_MODAL'}
         
-        # Select the tree
-        bpy.ops.object.select_all(action='DESELECT')
-        branch_obj.select_set(True)
-        context.view_layer.objects.active = branch_obj
+        self._finish(context)
+        if self._error:
+            self.report({'ERROR'}, f"Tree generation failed: {self._error}")
+            return {'CANCELLED'}
         
+        props = context.scene.eztree_props
+        key = mesh_registry.geometry_key(props_to_options(props))
+        # Settings edited while generating: the result is stale, build the current ones
+        generator = self._generator if key == self._key else None
+        add_tree(context, props, key, generator)
+        if generator and (generator.pruned_branches or generator.pruned_leaves):
+            self.report({'INFO'}, f"Pruned {generator.pruned_branches} branches, "
+                                  f"{generator.pruned_leaves} leaves")
+        if generator and generator.culled_leaves:
+            self.report({'INFO'}, f"Culled {generator.culled_leaves} hidden leaves")
         return {'FINISHED'}
 
+    def cancel(self, context):
+        # Operator aborted by Blender, e.g. the window closed
+        self._cancel.set()
+        self._thread.join()
+        self._finish(context)
+
 def register():
     bpy.utils.register_class(EZTree_OT_Generate)
+    bpy.utils.register_class(EZTree_OT_GenerateModal)
 
 def unregister():
+    bpy.utils.unregister_class(EZTree_OT_GenerateModal)
     bpy.utils.unregister_class(EZTree_OT_Generate)
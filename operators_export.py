@@ -0,0 +1,271 @@
+import bpy
+import json
+import math
+import struct
+import zlib
+from bpy_extras.io_utils import ExportHelper, ImportHelper
+from mathutils import Matrix
+from .forest import FOREST_COLLECTION, get_variants
+from .generator import TreeGenerator
+from .gltf import write_glb
+from .mesh import assign_material, create_mesh
+from .operators import create_tree_objects, tree_materials
+from .presets import preset_to_options, write_preset
+from .utils import props_to_options, options_to_json
+from . import batch
+from . import storage
+from . import streaming
+from . import tree_registry
+
+# Blender is Z-up, glTF Y-up
+AXIS_CONVERSION = Matrix.Rotation(-math.pi / 2, 4, 'X')
+
+
+def gltf_placement(matrix):
+    """glTF (translation, rotation xyzw, scale) of a generator space to world matrix."""
+    loc, rot, scale = (AXIS_CONVERSION @ matrix).decompose()
+    return tuple(loc), (rot.x, rot.y, rot.z, rot.w), tuple(scale)
+
+
+def _selected_entries(context):
+    # Trees with identical settings are written once and instanced
+    entries = {}
+    for obj in batch.selected_trees(context):
+        options = props_to_options(obj.eztree_props)
+        key = json.dumps(options_to_json(options), sort_keys=True)
+        entries.setdefault(key, (options, []))[1].append(gltf_placement(obj.matrix_world))
+    return list(entries.values())
+
+
+def _forest_entries(context):
+    variants = {}
+    for col in get_variants():
+        for obj in col.objects:
+            if "eztree_options" in obj:
+                options = preset_to_options(json.loads(obj["eztree_options"]))
+                # Placements instance the whole collection, the tree keeps its own transform
+                variants[col] = (options, obj.matrix_world.copy(), [])
+                break
+
+    forest = bpy.data.collections.get(FOREST_COLLECTION)
+    for placement in (forest.objects if forest else ()):
+        variant = variants.get(placement.instance_collection)
+        if variant:
+            variant[2].append(gltf_placement(placement.matrix_world @ variant[1]))
+    return [(options, placements) for options, _, placements in variants.values()]
+
+
+class EZTree_OT_ExportGLTF(bpy.types.Operator, ExportHelper):
+    bl_idname = "eztree.export_gltf"
+    bl_label = "Export Trees (.glb)"
+    bl_description = "Write trees straight from the generator to binary glTF, repeated trees as GPU instances"
+    bl_options = {'REGISTER'}
+
+    filename_ext = ".glb"
+    filter_glob: bpy.props.StringProperty(default="*.glb", options={'HIDDEN'})
+
+    scope: bpy.props.EnumProperty(
+        name="Export",
+        items=[
+            ('SELECTED', "Selected Trees", "Selected trees at their current transforms"),
+            ('FOREST', "Forest", "Forest variants, instanced at every scattered placement"),
+        ],
+        default='SELECTED'
+    )
+    textures: bpy.props.EnumProperty(
+        name="Textures",
+        items=[
+            ('EMBED', "Embed", "Copy the bark and leaf textures into the .glb"),
+            ('REFERENCE', "Reference", "Point to the add-on's texture files by relative path"),
+            ('NONE', "None", "Tint only materials"),
+        ],
+        default='EMBED'
+    )
+
+    def execute(self, context):
+        if self.scope == 'FOREST':
+            entries = _forest_entries(context)
+        else:
+            entries = _selected_entries(context)
+        entries = [(options, placements) for options, placements in entries if placements]
+        if not entries:
+            self.report({'WARNING'}, "Nothing to export, select trees or scatter a forest.")
+            return {'CANCELLED'}
+
+        generators = []
+        wm = context.window_manager
+        wm.progress_begin(0, len(entries))
+        try:
+            for i, (options, _) in enumerate(entries):
+                generator = TreeGenerator(options)
+                generator.generate()
+                generators.append(generator)
+                wm.progress_update(i + 1)
+        finally:
+            wm.progress_end()
+
+        placements = [placements for _, placements in entries]
+        write_glb(self.filepath, generators, placements, self.textures)
+        count = sum(len(p) for p in placements)
+        self.report({'INFO'}, f"Exported {len(generators)} trees, {count} placements")
+        return {'FINISHED'}
+
+
+class EZTree_OT_SaveCompact(bpy.types.Operator, ExportHelper):
+    bl_idname = "eztree.save_compact"
+    bl_label = "Save Tree Geometry (.eztq)"
+    bl_description = "Store the active tree as quantized, compressed geometry for a tree library"
+    bl_options = {'REGISTER'}
+
+    filename_ext = ".eztq"
+    filter_glob: bpy.props.StringProperty(default="*.eztq", options={'HIDDEN'})
+
+    compression: bpy.props.EnumProperty(
+        name="Compression",
+        items=[
+            ('AUTO', "Best Available", "zstd when the zstandard module is installed, zlib otherwise"),
+            ('ZSTD', "zstd", "Needs the zstandard module"),
+            ('ZLIB', "zlib", "Deflate, always available"),
+            ('NONE', "None", "Quantized only"),
+        ],
+        default='AUTO'
+    )
+    verify: bpy.props.BoolProperty(
+        name="Verify",
+        description="Decode the result and check it against the generated geometry",
+        default=False
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return tree_registry.get_branch(context.active_object) is not None
+
+    def execute(self, context):
+        branch_obj = tree_registry.get_branch(context.active_object)
+        generator = TreeGenerator(props_to_options(branch_obj.eztree_props))
+        generator.generate()
+
+        try:
+            data = storage.encode(generator, None if self.compression == 'AUTO' else self.compression)
+            if self.verify:
+                storage.verify(generator, data)
+        except ValueError as e:
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
+
+        with open(self.filepath, "wb") as f:
+            f.write(data)
+        # Size of the same buffers as float32 / int32
+        raw = 4 * sum(len(getattr(generator, f"{part}_{name}"))
+                      for part in storage.PARTS for name in ("verts", "indices", "uvs", "normals"))
+        self.report({'INFO'}, f"Saved {len(data) / 1024:.0f} KiB ({raw / max(len(data), 1):.1f}x smaller)")
+        return {'FINISHED'}
+
+
+class EZTree_OT_LoadCompact(bpy.types.Operator, ImportHelper):
+    bl_idname = "eztree.load_compact"
+    bl_label = "Load Tree Geometry (.eztq)"
+    bl_description = "Add a tree stored with Save Tree Geometry at the 3D cursor"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    filename_ext = ".eztq"
+    filter_glob: bpy.props.StringProperty(default="*.eztq", options={'HIDDEN'})
+
+    def execute(self, context):
+        try:
+            tree = storage.load(self.filepath)
+        except (OSError, ValueError, struct.error, zlib.error) as e:
+            self.report({'ERROR'}, f"Could not read {self.filepath}: {e}")
+            return {'CANCELLED'}
+
+        branches = tree["branches"]
+        leaves = tree["leaves"]
+        flat = bool(tree["preset"]) and tree["preset"]["bark"].get("flatShading", False)
+        branch_mesh = create_mesh("EZTree_Branches", branches.verts, branches.indices, branches.uvs,
+                                  normals=branches.normals, smooth=not flat)
+        leaf_mesh = create_mesh("EZTree_Leaves", leaves.verts, leaves.indices, leaves.uvs)
+        # Materials follow from the stored settings, assigned once they are on the tree
+        branch_obj, leaf_obj = create_tree_objects(context.collection, branch_mesh, leaf_mesh,
+                                                   None, None,
+                                                   location=context.scene.cursor.location)
+
+        if tree["preset"]:
+            # Stored settings make the tree editable like a generated one
+            context.scene.eztree_loading_preset = True
+            try:
+                write_preset(branch_obj.eztree_props, tree["preset"])
+            finally:
+                context.scene.eztree_loading_preset = False
+        bark_mat, leaf_mat = tree_materials(branch_obj.eztree_props)
+        assign_material(branch_mesh, bark_mat)
+        assign_material(leaf_mesh, leaf_mat)
+
+        bpy.ops.object.select_all(action='DESELECT')
+        branch_obj.select_set(True)
+        context.view_layer.objects.active = branch_obj
+        return {'FINISHED'}
+
+
+class EZTree_OT_StreamToDisk(bpy.types.Operator, ExportHelper):
+    bl_idname = "eztree.stream_to_disk"
+    bl_label = "Stream Tree to Disk"
+    bl_description = ("Generate the active tree's settings straight into a file, chunk by chunk, "
+                      "for trees too large to build in memory")
+    bl_options = {'REGISTER'}
+
+    filename_ext = ".obj"
+    filter_glob: bpy.props.StringProperty(default="*.obj;*.ezts", options={'HIDDEN'})
+
+    format: bpy.props.EnumProperty(
+        name="Format",
+        items=[
+            ('OBJ', "Wavefront OBJ", "Plain text, readable by most tools"),
+            ('EZTS', "Compact Stream", "Quantized, compressed chunks, see Save Tree Geometry"),
+        ],
+        default='OBJ'
+    )
+    chunk_vertices: bpy.props.IntProperty(
+        name="Chunk Vertices",
+        description="Vertices generated before a chunk is written and freed",
+        default=65536, min=1024
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return tree_registry.get_branch(context.active_object) is not None
+
+    def check(self, context):
+        # Keep the extension in step with the format
+        self.filename_ext = ".obj" if self.format == 'OBJ' else ".ezts"
+        return super().check(context)
+
+    def execute(self, context):
+        branch_obj = tree_registry.get_branch(context.active_object)
+        generator = TreeGenerator(props_to_options(branch_obj.eztree_props))
+        chunks = generator.stream(self.chunk_vertices)
+
+        try:
+            if self.format == 'OBJ':
+                count = streaming.write_obj(self.filepath, chunks)
+                self.report({'INFO'}, f"Wrote {count} vertices")
+            else:
+                size = streaming.write_stream(self.filepath, chunks)
+                self.report({'INFO'}, f"Wrote {size / 1024:.0f} KiB")
+        except (OSError, ValueError) as e:
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
+        return {'FINISHED'}
+
+
+def register():
+    bpy.utils.register_class(EZTree_OT_ExportGLTF)
+    bpy.utils.register_class(EZTree_OT_SaveCompact)
+    bpy.utils.register_class(EZTree_OT_LoadCompact)
+    bpy.utils.register_class(EZTree_OT_StreamToDisk)
+
+
+def unregister():
+    bpy.utils.unregister_class(EZTree_OT_StreamToDisk)
+    bpy.utils.unregister_class(EZTree_OT_LoadCompact)
+    bpy.utils.unregister_class(EZTree_OT_SaveCompact)
+    bpy.utils.unregister_class(EZTree_OT_ExportGLTF)
@@ -0,0 +1,78 @@
+import bpy
+from .forest import build_variant_pool, scatter
+from .operators_presets import get_preset_items
+from .presets import load_preset_json, preset_to_options
+from .utils import props_to_options
+
+CURRENT_SETTINGS = "__current__"
+
+_pool_items = []
+
+def get_pool_items(self, context):
+    # Keep a module level reference, Blender does not own dynamic enum strings
+    global _pool_items
+    _pool_items = [(CURRENT_SETTINGS, "Current Settings", "Use the settings in the EZ-Tree panel")]
+    _pool_items += get_preset_items(self, context)
+    return _pool_items
+
+class EZTree_OT_ForestBuildVariants(bpy.types.Operator):
+    bl_idname = "eztree.forest_build_variants"
+    bl_label = "Build Variant Pool"
+    bl_description = "Generate a pool of tree variants (one per seed) that forest placements instance"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    preset: bpy.props.EnumProperty(
+        items=get_pool_items,
+        name="Preset"
+    )
+
+    def execute(self, context):
+        settings = context.scene.eztree_forest
+        
+        if self.preset == CURRENT_SETTINGS:
+            options = props_to_options(context.scene.eztree_props)
+            label = "Current"
+        else:
+            json_data = load_preset_json(self.preset)
+            if not json_data:
+                self.report({'WARNING'}, f"Preset not found: {self.preset}")
+                return {'CANCELLED'}
+            options = preset_to_options(json_data)
+            label = self.preset.replace(".json", "")
+        
+        variants = build_variant_pool(context, options, label, settings.variant_count)
+        self.report({'INFO'}, f"Built {len(variants)} variants for {label}")
+        return {'FINISHED'}
+
+class EZTree_OT_ForestScatter(bpy.types.Operator):
+    bl_idname = "eztree.forest_scatter"
+    bl_label = "Scatter Forest"
+    bl_description = "Distribute instances of the variant pool over the target surface"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        settings = context.scene.eztree_forest
+        if not settings.surface:
+            self.report({'WARNING'}, "Please pick a target surface.")
+            return {'CANCELLED'}
+        
+        count = scatter(context, settings)
+        if count == 0:
+            self.report({'WARNING'}, "Nothing scattered, build a variant pool and check the density.")
+            return {'CANCELLED'}
+        
+        self.report({'INFO'}, f"Scattered {count} trees")
+        return {'FINISHED'}
+
+classes = (
+    EZTree_OT_ForestBuildVariants,
+    EZTree_OT_ForestScatter,
+)
+
+def register():
+    for cls in classes:
+        bpy.utils.register_class(cls)
+
+def unregister():
+    for cls in reversed(classes):
+        bpy.utils.unregister_class(cls)
@@ -1,17 +1,11 @@
 import bpy
-import os
-from .presets import get_preset_path, apply_preset
+from .presets import apply_preset, catalog_items, load_preset_json
+from . import batch
+from . import tree_registry
 
 def get_preset_items(self, context):
-    path = get_preset_path()
-    if not os.path.exists(path):
-        return []
-    
-    files = [f for f in os.listdir(path) if f.endswith(".json")]
-    files.sort()
-    
-    # Items format: (identifier, name, description)
-    return [(f, f.replace(".json", "").replace("_", " ").title(), "") for f in files]
+    # Cached catalog, only stats the preset directories on redraw
+    return catalog_items()
 
 class EZTree_OT_ApplyPresetMenu(bpy.types.Operator):
     bl_idname = "eztree.apply_preset_menu"
@@ -26,12 +20,21 @@ class EZTree_OT_ApplyPresetMenu(bpy.types.Operator):
 
     def execute(self, context):
         # Determine target
-        obj = context.active_object
-        if obj and hasattr(obj, "eztree_props") and "TreeBranch" in obj.name:
+        obj = tree_registry.get_branch(context.active_object)
+        if obj:
              props = obj.eztree_props
         else:
              props = context.scene.eztree_props
 
+        if context.scene.eztree_batch_edit and props != context.scene.eztree_props:
+            json_data = load_preset_json(self.preset_enum)
+            if not json_data:
+                self.report({'WARNING'}, f"Preset not found: {self.preset_enum}")
+                return {'CANCELLED'}
+            count = batch.apply_preset(context, json_data)
+            self.report({'INFO'}, f"Loaded preset: {self.preset_enum} on {count} trees")
+            return {'FINISHED'}
+
         apply_preset(props, self.preset_enum)
         self.report({'INFO'}, f"Loaded preset: {self.preset_enum}")
         return {'FINISHED'}
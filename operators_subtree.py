@@ -0,0 +1,163 @@
+import bpy
+import json
+import random
+from bpy_extras import view3d_utils
+from .generator import TreeGenerator
+from .operators import update_existing_tree
+from .utils import props_to_options
+from . import mesh_registry
+from . import subtree
+from . import tree_registry
+
+
+def read_overrides(props):
+    return json.loads(props.branch.seedOverrides) if props.branch.seedOverrides else {}
+
+
+def write_overrides(context, props, overrides):
+    # Applied by the caller, not by the update callback
+    context.scene.eztree_loading_preset = True
+    try:
+        props.branch.seedOverrides = json.dumps(overrides, sort_keys=True) if overrides else ""
+    finally:
+        context.scene.eztree_loading_preset = False
+
+
+def pick_tree(context, event):
+    """(branch_obj, part, polygon index) of the mesh tree under the mouse, or None."""
+    for region in context.area.regions:
+        if (region.type == 'WINDOW'
+                and region.x <= event.mouse_x < region.x + region.width
+                and region.y <= event.mouse_y < region.y + region.height):
+            break
+    else:
+        return None
+
+    coord = (event.mouse_x - region.x, event.mouse_y - region.y)
+    origin = view3d_utils.region_2d_to_origin_3d(region, region.data, coord)
+    direction = view3d_utils.region_2d_to_vector_3d(region, region.data, coord)
+    hit, _location, _normal, index, obj, _matrix = context.scene.ray_cast(
+        context.evaluated_depsgraph_get(), origin, direction)
+    if not hit:
+        return None
+
+    obj = obj.original
+    branch_obj, leaf_obj = tree_registry.get_pair(obj)
+    if branch_obj is None or branch_obj.type != 'MESH':
+        return None
+    return branch_obj, "leaves" if obj == leaf_obj else "branches", index
+
+
+class EZTree_OT_ReseedBranch(bpy.types.Operator):
+    bl_idname = "eztree.reseed_branch"
+    bl_label = "Reseed Branch"
+    bl_description = ("Click a branch or leaf to give that branch and everything growing from it a new seed, "
+                      "the rest of the tree stays as it is")
+    bl_options = {'REGISTER', 'UNDO'}
+
+    path: bpy.props.StringProperty(name="Branch", options={'HIDDEN'})
+    seed: bpy.props.IntProperty(name="Branch Seed", min=0)
+    reset: bpy.props.BoolProperty(name="Original Seed",
+                                  description="Use the seed derived from the parent branch again")
+
+    def invoke(self, context, event):
+        if context.area is None or context.area.type != 'VIEW_3D':
+            self.report({'WARNING'}, "Pick the branch in a 3D Viewport")
+            return {'CANCELLED'}
+        context.window.cursor_modal_set('EYEDROPPER')
+        context.area.header_text_set("Click a branch or leaf to reseed, Esc to cancel")
+        context.window_manager.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type in {'ESC', 'RIGHTMOUSE'} and event.value == 'PRESS':
+            self._end(context)
+            return {'CANCELLED'}
+        if event.type != 'LEFTMOUSE' or event.value != 'PRESS':
+            # Let the view be navigated while picking
+            return {'PASS_THROUGH'}
+
+        picked = pick_tree(context, event)
+        if picked is None:
+            return {'RUNNING_MODAL'}
+        self._end(context)
+        branch_obj, part, index = picked
+
+        # The range table of the tree as it is shown, see subtree
+        key = mesh_registry.geometry_key(props_to_options(branch_obj.eztree_props))
+        generator = subtree.take(branch_obj, key)
+        if generator is None:
+            generator = TreeGenerator(props_to_options(branch_obj.eztree_props))
+            generator.generate()
+        subtree.remember(branch_obj, key, generator)
+
+        self.path = generator.branch_at_face(index, part) or ""
+        if not self.path:
+            self.report({'WARNING'}, "No branch found under the mouse")
+            return {'CANCELLED'}
+        self.seed = random.getrandbits(31)
+        self.reset = False
+
+        bpy.ops.object.select_all(action='DESELECT')
+        branch_obj.select_set(True)
+        context.view_layer.objects.active = branch_obj
+        return self.execute(context)
+
+    def _end(self, context):
+        context.window.cursor_modal_restore()
+        context.area.header_text_set(None)
+
+    def execute(self, context):
+        branch_obj = tree_registry.get_branch(context.active_object)
+        if branch_obj is None or branch_obj.type != 'MESH' or not self.path:
+            return {'CANCELLED'}
+
+        props = branch_obj.eztree_props
+        generator = subtree.take(branch_obj, mesh_registry.geometry_key(props_to_options(props)))
+        overrides = read_overrides(props)
+        if self.reset:
+            overrides.pop(self.path, None)
+        else:
+            overrides[self.path] = self.seed
+        write_overrides(context, props, overrides)
+
+        options = props_to_options(props)
+        if generator is None:
+            # Nothing to splice into, e.g. after an undo
+            generator = TreeGenerator(options)
+            generator.generate()
+        else:
+            # The cached generator may also be another tree's, see TreeGenerator.copy
+            generator = generator.copy()
+            generator.options = options
+            generator.regenerate_subtree(self.path)
+        update_existing_tree(branch_obj, generated=generator)
+        return {'FINISHED'}
+
+
+class EZTree_OT_ResetBranchSeeds(bpy.types.Operator):
+    bl_idname = "eztree.reset_branch_seeds"
+    bl_label = "Reset Branch Seeds"
+    bl_description = "Give every reseeded branch of the active tree its original seed again"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    @classmethod
+    def poll(cls, context):
+        branch_obj = tree_registry.get_branch(context.active_object)
+        return branch_obj is not None and bool(branch_obj.eztree_props.branch.seedOverrides)
+
+    def execute(self, context):
+        branch_obj = tree_registry.get_branch(context.active_object)
+        # The update callback regenerates the tree
+        branch_obj.eztree_props.branch.seedOverrides = ""
+        return {'FINISHED'}
+
+
+def register():
+    bpy.utils.register_class(EZTree_OT_ReseedBranch)
+    bpy.utils.register_class(EZTree_OT_ResetBranchSeeds)
+
+
+def unregister():
+    bpy.utils.unregister_class(EZTree_OT_ResetBranchSeeds)
+    bpy.utils.unregister_class(EZTree_OT_ReseedBranch)
@@ -1,5 +1,8 @@
 import bpy
-from .wind import add_wind_modifier
+from .wind import WIND_MODIFIER, add_wind_modifier, get_wind_node_group
+from .wind_bake import bake_groups, bake_point_cache, bake_vat
+from .rng import RNG
+from . import tree_registry
 
 class EZTree_OT_AddWind(bpy.types.Operator):
     bl_idname = "eztree.add_wind"
@@ -15,51 +18,105 @@ class EZTree_OT_AddWind(bpy.types.Operator):
         
         add_wind_modifier(obj)
         
-        # Add driver for Time?
-        # Or just let user animate it. Driver is easier for instant gratification.
-        mod = obj.modifiers.get("EZTree_Wind")
-        if mod:
-            # Add driver to input 2 (Time) - Index depends on inputs
-            # Input 0: Geometry, 1: Time
-            # mod.node_group.inputs doesn't correspond 1:1 to mod properties dictionary access
-            # usually mod["Socket_Name"]
-            
-            # Find the identifier for "Time"
-            # It's usually "Socket_2" or similar internal name.
-            # But we can access inputs by name via the node group interface logic implicitly.
-            # Actually, `mod[identifier]` is how we set values.
-            
-            # Let's frame # driver
-            # We need to know the property name.
-            # Usually we can look at `mod.keys()`
-            # Safe bet: #frame / 24.
-            # Find "Time" input identifier
-            ng = mod.node_group
-            time_id = None
-            
-            # Blender 4.0+
-            if hasattr(ng, "interface"):
-                for item in ng.interface.items_tree:
-                    if item.name == "Time":
-                        time_id = item.identifier
-                        break
-            # Blender < 4.0
-            elif hasattr(ng, "inputs"):
-                for item in ng.inputs:
-                    if item.name == "Time":
-                        time_id = item.identifier
-                        break
-            
-            if time_id:
-                # Add Driver: frame / 24.0
-                d = mod.driver_add(f'["{time_id}"]')
-                d.driver.expression = "frame / 24.0"
+        return {'FINISHED'}
+
+class EZTree_OT_AddWindSelected(bpy.types.Operator):
+    bl_idname = "eztree.add_wind_selected"
+    bl_label = "Add Wind to Selected"
+    bl_description = "Add the wind modifier to every selected tree and its leaves"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    phase_spread: bpy.props.FloatProperty(
+        name="Phase Spread",
+        description="Random time offset in seconds per tree, so neighbours do not sway in sync",
+        default=10.0, min=0.0,
+    )
+    seed: bpy.props.IntProperty(name="Seed", default=0)
+
+    def execute(self, context):
+        # The branch and leaf objects of a tree sway with the same phase,
+        # other meshes get a phase of their own
+        groups = []
+        seen = set()
+        for obj in context.selected_objects:
+            branch_obj, leaf_obj = tree_registry.get_pair(obj)
+            group = (branch_obj, leaf_obj) if branch_obj else (obj,)
+            if group[0].name not in seen:
+                seen.add(group[0].name)
+                groups.append(group)
+        if not groups:
+            self.report({'WARNING'}, "Please select mesh objects.")
+            return {'CANCELLED'}
+        
+        node_group = get_wind_node_group()
+        rng = RNG(self.seed)
+        count = 0
+        for group in groups:
+            phase = rng.random(self.phase_spread)
+            for obj in group:
+                if obj and add_wind_modifier(obj, node_group, phase):
+                    count += 1
+        
+        self.report({'INFO'}, f"Added wind to {count} objects")
+        return {'FINISHED'}
 
+class EZTree_OT_BakeWind(bpy.types.Operator):
+    bl_idname = "eztree.bake_wind"
+    bl_label = "Bake Wind"
+    bl_description = "Bake the wind motion of the selected objects over a loop of frames"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    mode: bpy.props.EnumProperty(
+        name="Mode",
+        items=[
+            ('VAT', "Vertex Animation Texture", "Offsets quantized to a 16-bit texture, played back by a lookup"),
+            ('PC2', "Point Cache", "Positions in a .pc2 file read by a Mesh Cache modifier"),
+        ],
+        default='VAT',
+    )
+    frame_start: bpy.props.IntProperty(name="Start", default=1)
+    frame_end: bpy.props.IntProperty(name="End", default=48)
+    loop_blend: bpy.props.IntProperty(
+        name="Loop Blend",
+        description="Frames cross-faded at the start so the loop wraps without a jump",
+        default=12, min=0,
+    )
+
+    def invoke(self, context, event):
+        self.frame_start = context.scene.frame_start
+        self.frame_end = context.scene.frame_end
+        return context.window_manager.invoke_props_dialog(self)
+
+    def execute(self, context):
+        objects = [obj for obj in context.selected_objects
+                   if obj.type == 'MESH' and obj.modifiers.get(WIND_MODIFIER)]
+        if not objects:
+            self.report({'WARNING'}, "Please select objects with wind added.")
+            return {'CANCELLED'}
+        if self.frame_end < self.frame_start:
+            self.report({'WARNING'}, "End frame is before start frame.")
+            return {'CANCELLED'}
+        
+        # Objects sharing a mesh and a phase share one bake
+        groups = bake_groups(objects)
+        
+        bake = bake_vat if self.mode == 'VAT' else bake_point_cache
+        try:
+            for name, group in groups.items():
+                bake(context, name, group, self.frame_start, self.frame_end, self.loop_blend)
+        except ValueError as e:
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
         
+        self.report({'INFO'}, f"Baked wind for {len(objects)} objects into {len(groups)} caches")
         return {'FINISHED'}
 
 def register():
     bpy.utils.register_class(EZTree_OT_AddWind)
+    bpy.utils.register_class(EZTree_OT_AddWindSelected)
+    bpy.utils.register_class(EZTree_OT_BakeWind)
 
 def unregister():
+    bpy.utils.unregister_class(EZTree_OT_BakeWind)
+    bpy.utils.unregister_class(EZTree_OT_AddWindSelected)
     bpy.utils.unregister_class(EZTree_OT_AddWind)
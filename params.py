@@ -25,6 +25,14 @@ class BranchOptions:
     start: Dict[int, float] = field(default_factory=lambda: {1: 0.4, 2: 0.3, 3: 0.3})
     taper: Dict[int, float] = field(default_factory=lambda: {0: 0.7, 1: 0.7, 2: 0.7, 3: 0.7})
     twist: Dict[int, float] = field(default_factory=lambda: {0: 0, 1: 0, 2: 0, 3: 0})
+    # Branches and leaves smaller than pruneSize world units, or prunePixels
+    # pixels seen from pruneDistance, are not generated. 0 disables each.
+    pruneSize: float = 0.0
+    prunePixels: float = 0.0
+    pruneDistance: float = 50.0
+    # Seeds of single branches by branch path (see Branch.path), in place of
+    # the one derived from the parent. Children follow from the new seed.
+    seedOverrides: Dict[str, int] = field(default_factory=dict)
 
 @dataclass
 class LeafOptions:
@@ -37,6 +45,9 @@ class LeafOptions:
     sizeVariance: float = 0.7
     tint: int = 0xffffff
     alphaTest: float = 0.5
+    cullHidden: bool = False
+    cullVisibility: float = 0.1
+    cullSamples: int = 16
 
 class TreeOptions:
     def __init__(self):
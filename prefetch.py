@@ -0,0 +1,136 @@
+import bpy
+import copy
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from bpy.app.handlers import persistent
+from .generator import TreeGenerator
+from .utils import options_hash
+from . import mesh_registry
+
+# Generated neighbours kept around, oldest are dropped first
+CACHE_SIZE = 16
+
+# Speculative generation of the seeds next to the one being shown, so
+# scrubbing the seed applies finished geometry instead of generating.
+# Everything is keyed by the geometry key, the seedless hash decides when the
+# neighbours are no longer useful.
+_lock = threading.Lock()
+_cache = OrderedDict()   # geometry key -> TreeGenerator that has run
+_pending = {}            # geometry key -> Future
+_state = {"base": None, "token": 0}
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # One worker: prefetching must not compete with the tree being edited
+        _executor = ThreadPoolExecutor(max_workers=1)
+    return _executor
+
+
+def _generate(options, token):
+    generator = TreeGenerator(options)
+    # Stop early once the prefetch has been cancelled
+    if not generator.generate(lambda *args: _state["token"] == token):
+        return None
+    return generator
+
+
+def _store(key, token, future):
+    with _lock:
+        _pending.pop(key, None)
+        if future.cancelled() or future.exception() or token != _state["token"]:
+            return
+        generator = future.result()
+        if generator is None:
+            return
+        _cache[key] = generator
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def cancel():
+    """Drop queued and cached neighbours, running ones stop at their next branch."""
+    with _lock:
+        _state["token"] += 1
+        _state["base"] = None
+        futures = list(_pending.values())
+        _pending.clear()
+        _cache.clear()
+    # Outside the lock: a cancelled future runs _store right away
+    for future in futures:
+        future.cancel()
+
+
+def schedule(options, reach):
+    """Queue generation of seed-1..seed-reach and seed+1..seed+reach of options."""
+    base = options_hash(options, include_seed=False)
+    if base != _state["base"]:
+        # Something other than the seed changed, the neighbours are stale
+        cancel()
+        _state["base"] = base
+
+    token = _state["token"]
+    for distance in range(1, reach + 1):
+        for seed in (options.seed + distance, options.seed - distance):
+            neighbour = copy.deepcopy(options)
+            neighbour.seed = seed
+            key = mesh_registry.geometry_key(neighbour)
+            with _lock:
+                if key in _cache or key in _pending:
+                    continue
+            if mesh_registry.lookup(key)[0]:
+                continue
+            future = _get_executor().submit(_generate, neighbour, token)
+            with _lock:
+                _pending[key] = future
+            future.add_done_callback(lambda f, key=key: _store(key, token, f))
+
+
+def take(key):
+    """Return the prefetched generator for key, or None.
+
+    The generator leaves the cache, the caller owns it. A neighbour that is
+    being generated right now is waited for, it finishes sooner than a fresh
+    generation would. One still queued behind other neighbours is cancelled,
+    the caller generates it directly.
+    """
+    with _lock:
+        generator = _cache.pop(key, None)
+        future = _pending.get(key)
+    if generator is not None or future is None:
+        return generator
+    # Outside the lock: a cancelled future runs _store right away
+    if future.cancel():
+        return None
+    try:
+        generator = future.result()
+    except Exception:
+        return None
+    with _lock:
+        # Cached by _store when it completed
+        _cache.pop(key, None)
+    return generator
+
+
+@persistent
+def _on_load_post(*args):
+    cancel()
+
+
+def register():
+    if _on_load_post not in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.append(_on_load_post)
+
+
+def unregister():
+    global _executor
+    if _on_load_post in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(_on_load_post)
+    cancel()
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
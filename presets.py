@@ -1,26 +1,127 @@
 import bpy
 import json
 import os
-from .utils import props_to_options
-from .enums import TreeType, BarkType, LeafType, Billboard
+# preset_to_options and hex_to_rgb live in utils so they import without bpy
+from .utils import props_to_options, preset_to_options, hex_to_rgb
+
+PRESET_SUBDIR = "eztree"
 
 def get_preset_path():
     return os.path.join(os.path.dirname(__file__), "presets")
 
+def get_preset_dirs():
+    """Bundled presets first, then presets/eztree in the user and extra script paths.
+
+    A user preset with the same file name as a bundled one replaces it.
+    """
+    dirs = [get_preset_path()]
+    for path in bpy.utils.preset_paths(PRESET_SUBDIR):
+        if path not in dirs:
+            dirs.append(path)
+    return dirs
+
+# Catalog of preset files, rescanned only when one of the directories changes:
+# dir path -> mtime, preset name -> (path, mtime), and parsed presets by path
+_dir_mtimes = {}
+_preset_files = {}
+_parsed = {}
+# Blender does not own dynamic enum strings, keep the items alive here
+_preset_items = []
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def _scan():
+    global _preset_items
+    dirs = get_preset_dirs()
+    mtimes = {path: _mtime(path) for path in dirs}
+    if mtimes == _dir_mtimes:
+        return
+
+    _dir_mtimes.clear()
+    _dir_mtimes.update(mtimes)
+    _preset_files.clear()
+    for path in dirs:
+        if mtimes[path] is None:
+            continue
+        for f in os.listdir(path):
+            if f.endswith(".json"):
+                _preset_files[f] = os.path.join(path, f)
+
+    # Forget presets whose file is gone
+    for path in set(_parsed) - set(_preset_files.values()):
+        del _parsed[path]
+
+    # Items format: (identifier, name, description)
+    _preset_items = [(f, f.replace(".json", "").replace("_", " ").title(), "")
+                     for f in sorted(_preset_files)]
+
+def catalog_items():
+    _scan()
+    return _preset_items
+
+def validate_preset(json_data):
+    # Raises on enum values and structures the options cannot take
+    if not isinstance(json_data, dict):
+        raise ValueError("preset is not a JSON object")
+    preset_to_options(json_data)
+
 def load_preset_json(name):
-    path = os.path.join(get_preset_path(), name)
-    if not os.path.exists(path):
-        print(f"Preset not found: {path}")
+    """Return the parsed preset, read from disk only when the file changed.
+
+    The returned dict is shared by every caller and must not be modified.
+    """
+    _scan()
+    path = _preset_files.get(name)
+    mtime = _mtime(path) if path else None
+    if mtime is None:
+        print(f"Preset not found: {name}")
         return None
-    
-    with open(path, 'r') as f:
-        return json.load(f)
+
+    cached = _parsed.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    try:
+        with open(path, 'r') as f:
+            json_data = json.load(f)
+        validate_preset(json_data)
+    except (OSError, ValueError, TypeError, KeyError, AttributeError) as e:
+        print(f"Invalid preset {path}: {e}")
+        json_data = None
+
+    # Invalid files are cached too, so they are not re-parsed on every apply
+    _parsed[path] = (mtime, json_data)
+    return json_data
 
 def apply_preset(props, preset_name):
+    """Write a preset into props as one change.
+
+    Property update callbacks are suspended while the values are written, then
+    an object owning props is regenerated and its materials updated once.
+    """
     json_data = load_preset_json(preset_name)
     if not json_data:
         return
 
+    scene = bpy.context.scene
+    scene.eztree_loading_preset = True
+    try:
+        write_preset(props, json_data)
+    finally:
+        scene.eztree_loading_preset = False
+
+    owner = props.id_data
+    if isinstance(owner, bpy.types.Object):
+        from .operators import update_existing_tree, update_existing_materials
+        update_existing_tree(owner)
+        update_existing_materials(owner)
+
+def write_preset(props, json_data):
+    """Set every value of the preset on props, the callbacks fire as usual."""
     # Helper function to set property safely
     def set_prop(obj, key, val):
         if hasattr(obj, key):
@@ -72,6 +173,9 @@ def apply_preset(props, preset_name):
             b_val = (hex_val & 255) / 255.0
             props.leaves.tint = (r, g, b_val)
         if 'alphaTest' in l: props.leaves.alphaTest = l['alphaTest']
+        for key in ('cullHidden', 'cullVisibility', 'cullSamples'):
+            if key in l:
+                setattr(props.leaves, key, l[key])
 
     # Branch
     if 'branch' in json_data:
@@ -96,6 +200,10 @@ def apply_preset(props, preset_name):
         if 'start' in br: map_dict_prop(br['start'], 'start', props.branch)
         if 'taper' in br: map_dict_prop(br['taper'], 'taper', props.branch)
         if 'twist' in br: map_dict_prop(br['twist'], 'twist', props.branch)
+        for key in ('pruneSize', 'prunePixels', 'pruneDistance'):
+            if key in br:
+                setattr(props.branch, key, br[key])
+        props.branch.seedOverrides = json.dumps(br['seedOverrides']) if br.get('seedOverrides') else ""
         
         if 'force' in br:
             f = br['force']
@@ -5,39 +5,69 @@ from bpy.props import (
 )
 from .enums import BarkType, Billboard, LeafType, TreeType
 
+def _tree_owner(group):
+    # Only props on a tree object drive a live update, not Scene props or
+    # the unused props every other object carries
+    from . import tree_registry
+    owner = group.id_data
+    if isinstance(owner, bpy.types.Object) and tree_registry.is_tree(owner):
+        return owner
+    return None
+
 # Callback for property updates (Geometry)
 def update_tree(self, context):
-    # Avoid updates when not appropriate or if checks fail
-    if not context.active_object or getattr(context.scene, "eztree_loading_preset", False):
+    # A preset writes many values, apply_preset updates once when it is done.
+    # The tree is the owner of the props, which need not be the active object.
+    if getattr(context.scene, "eztree_loading_preset", False):
         return
     
-    # Check if the active object is an EZ-Tree object (has the props)
-    # The 'self' here is the PropertyGroup (e.g. EZTree_BarkProps), not the Object.
-    # We need to find the root object.
-    # Usually we can't easily traverse up from PropertyGroup to Object owner in `update`.
-    # BUT, if we edit from UI, context.active_object is the one being edited.
-    
-    # We trigger an operator or function to regenerate logic.
-    # "eztree.regenerate"
-    
-    # Verify we are actually editing an object with our props
-    if hasattr(context.active_object, "eztree_props"):
+    # The 'self' here is the PropertyGroup (e.g. EZTree_BarkProps), its id_data
+    # is the Object (live tree) or Scene (settings for new trees) owning it.
+    owner = _tree_owner(self)
+    if owner:
          # Trigger regeneration
-         # We use a timer or direct call? Direct call might lag UI.
-         # For "Live" feel, direct is okay for simple trees, maybe laggy for complex.
-         # Let's try direct call to an update function.
-         # We need to import the regeneration logic.
+         # Direct call, for "Live" feel. Might lag for complex trees.
+         if context.scene.eztree_batch_edit:
+             from . import batch
+             batch.propagate(context, owner, geometry=True)
+             return
          from .operators import update_existing_tree
-         update_existing_tree(context.active_object)
+         update_existing_tree(owner)
+         if context.scene.eztree_prefetch:
+             from . import prefetch
+             from .utils import props_to_options
+             prefetch.schedule(props_to_options(owner.eztree_props), context.scene.eztree_prefetch_range)
 
 # Callback for material updates (Performance Optimization)
 def update_material(self, context):
-    if not context.active_object or getattr(context.scene, "eztree_loading_preset", False):
+    if getattr(context.scene, "eztree_loading_preset", False):
         return
     
-    if hasattr(context.active_object, "eztree_props"):
+    owner = _tree_owner(self)
+    if owner:
+        # Only rebuild the material whose props were edited
+        bark = isinstance(self, EZTree_BarkProps)
+        leaves = isinstance(self, EZTree_LeafProps)
+        if context.scene.eztree_batch_edit:
+            from . import batch
+            batch.propagate(context, owner, geometry=False, bark=bark, leaves=leaves)
+            return
         from .operators import update_existing_materials
-        update_existing_materials(context.active_object)
+        update_existing_materials(owner, bark=bark, leaves=leaves)
+
+def update_batch_edit(self, context):
+    from . import batch
+    # Baseline for the first edit, later ones are tracked by propagate
+    batch.track(context.active_object if self.eztree_batch_edit else None)
+
+def update_prefetch(self, context):
+    if not self.eztree_prefetch:
+        from . import prefetch
+        prefetch.cancel()
+
+def update_texture_proxies(self, context):
+    from . import textures
+    textures.refresh()
 
 # Helper to map enums to Blender EnumProperty items
 def enum_to_items(enum_cls):
@@ -103,6 +133,17 @@ class EZTree_BranchProps(bpy.types.PropertyGroup):
     twist_1: FloatProperty(name="Twist L1", default=0, update=update_tree)
     twist_2: FloatProperty(name="Twist L2", default=0, update=update_tree)
     twist_3: FloatProperty(name="Twist L3", default=0, update=update_tree)
+    
+    pruneSize: FloatProperty(name="Min Size", default=0.0, min=0, unit='LENGTH', update=update_tree,
+                             description="Skip branches and leaves smaller than this, 0 keeps all")
+    prunePixels: FloatProperty(name="Min Pixels", default=0.0, min=0, update=update_tree,
+                               description="Skip branches and leaves smaller than this many pixels "
+                                           "on a 1080p screen at the view distance, 0 keeps all")
+    pruneDistance: FloatProperty(name="View Distance", default=50.0, min=0.01, unit='LENGTH', update=update_tree,
+                                 description="Camera distance Min Pixels is measured at")
+    # JSON object of branch path -> seed, set by the Reseed Branch operator
+    seedOverrides: StringProperty(name="Branch Seeds", default="", update=update_tree,
+                                  description="Seeds of branches reseeded on their own")
 
 class EZTree_LeafProps(bpy.types.PropertyGroup):
     type: EnumProperty(items=enum_to_items(LeafType), name="Leaf Type", default=LeafType.Oak.value, update=update_material)
@@ -114,6 +155,12 @@ class EZTree_LeafProps(bpy.types.PropertyGroup):
     sizeVariance: FloatProperty(name="Size Variance", default=0.7, update=update_tree)
     tint: FloatVectorProperty(name="Tint", subtype='COLOR', default=(1,1,1), min=0, max=1, update=update_material)
     alphaTest: FloatProperty(name="Alpha Test", default=0.5, min=0, max=1, update=update_material)
+    cullHidden: BoolProperty(name="Cull Hidden Leaves", default=False, update=update_tree,
+                             description="Remove leaves buried inside the crown, tested by ray casts")
+    cullVisibility: FloatProperty(name="Min Visibility", default=0.1, min=0, max=1, subtype='FACTOR', update=update_tree,
+                                  description="Share of sample directions a leaf must see out of the tree in")
+    cullSamples: IntProperty(name="Samples", default=16, min=4, max=256, update=update_tree,
+                             description="Directions tested per leaf")
 
 class EZTree_Props(bpy.types.PropertyGroup):
     seed: IntProperty(name="Seed", default=0, update=update_tree)
@@ -121,23 +168,80 @@ class EZTree_Props(bpy.types.PropertyGroup):
     bark: PointerProperty(type=EZTree_BarkProps)
     branch: PointerProperty(type=EZTree_BranchProps)
     leaves: PointerProperty(type=EZTree_LeafProps)
+    # Applies when a tree is created, existing trees keep updating in their own mode
+    output_mode: EnumProperty(
+        name="Output",
+        items=[
+            ('MESH', "Mesh", "Branches and leaves built in Python as meshes"),
+            ('CURVES', "Curves", "Branch skeleton as curves and leaf points, meshed by Geometry Nodes"),
+        ],
+        default='MESH')
+
+def poll_mesh_object(self, obj):
+    return obj.type == 'MESH'
+
+class EZTree_ForestProps(bpy.types.PropertyGroup):
+    surface: PointerProperty(type=bpy.types.Object, name="Surface", poll=poll_mesh_object,
+                             description="Mesh to scatter trees over")
+    variant_count: IntProperty(name="Variants", default=4, min=1, max=64,
+                               description="Number of seeds generated per pool")
+    density: FloatProperty(name="Density", default=0.01, min=0, precision=4,
+                           description="Trees per square unit of surface")
+    max_count: IntProperty(name="Max Trees", default=500, min=1)
+    scale_min: FloatProperty(name="Scale Min", default=0.8, min=0.01)
+    scale_max: FloatProperty(name="Scale Max", default=1.2, min=0.01)
+    seed: IntProperty(name="Scatter Seed", default=0)
 
 def register():
     bpy.utils.register_class(EZTree_BarkProps)
     bpy.utils.register_class(EZTree_BranchProps)
     bpy.utils.register_class(EZTree_LeafProps)
     bpy.utils.register_class(EZTree_Props)
+    bpy.utils.register_class(EZTree_ForestProps)
     
     # Register on Object as well
     bpy.types.Object.eztree_props = PointerProperty(type=EZTree_Props)
     # Keeping scene for initial creation defaults? Actually, we can just use a temporary operator prop or 
     # keep using Scene props for the "create new" Settings, and then copy them to Object.
     bpy.types.Scene.eztree_props = PointerProperty(type=EZTree_Props)
+    bpy.types.Scene.eztree_forest = PointerProperty(type=EZTree_ForestProps)
+    bpy.types.Scene.eztree_texture_proxies = BoolProperty(
+        name="Viewport Texture Proxies",
+        description="Use downscaled bark and leaf textures in the viewport, full resolution is swapped in for rendering",
+        default=True,
+        update=update_texture_proxies,
+    )
+    bpy.types.Scene.eztree_batch_edit = BoolProperty(
+        name="Edit Selected Trees",
+        description="Apply changes to the active tree and presets to all selected trees",
+        default=False,
+        update=update_batch_edit,
+    )
+    bpy.types.Scene.eztree_prefetch = BoolProperty(
+        name="Prefetch Seeds",
+        description="Generate the neighbouring seeds of the edited tree in the background, so stepping the seed is instant",
+        default=False,
+        update=update_prefetch,
+    )
+    bpy.types.Scene.eztree_prefetch_range = IntProperty(
+        name="Range",
+        description="Number of seeds prefetched on each side of the current one",
+        default=2, min=1, max=8,
+    )
+    # Set while several values are written at once, property callbacks skip their update
+    bpy.types.Scene.eztree_loading_preset = BoolProperty(default=False, options={'HIDDEN', 'SKIP_SAVE'})
 
 def unregister():
     del bpy.types.Object.eztree_props
     del bpy.types.Scene.eztree_props
-    
+    del bpy.types.Scene.eztree_texture_proxies
+    del bpy.types.Scene.eztree_forest
+    del bpy.types.Scene.eztree_loading_preset
+    del bpy.types.Scene.eztree_batch_edit
+    del bpy.types.Scene.eztree_prefetch
+    del bpy.types.Scene.eztree_prefetch_range
+    
+    bpy.utils.unregister_class(EZTree_ForestProps)
     bpy.utils.unregister_class(EZTree_Props)
     bpy.utils.unregister_class(EZTree_LeafProps)
     bpy.utils.unregister_class(EZTree_BranchProps)
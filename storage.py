@@ -0,0 +1,313 @@
+"""Compact storage of generated tree geometry.
+
+Standard library only, no bpy. Per part ('branches', 'leaves'):
+
+- positions: 16-bit, quantized relative to the part bounds
+- normals (when the part has them): octahedral, two 16-bit components
+- UVs: 16-bit, quantized relative to the UV bounds
+- quad indices: delta to the previous index, zigzag and varint coded. Ring
+  indices step regularly, so nearly every delta fits a single byte.
+
+The whole payload is then compressed with zstd when the zstandard module is
+installed, zlib otherwise. Topology round-trips exactly, positions and UVs
+within half a quantization step, see verify().
+"""
+import json
+import math
+import struct
+import sys
+import zlib
+from array import array
+from types import SimpleNamespace
+from .utils import options_to_json
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIC = b"EZTQ"
+FORMAT_VERSION = 1
+PARTS = ("branches", "leaves")
+QUANT_MAX = 65535
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_ZSTD = 2
+COMPRESSIONS = {'NONE': COMPRESSION_NONE, 'ZLIB': COMPRESSION_ZLIB, 'ZSTD': COMPRESSION_ZSTD}
+
+_HEADER = struct.Struct("<4sHBx")
+_PART = struct.Struct("<IIB3x")
+
+
+def _le(values):
+    # Stored little endian whatever the platform
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_le(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def bounds(values, size):
+    """Per component (min, max) of a flat buffer of size components per element."""
+    if not values:
+        return [0.0] * size, [0.0] * size
+    return ([min(values[i::size]) for i in range(size)],
+            [max(values[i::size]) for i in range(size)])
+
+
+def quantize(values, size, lo, hi):
+    out = array('H', [0]) * len(values)
+    for i in range(size):
+        extent = hi[i] - lo[i]
+        scale = QUANT_MAX / extent if extent > 0 else 0.0
+        for p in range(i, len(values), size):
+            out[p] = int((values[p] - lo[i]) * scale + 0.5)
+    return out
+
+
+def dequantize(values, size, lo, hi):
+    out = array('f', [0.0]) * len(values)
+    for i in range(size):
+        step = (hi[i] - lo[i]) / QUANT_MAX
+        for p in range(i, len(values), size):
+            out[p] = lo[i] + values[p] * step
+    return out
+
+
+def oct_encode(normals):
+    """Unit normals (xyz) to octahedral coordinates, two 16-bit values each."""
+    out = array('H', [0]) * (len(normals) // 3 * 2)
+    for n in range(len(normals) // 3):
+        x, y, z = normals[n * 3:n * 3 + 3]
+        s = abs(x) + abs(y) + abs(z) or 1.0
+        u, v = x / s, y / s
+        if z < 0.0:
+            # Fold the lower hemisphere over the diagonals
+            u, v = (1.0 - abs(v)) * math.copysign(1.0, u), (1.0 - abs(u)) * math.copysign(1.0, v)
+        out[n * 2] = int((u * 0.5 + 0.5) * QUANT_MAX + 0.5)
+        out[n * 2 + 1] = int((v * 0.5 + 0.5) * QUANT_MAX + 0.5)
+    return out
+
+
+def oct_decode(encoded):
+    out = array('f', [0.0]) * (len(encoded) // 2 * 3)
+    for n in range(len(encoded) // 2):
+        u = encoded[n * 2] / QUANT_MAX * 2.0 - 1.0
+        v = encoded[n * 2 + 1] / QUANT_MAX * 2.0 - 1.0
+        z = 1.0 - abs(u) - abs(v)
+        if z < 0.0:
+            u, v = (1.0 - abs(v)) * math.copysign(1.0, u), (1.0 - abs(u)) * math.copysign(1.0, v)
+        length = math.sqrt(u * u + v * v + z * z)
+        out[n * 3:n * 3 + 3] = array('f', (u / length, v / length, z / length))
+    return out
+
+
+def encode_indices(indices):
+    """Delta, zigzag and varint code an index buffer."""
+    out = bytearray()
+    previous = 0
+    for index in indices:
+        delta = index - previous
+        previous = index
+        value = delta << 1 if delta >= 0 else ((-delta) << 1) - 1
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+    return bytes(out)
+
+
+def decode_indices(data, count):
+    indices = array('I', [0]) * count
+    previous = 0
+    pos = 0
+    for i in range(count):
+        value = 0
+        shift = 0
+        while True:
+            byte = data[pos]
+            pos += 1
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        previous += (value >> 1) if not value & 1 else -((value + 1) >> 1)
+        indices[i] = previous
+    return indices
+
+
+def _encode_part(out, verts, indices, uvs, normals):
+    count = len(verts) // 3
+    has_normals = bool(normals) and len(normals) == len(verts)
+    out += _PART.pack(count, len(indices), has_normals)
+
+    lo, hi = bounds(verts, 3)
+    out += struct.pack("<6f", *lo, *hi)
+    out += _le(quantize(verts, 3, lo, hi))
+    if has_normals:
+        out += _le(oct_encode(normals))
+    lo, hi = bounds(uvs, 2)
+    out += struct.pack("<4f", *lo, *hi)
+    out += _le(quantize(uvs, 2, lo, hi))
+
+    coded = encode_indices(indices)
+    out += struct.pack("<I", len(coded))
+    out += coded
+
+
+def _decode_part(data, pos):
+    count, index_count, has_normals = _PART.unpack_from(data, pos)
+    pos += _PART.size
+
+    def take(size):
+        nonlocal pos
+        chunk = data[pos:pos + size]
+        pos += size
+        return chunk
+
+    box = struct.unpack_from("<6f", data, pos)
+    pos += 24
+    verts = dequantize(_from_le('H', take(count * 6)), 3, box[:3], box[3:])
+    normals = oct_decode(_from_le('H', take(count * 4))) if has_normals else array('f')
+    box = struct.unpack_from("<4f", data, pos)
+    pos += 16
+    uvs = dequantize(_from_le('H', take(count * 4)), 2, box[:2], box[2:])
+    size, = struct.unpack_from("<I", data, pos)
+    pos += 4
+    indices = decode_indices(take(size), index_count)
+    return SimpleNamespace(verts=verts, indices=indices, uvs=uvs, normals=normals), pos
+
+
+def _compress(payload, compression):
+    if compression == COMPRESSION_ZSTD:
+        return zstandard.ZstdCompressor(level=19).compress(payload)
+    if compression == COMPRESSION_ZLIB:
+        return zlib.compress(payload, 9)
+    return payload
+
+
+def _decompress(payload, compression):
+    if compression == COMPRESSION_ZSTD:
+        if zstandard is None:
+            raise ValueError("Stored with zstd, the zstandard module is not installed")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    if compression == COMPRESSION_ZLIB:
+        return zlib.decompress(payload)
+    return payload
+
+
+def encode(tree, compression=None):
+    """Encode a generator (or anything with its part buffers) to bytes.
+
+    compression is 'ZSTD', 'ZLIB' or 'NONE', the best available by default.
+    The tree options are stored along, as preset JSON.
+    """
+    if compression is None:
+        compression = 'ZSTD' if zstandard is not None else 'ZLIB'
+    if compression == 'ZSTD' and zstandard is None:
+        raise ValueError("zstd compression needs the zstandard module")
+    method = COMPRESSIONS[compression]
+
+    payload = bytearray()
+    options = getattr(tree, "options", None)
+    preset = json.dumps(options_to_json(options)).encode() if options is not None else b""
+    payload += struct.pack("<I", len(preset))
+    payload += preset
+    for part in PARTS:
+        _encode_part(payload,
+                     getattr(tree, f"{part}_verts"),
+                     getattr(tree, f"{part}_indices"),
+                     getattr(tree, f"{part}_uvs"),
+                     getattr(tree, f"{part}_normals", None))
+    return _HEADER.pack(MAGIC, FORMAT_VERSION, method) + _compress(bytes(payload), method)
+
+
+def decode(data):
+    """Decode bytes from encode() to {"preset": dict or None, part: buffers}.
+
+    Part buffers have verts, indices, uvs and normals (empty when not stored).
+    """
+    magic, version, method = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not an EZ-Tree geometry file")
+    if version > FORMAT_VERSION:
+        raise ValueError(f"Geometry format {version} is newer than this add-on supports")
+
+    payload = _decompress(data[_HEADER.size:], method)
+    size, = struct.unpack_from("<I", payload)
+    preset = json.loads(payload[4:4 + size]) if size else None
+    tree = {"preset": preset}
+    pos = 4 + size
+    for part in PARTS:
+        tree[part], pos = _decode_part(payload, pos)
+    return tree
+
+
+def save(filepath, tree, compression=None):
+    data = encode(tree, compression)
+    with open(filepath, "wb") as f:
+        f.write(data)
+    return len(data)
+
+
+def load(filepath):
+    with open(filepath, "rb") as f:
+        return decode(f.read())
+
+
+def verify(tree, data):
+    """Check that data decodes back to tree within the quantization bounds.
+
+    Topology must match exactly, positions and UVs within half a step of
+    their bounds and normals within a small angle. Returns the largest
+    errors per part, raises ValueError on a mismatch.
+    """
+    decoded = decode(data)
+    report = {}
+    for part in PARTS:
+        verts = getattr(tree, f"{part}_verts")
+        uvs = getattr(tree, f"{part}_uvs")
+        normals = getattr(tree, f"{part}_normals", None)
+        stored = decoded[part]
+
+        if list(stored.indices) != list(getattr(tree, f"{part}_indices")):
+            raise ValueError(f"{part}: indices differ")
+        if len(stored.verts) != len(verts) or len(stored.uvs) != len(uvs):
+            raise ValueError(f"{part}: vertex count differs")
+
+        errors = {}
+        for name, original, restored, size in (("position", verts, stored.verts, 3),
+                                               ("uv", uvs, stored.uvs, 2)):
+            lo, hi = bounds(original, size)
+            # Half a step, plus float32 rounding of the bounds and the result
+            tolerance = max(h - l for l, h in zip(lo, hi)) / QUANT_MAX * 0.5
+            tolerance += 1e-6 * max([abs(v) for v in lo + hi] + [1.0])
+            error = max((abs(a - b) for a, b in zip(original, restored)), default=0.0)
+            if error > tolerance:
+                raise ValueError(f"{part}: {name} error {error:g} over {tolerance:g}")
+            errors[name] = error
+
+        if normals and len(normals) == len(verts):
+            angle = 0.0
+            for n in range(0, len(normals), 3):
+                ax, ay, az = normals[n:n + 3]
+                bx, by, bz = stored.normals[n:n + 3]
+                # atan2 of cross and dot stays accurate for tiny angles, acos does not
+                cross = math.sqrt((ay * bz - az * by) ** 2 + (az * bx - ax * bz) ** 2 + (ax * by - ay * bx) ** 2)
+                angle = max(angle, math.atan2(cross, ax * bx + ay * by + az * bz))
+            angle = math.degrees(angle)
+            # 16-bit octahedral coding stays well under this
+            if angle > 0.01:
+                raise ValueError(f"{part}: normal error {angle:g} degrees")
+            errors["normal_degrees"] = angle
+        report[part] = errors
+    return report
@@ -0,0 +1,97 @@
+"""Writers for TreeGenerator.stream(), appending each chunk to disk.
+
+Standard library only, no bpy. Peak memory is one chunk of geometry plus
+the branch queue, whatever the size of the tree.
+"""
+import struct
+from . import storage
+
+STREAM_MAGIC = b"EZTS"
+STREAM_VERSION = 1
+_RECORD = struct.Struct("<I")
+
+
+def write_obj(filepath, chunks):
+    """Write streamed chunks to a Wavefront OBJ file, returns the vertex count.
+
+    Branches and leaves go to the "branches" and "leaves" groups. OBJ
+    indices count every vertex written before, whatever its part, so each
+    part's global offset is mapped to the position it was written at.
+    """
+    written = 0
+    written_normals = 0
+    with open(filepath, "w") as f:
+        f.write("# EZ-Tree\n")
+        for chunk in chunks:
+            for part in storage.PARTS:
+                verts = getattr(chunk, f"{part}_verts")
+                if not verts:
+                    continue
+                normals = getattr(chunk, f"{part}_normals")
+                uvs = getattr(chunk, f"{part}_uvs")
+                indices = getattr(chunk, f"{part}_indices")
+                # OBJ indices start at 1, normals are counted on their own
+                offset = getattr(chunk, f"{part}_offset")
+                shift = written + 1 - offset
+                normal_shift = written_normals + 1 - offset
+
+                lines = [f"g {part}"]
+                for p in range(0, len(verts), 3):
+                    lines.append("v %.6f %.6f %.6f" % tuple(verts[p:p + 3]))
+                for p in range(0, len(uvs), 2):
+                    lines.append("vt %.6f %.6f" % tuple(uvs[p:p + 2]))
+                has_normals = len(normals) == len(verts)
+                if has_normals:
+                    for p in range(0, len(normals), 3):
+                        lines.append("vn %.6f %.6f %.6f" % tuple(normals[p:p + 3]))
+                for p in range(0, len(indices), 4):
+                    if has_normals:
+                        corners = ["%d/%d/%d" % (i + shift, i + shift, i + normal_shift)
+                                   for i in indices[p:p + 4]]
+                    else:
+                        corners = ["%d/%d" % (i + shift, i + shift) for i in indices[p:p + 4]]
+                    lines.append("f " + " ".join(corners))
+                lines.append("")
+                f.write("\n".join(lines))
+                written += len(verts) // 3
+                if has_normals:
+                    written_normals += len(verts) // 3
+    return written
+
+
+def write_stream(filepath, chunks, compression=None):
+    """Append chunks in the compact storage encoding, one record per chunk.
+
+    Returns the file size. Every record carries the tree options, a
+    record decodes on its own.
+    """
+    size = 0
+    with open(filepath, "wb") as f:
+        f.write(STREAM_MAGIC + struct.pack("<H", STREAM_VERSION))
+        size += len(STREAM_MAGIC) + 2
+        for chunk in chunks:
+            data = storage.encode(chunk, compression)
+            f.write(_RECORD.pack(len(data)))
+            f.write(data)
+            size += _RECORD.size + len(data)
+    return size
+
+
+def read_stream(filepath):
+    """Yield the chunks of a write_stream() file, decoded as storage.decode() does.
+
+    Indices stay global, as they were generated.
+    """
+    with open(filepath, "rb") as f:
+        header = f.read(len(STREAM_MAGIC) + 2)
+        if header[:len(STREAM_MAGIC)] != STREAM_MAGIC:
+            raise ValueError("Not an EZ-Tree stream file")
+        version, = struct.unpack("<H", header[len(STREAM_MAGIC):])
+        if version > STREAM_VERSION:
+            raise ValueError(f"Stream format {version} is newer than this add-on supports")
+        while True:
+            record = f.read(_RECORD.size)
+            if not record:
+                return
+            size, = _RECORD.unpack(record)
+            yield storage.decode(f.read(size))
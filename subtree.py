@@ -0,0 +1,49 @@
+import bpy
+from collections import OrderedDict
+from bpy.app.handlers import persistent
+
+# Last generator of the trees edited most recently, with its branch range
+# table, so a reseeded branch is spliced into the buffers instead of
+# regenerating the whole tree. Buffers of large trees are big, few are kept.
+CACHE_SIZE = 2
+
+# tree id -> (geometry key, TreeGenerator that has run with all its leaves)
+_generators = OrderedDict()
+
+
+def remember(branch_obj, key, generator):
+    tree_id = branch_obj.get("eztree_id")
+    if tree_id is None or generator.mode != 'MESH' or generator.leaves_pending:
+        return
+    _generators[tree_id] = (key, generator)
+    _generators.move_to_end(tree_id)
+    while len(_generators) > CACHE_SIZE:
+        _generators.popitem(last=False)
+
+
+def take(branch_obj, key):
+    """The generator remembered for branch_obj if it still matches key, else None."""
+    entry = _generators.pop(branch_obj.get("eztree_id"), None)
+    if entry and entry[0] == key:
+        return entry[1]
+    return None
+
+
+def discard(branch_obj):
+    _generators.pop(branch_obj.get("eztree_id"), None)
+
+
+@persistent
+def _on_load_post(*args):
+    _generators.clear()
+
+
+def register():
+    if _on_load_post not in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.append(_on_load_post)
+
+
+def unregister():
+    if _on_load_post in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(_on_load_post)
+    _generators.clear()
@@ -0,0 +1,20 @@
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _load_addon():
+    # The add-on directory is a package whatever its name, import it as eztree.
+    # Outside Blender __init__ imports none of the bpy modules.
+    if "eztree" in sys.modules:
+        return
+    spec = importlib.util.spec_from_file_location(
+        "eztree", os.path.join(ROOT, "__init__.py"), submodule_search_locations=[ROOT])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["eztree"] = module
+    spec.loader.exec_module(module)
+
+
+_load_addon()
@@ -0,0 +1,22 @@
+import glob
+import json
+import os
+
+import pytest
+
+from eztree.utils import hex_to_rgb, options_to_json, preset_to_options
+
+PRESETS = sorted(glob.glob(os.path.join(os.path.dirname(__file__), os.pardir, "presets", "*.json")))
+
+
+@pytest.mark.parametrize("path", PRESETS, ids=os.path.basename)
+def test_preset_round_trip(path):
+    # Preset parsing imports without bpy, so headless tools can read presets
+    with open(path) as f:
+        options = preset_to_options(json.load(f))
+    json_data = options_to_json(options)
+    assert options_to_json(preset_to_options(json_data)) == json_data
+
+
+def test_hex_to_rgb():
+    assert hex_to_rgb(0xff8000) == (1.0, 128 / 255.0, 0.0)
@@ -0,0 +1,35 @@
+import pytest
+
+pytest.importorskip("mathutils")
+
+from eztree.generator import TreeGenerator
+from eztree.params import TreeOptions
+
+
+def levels(generator):
+    return {record.level for record in generator.branch_records.values()}
+
+
+@pytest.mark.parametrize("prune_size, pruned_level", [(2, 3), (10, 2)])
+def test_tips_pruned_with_side_children(prune_size, pruned_level):
+    # Tips are as long as the side children of their level, so a size that
+    # drops the level drops its tips too
+    full = TreeGenerator(TreeOptions())
+    full.generate()
+    options = TreeOptions()
+    options.branch.pruneSize = prune_size
+    pruned = TreeGenerator(options)
+    pruned.generate()
+
+    assert max(levels(pruned)) == pruned_level - 1
+    # Each pruned branch is counted once, without the ones growing from it
+    skipped = [record for record in full.branch_records.values()
+               if record.level == pruned_level]
+    assert pruned.pruned_branches == len(skipped)
+
+
+def test_no_pruning_by_default():
+    generator = TreeGenerator(TreeOptions())
+    generator.generate()
+    assert generator.pruned_branches == 0
+    assert any(path.endswith(".t") for path in generator.branch_ranges)
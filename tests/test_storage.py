@@ -0,0 +1,167 @@
+import math
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from eztree import storage
+from eztree.params import TreeOptions
+from eztree.utils import options_to_json
+
+COMPRESSIONS = [
+    'NONE',
+    'ZLIB',
+    pytest.param('ZSTD', marks=pytest.mark.skipif(storage.zstandard is None,
+                                                  reason="zstandard is not installed")),
+]
+
+
+def unit_normals(rng, count):
+    normals = []
+    for _ in range(count):
+        while True:
+            n = [rng.uniform(-1, 1) for _ in range(3)]
+            length = math.sqrt(sum(c * c for c in n))
+            if 0.1 < length <= 1:
+                break
+        normals.extend(c / length for c in n)
+    return normals
+
+
+def make_part(rng, rings, segments, flat_z=False):
+    """Quads between rings of segments + 1 vertices, like a branch."""
+    verts = []
+    uvs = []
+    for i in range(rings):
+        for j in range(segments + 1):
+            verts.extend((rng.uniform(-3, 3), i * 0.7 + rng.uniform(0, 0.1),
+                          0.25 if flat_z else rng.uniform(-3, 3)))
+            uvs.extend((j / segments, i % 2))
+    indices = []
+    size = segments + 1
+    for i in range(rings - 1):
+        for j in range(segments):
+            v1 = i * size + j
+            v2 = v1 + 1
+            v3 = v1 + size
+            v4 = v3 + 1
+            indices.extend((v1, v3, v4, v2))
+    return verts, indices, uvs, unit_normals(rng, len(verts) // 3)
+
+
+def make_tree(seed=0, leaves=True, flat_z=False):
+    rng = random.Random(seed)
+    tree = SimpleNamespace()
+    parts = {"branches": make_part(rng, 12, 8, flat_z),
+             "leaves": make_part(rng, 6, 1) if leaves else ([], [], [], [])}
+    for part, (verts, indices, uvs, normals) in parts.items():
+        setattr(tree, f"{part}_verts", verts)
+        setattr(tree, f"{part}_indices", indices)
+        setattr(tree, f"{part}_uvs", uvs)
+        setattr(tree, f"{part}_normals", normals)
+    return tree
+
+
+def half_step(values, size, axis):
+    lo, hi = storage.bounds(values, size)
+    # Half a quantization step, plus float32 rounding of the stored bounds
+    return (hi[axis] - lo[axis]) / storage.QUANT_MAX * 0.5 + 1e-6 * max(abs(lo[axis]), abs(hi[axis]), 1.0)
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+def test_indices_round_trip_exactly(compression):
+    tree = make_tree()
+    decoded = storage.decode(storage.encode(tree, compression))
+    for part in storage.PARTS:
+        assert list(decoded[part].indices) == getattr(tree, f"{part}_indices")
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+def test_positions_and_uvs_within_half_a_step(compression):
+    tree = make_tree(seed=1)
+    decoded = storage.decode(storage.encode(tree, compression))
+    for part in storage.PARTS:
+        for name, size in (("verts", 3), ("uvs", 2)):
+            original = getattr(tree, f"{part}_{name}")
+            restored = getattr(decoded[part], name)
+            assert len(restored) == len(original)
+            for axis in range(size):
+                tolerance = half_step(original, size, axis)
+                error = max(abs(a - b) for a, b in zip(original[axis::size], restored[axis::size]))
+                assert error <= tolerance, (part, name, axis)
+
+
+def test_normals_within_angle_bound():
+    tree = make_tree(seed=2)
+    decoded = storage.decode(storage.encode(tree, 'NONE'))
+    for part in storage.PARTS:
+        original = getattr(tree, f"{part}_normals")
+        restored = decoded[part].normals
+        assert len(restored) == len(original)
+        for n in range(0, len(original), 3):
+            a = original[n:n + 3]
+            b = restored[n:n + 3]
+            cross = math.sqrt((a[1] * b[2] - a[2] * b[1]) ** 2 + (a[2] * b[0] - a[0] * b[2]) ** 2
+                              + (a[0] * b[1] - a[1] * b[0]) ** 2)
+            angle = math.degrees(math.atan2(cross, sum(x * y for x, y in zip(a, b))))
+            assert angle <= 0.01
+
+
+def test_oct_coding_of_axis_normals():
+    axes = [1, 0, 0, -1, 0, 0, 0, 1, 0, 0, -1, 0, 0, 0, 1, 0, 0, -1]
+    decoded = storage.oct_decode(storage.oct_encode(axes))
+    assert list(decoded) == pytest.approx(axes, abs=1e-4)
+
+
+def test_degenerate_axis_restored_exactly():
+    tree = make_tree(seed=3, flat_z=True)
+    decoded = storage.decode(storage.encode(tree, 'ZLIB'))
+    z = decoded["branches"].verts[2::3]
+    assert all(value == pytest.approx(0.25, abs=1e-7) for value in z)
+    storage.verify(tree, storage.encode(tree, 'ZLIB'))
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+def test_empty_leaf_part(compression):
+    tree = make_tree(seed=4, leaves=False)
+    data = storage.encode(tree, compression)
+    leaves = storage.decode(data)["leaves"]
+    assert len(leaves.verts) == len(leaves.indices) == len(leaves.uvs) == len(leaves.normals) == 0
+    report = storage.verify(tree, data)
+    assert set(report) == set(storage.PARTS)
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+def test_verify_accepts_every_compression(compression):
+    tree = make_tree(seed=5)
+    report = storage.verify(tree, storage.encode(tree, compression))
+    assert report["branches"]["normal_degrees"] <= 0.01
+
+
+def test_verify_rejects_changed_topology():
+    tree = make_tree(seed=6)
+    data = storage.encode(tree, 'NONE')
+    tree.branches_indices[0], tree.branches_indices[1] = tree.branches_indices[1], tree.branches_indices[0]
+    with pytest.raises(ValueError):
+        storage.verify(tree, data)
+
+
+@pytest.mark.skipif(storage.zstandard is not None, reason="zstandard is installed")
+def test_zstd_without_module_is_an_error():
+    with pytest.raises(ValueError):
+        storage.encode(make_tree(), 'ZSTD')
+
+
+def test_options_stored_as_preset():
+    tree = make_tree(seed=7)
+    tree.options = TreeOptions()
+    tree.options.seed = 42
+    preset = storage.decode(storage.encode(tree))["preset"]
+    # Through JSON, level keys become strings
+    assert preset["seed"] == 42
+    assert preset["branch"]["levels"] == options_to_json(tree.options)["branch"]["levels"]
+
+
+def test_rejects_foreign_data():
+    with pytest.raises(ValueError):
+        storage.decode(b"NOPE" + bytes(16))
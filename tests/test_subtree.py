@@ -0,0 +1,60 @@
+import copy
+import random
+
+import pytest
+
+pytest.importorskip("mathutils")
+
+from eztree.enums import TreeType
+from eztree.generator import BUFFERS, TreeGenerator, queue_order
+from eztree.params import TreeOptions
+
+
+def buffers(generator):
+    return {f"{part}_{name}": getattr(generator, f"{part}_{name}")
+            for part in ("branches", "leaves") for name in BUFFERS}
+
+
+def test_queue_order():
+    paths = ["0.t", "0.3.1", "0", "0.10", "0.3", "0.t.2", "0.3.t", "0.2"]
+    assert sorted(paths, key=queue_order) == ["0", "0.2", "0.3", "0.10", "0.t",
+                                              "0.3.1", "0.3.t", "0.t.2"]
+
+
+@pytest.mark.parametrize("tree_type", [TreeType.Deciduous, TreeType.Evergreen])
+def test_splice_matches_generate(tree_type):
+    # The spliced tree is laid out face for face like a fresh one, so a
+    # generator rebuilt after a cache miss maps picks to the same branches
+    rng = random.Random(7)
+    options = TreeOptions()
+    options.type = tree_type
+    generator = TreeGenerator(copy.deepcopy(options))
+    generator.generate()
+    for _ in range(4):
+        path = rng.choice(list(generator.branch_ranges))
+        generator.options.branch.seedOverrides[path] = rng.getrandbits(31)
+        assert generator.regenerate_subtree(path)
+
+        fresh = TreeGenerator(copy.deepcopy(generator.options))
+        fresh.generate()
+        assert buffers(generator) == buffers(fresh)
+        assert list(generator.branch_ranges.items()) == list(fresh.branch_ranges.items())
+
+
+def test_splice_into_copy_leaves_shared_generator():
+    # One generator can back several trees (batch edits, prefetch): each
+    # reseed splices into its own copy and the shared one stays as generated
+    shared = TreeGenerator(TreeOptions())
+    shared.generate()
+    before = copy.deepcopy(buffers(shared))
+    paths = list(shared.branch_ranges)
+    for path, seed in ((paths[3], 11), (paths[-5], 12)):
+        generator = shared.copy()
+        generator.options = copy.deepcopy(shared.options)
+        generator.options.branch.seedOverrides[path] = seed
+        assert generator.regenerate_subtree(path)
+
+        fresh = TreeGenerator(copy.deepcopy(generator.options))
+        fresh.generate()
+        assert buffers(generator) == buffers(fresh)
+        assert buffers(shared) == before
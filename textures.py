@@ -0,0 +1,315 @@
+import bpy
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from bpy.app.handlers import persistent
+
+# Longest edge of the downscaled viewport copies
+PROXY_SIZE = 256
+PROXY_DIR = os.path.join(tempfile.gettempdir(), "eztree_proxies")
+
+_executor = None
+# source path -> (mtime, image name) for full resolution images
+_full_images = {}
+# source path -> (mtime, image name) for proxy images
+_proxy_images = {}
+# source path -> (mtime, proxy file path, future) for proxies being decoded
+_pending = {}
+# source path -> image name of the stand-in shown until its proxy is decoded
+_placeholders = {}
+# True while a render job is running, full resolution is swapped in
+_rendering = False
+
+
+def _mtime(filepath):
+    try:
+        return os.stat(filepath).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="EZTreeTextures")
+    return _executor
+
+
+def use_proxies():
+    if _rendering:
+        return False
+    scene = getattr(bpy.context, "scene", None)
+    return bool(scene and getattr(scene, "eztree_texture_proxies", False))
+
+
+def proxy_filepath(filepath, mtime):
+    # The mtime is part of the name, so editing the source invalidates the proxy
+    stem, ext = os.path.splitext(os.path.basename(filepath))
+    return os.path.join(PROXY_DIR, f"{stem}_{mtime}_{PROXY_SIZE}{ext}")
+
+
+def _build_proxy(src, dst):
+    # Runs on a worker thread. Only uses imbuf, which decodes and scales
+    # without touching bpy.data, so it is safe off the main thread.
+    import imbuf
+
+    if os.path.exists(dst):
+        return dst
+    os.makedirs(PROXY_DIR, exist_ok=True)
+
+    ibuf = imbuf.load(src)
+    try:
+        w, h = ibuf.size
+        scale = PROXY_SIZE / max(w, h)
+        if scale < 1.0:
+            ibuf.resize((max(1, int(w * scale)), max(1, int(h * scale))))
+        tmp = dst + ".part"
+        imbuf.write(ibuf, filepath=tmp)
+    finally:
+        ibuf.free()
+
+    os.replace(tmp, dst)
+    return dst
+
+
+def _cached_image(cache, filepath, mtime):
+    entry = cache.get(filepath)
+    if entry and entry[0] == mtime:
+        img = bpy.data.images.get(entry[1])
+        if img:
+            return img
+    return None
+
+
+def _load_full(filepath, mtime):
+    img = _cached_image(_full_images, filepath, mtime)
+    if img:
+        return img
+
+    filename = os.path.basename(filepath)
+    img = bpy.data.images.get(filename)
+    if img and bpy.path.abspath(img.filepath) == filepath:
+        if filepath in _full_images:
+            # Known image whose file changed on disk
+            img.reload()
+    else:
+        img = bpy.data.images.load(filepath, check_existing=True)
+
+    _full_images[filepath] = (mtime, img.name)
+    return img
+
+
+def _placeholder(filepath):
+    # A 1x1 image rather than the full resolution one, which would decode on
+    # the main thread. Full resolution is loaded by set_resolution when it is
+    # really needed: on render, or when proxies are turned off.
+    img = bpy.data.images.get(_placeholders.get(filepath, ""))
+    if img:
+        return img
+    img = bpy.data.images.new(f"EZTree_Loading_{os.path.basename(filepath)}", 1, 1, alpha=True)
+    img.generated_color = (0.5, 0.5, 0.5, 1.0)
+    _placeholders[filepath] = img.name
+    return img
+
+
+def _load_proxy(filepath, mtime):
+    img = _cached_image(_proxy_images, filepath, mtime)
+    if img:
+        return img
+
+    dst = proxy_filepath(filepath, mtime)
+    if os.path.exists(dst):
+        img = bpy.data.images.load(dst, check_existing=True)
+        _proxy_images[filepath] = (mtime, img.name)
+        return img
+
+    pending = _pending.get(filepath)
+    if not pending or pending[0] != mtime:
+        future = _get_executor().submit(_build_proxy, filepath, dst)
+        _pending[filepath] = (mtime, dst, future)
+        if not bpy.app.timers.is_registered(_poll_pending):
+            bpy.app.timers.register(_poll_pending, first_interval=0.2)
+    return None
+
+
+def get_image(filepath):
+    """Return the image for filepath at the resolution the viewport should use.
+
+    While a proxy is still being decoded in the background a placeholder is
+    returned, and swapped for the proxy once it is ready.
+    """
+    mtime = _mtime(filepath)
+    if mtime is None:
+        return None
+
+    if use_proxies():
+        return _load_proxy(filepath, mtime) or _placeholder(filepath)
+    return _load_full(filepath, mtime)
+
+
+def prefetch(filepaths):
+    """Start decoding proxies for filepaths without waiting for a material to need them."""
+    for filepath in filepaths:
+        mtime = _mtime(filepath)
+        if mtime is not None:
+            _load_proxy(filepath, mtime)
+
+
+def _track_material_images():
+    # Pick up images assigned by an earlier session, which are not in the caches yet
+    for mat in _eztree_materials():
+        for node in mat.node_tree.nodes:
+            if node.type != 'TEX_IMAGE' or not node.image or not node.image.filepath:
+                continue
+            filepath = bpy.path.abspath(node.image.filepath)
+            if filepath.startswith(PROXY_DIR) or filepath in _full_images:
+                continue
+            mtime = _mtime(filepath)
+            if mtime is not None:
+                _full_images[filepath] = (mtime, node.image.name)
+
+
+def refresh():
+    """Bring existing EZ-Tree materials in line with the current proxy setting."""
+    _track_material_images()
+    if use_proxies():
+        prefetch(list(_full_images))
+        set_resolution(full=False)
+    else:
+        set_resolution(full=True)
+
+
+def _poll_pending():
+    done = [path for path, (_, _, future) in _pending.items() if future.done()]
+    for path in done:
+        mtime, dst, future = _pending.pop(path)
+        if future.exception():
+            print(f"EZ-Tree: failed to build texture proxy for {path}: {future.exception()}")
+            # Show the full resolution image instead of the placeholder
+            name = _placeholders.get(path)
+            if name:
+                _swap_images({name: _load_full(path, mtime).name})
+            continue
+        img = bpy.data.images.load(dst, check_existing=True)
+        _proxy_images[path] = (mtime, img.name)
+
+    if done and use_proxies():
+        set_resolution(full=False)
+
+    return 0.2 if _pending else None
+
+
+def _eztree_materials():
+    for mat in bpy.data.materials:
+        if mat.get("eztree_state") and mat.node_tree:
+            yield mat
+
+
+def set_resolution(full):
+    """Swap every EZ-Tree image node between proxy and full resolution images.
+
+    Full resolution images are loaded here if they were not yet, a tree
+    created with proxies on only ever showed the proxy or placeholder.
+    """
+    swap = {}
+    for path, (mtime, proxy_name) in _proxy_images.items():
+        if full:
+            if _mtime(path) is not None:
+                swap[proxy_name] = _load_full(path, mtime).name
+        elif path in _full_images:
+            swap[_full_images[path][1]] = proxy_name
+    for path, name in _placeholders.items():
+        if full:
+            mtime = _mtime(path)
+            if mtime is not None:
+                swap[name] = _load_full(path, mtime).name
+        elif path in _proxy_images:
+            swap[name] = _proxy_images[path][1]
+
+    _swap_images(swap, free=not full)
+
+
+def _swap_images(swap, free=False):
+    # swap: image name on the nodes -> image name to put there instead
+    if not swap:
+        return
+
+    released = set()
+    for mat in _eztree_materials():
+        for node in mat.node_tree.nodes:
+            if node.type != 'TEX_IMAGE' or not node.image or node.image.name not in swap:
+                continue
+            target = bpy.data.images.get(swap[node.image.name])
+            if not target:
+                continue
+            target.colorspace_settings.name = node.image.colorspace_settings.name
+            released.add(node.image.name)
+            node.image = target
+
+    # Placeholders are only shown until their first swap
+    for path, name in list(_placeholders.items()):
+        if name in released:
+            del _placeholders[path]
+            released.discard(name)
+            img = bpy.data.images.get(name)
+            if img and not img.users:
+                bpy.data.images.remove(img)
+
+    if free:
+        # Drop the decoded full resolution pixels, they are reloaded on demand
+        for name in released:
+            img = bpy.data.images.get(name)
+            if img and img.has_data:
+                img.buffers_free()
+
+
+@persistent
+def _on_render_pre(scene, *args):
+    global _rendering
+    _rendering = True
+    if getattr(scene, "eztree_texture_proxies", False):
+        set_resolution(full=True)
+
+
+@persistent
+def _on_render_done(scene, *args):
+    global _rendering
+    _rendering = False
+    if getattr(scene, "eztree_texture_proxies", False):
+        set_resolution(full=False)
+
+
+@persistent
+def _on_load_post(*args):
+    # Image datablocks from the previous file are gone
+    _full_images.clear()
+    _proxy_images.clear()
+    _placeholders.clear()
+
+
+_handlers = (
+    (bpy.app.handlers.render_pre, _on_render_pre),
+    (bpy.app.handlers.render_post, _on_render_done),
+    (bpy.app.handlers.render_cancel, _on_render_done),
+    (bpy.app.handlers.load_post, _on_load_post),
+)
+
+
+def register():
+    for handler_list, func in _handlers:
+        if func not in handler_list:
+            handler_list.append(func)
+
+
+def unregister():
+    global _executor
+    for handler_list, func in _handlers:
+        if func in handler_list:
+            handler_list.remove(func)
+
+    if bpy.app.timers.is_registered(_poll_pending):
+        bpy.app.timers.unregister(_poll_pending)
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+    _pending.clear()
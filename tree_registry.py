@@ -0,0 +1,154 @@
+import bpy
+import uuid
+from bpy.app.handlers import persistent
+
+ROLE_BRANCH = "branch"
+ROLE_LEAF = "leaf"
+
+# tree id -> (branch object name, leaf object name)
+_trees = {}
+
+
+def _get_object(name, tree_id, role):
+    obj = bpy.data.objects.get(name) if name else None
+    if obj and obj.get("eztree_id") == tree_id and obj.get("eztree_role") == role:
+        return obj
+    return None
+
+
+def _find_leaf(branch_obj):
+    for child in branch_obj.children:
+        if child.get("eztree_role") == ROLE_LEAF:
+            return child
+    # Trees from before objects were tagged
+    for child in branch_obj.children:
+        if "TreeLeaf" in child.name:
+            return child
+    return None
+
+
+def lookup(tree_id):
+    """Return (branch_obj, leaf_obj) of the tree with this id, or (None, None)."""
+    entry = _trees.get(tree_id)
+    if not entry:
+        return None, None
+    branch_obj = _get_object(entry[0], tree_id, ROLE_BRANCH)
+    leaf_obj = _get_object(entry[1], tree_id, ROLE_LEAF)
+    if not branch_obj:
+        # Renamed or deleted since it was cached, rescan once
+        rebuild()
+        entry = _trees.get(tree_id)
+        if not entry:
+            return None, None
+        branch_obj = _get_object(entry[0], tree_id, ROLE_BRANCH)
+        leaf_obj = _get_object(entry[1], tree_id, ROLE_LEAF)
+    return branch_obj, leaf_obj
+
+
+def get_pair(obj):
+    """Return (branch_obj, leaf_obj) of the tree obj belongs to, or (None, None).
+
+    Read only, so it is safe to call from draw code. Parenting decides the
+    pair when there is one, it follows duplicated and renamed objects.
+    """
+    if obj is None:
+        return None, None
+
+    role = obj.get("eztree_role")
+    if role == ROLE_LEAF:
+        parent = obj.parent
+        if parent is None or parent.get("eztree_role") != ROLE_BRANCH:
+            return lookup(obj.get("eztree_id"))[0], obj
+        obj = parent
+    elif role != ROLE_BRANCH:
+        # Untagged trees from older files are recognised by name
+        if "TreeBranch" in obj.name:
+            return obj, _find_leaf(obj)
+        if "TreeLeaf" in obj.name and obj.parent:
+            return obj.parent, obj
+        return None, None
+
+    entry = _trees.get(obj.get("eztree_id"))
+    if entry:
+        leaf_obj = bpy.data.objects.get(entry[1]) if entry[1] else None
+        if leaf_obj and leaf_obj.parent == obj:
+            return obj, leaf_obj
+    return obj, _find_leaf(obj)
+
+
+def get_branch(obj):
+    return get_pair(obj)[0]
+
+
+def is_tree(obj):
+    return get_branch(obj) is not None
+
+
+def tag(branch_obj, leaf_obj=None):
+    """Store the tree id and roles on the pair and cache it.
+
+    A branch whose id already belongs to another tree, e.g. after Shift+D,
+    gets a new id so the copy is a tree of its own.
+    """
+    tree_id = branch_obj.get("eztree_id")
+    if tree_id:
+        entry = _trees.get(tree_id)
+        other = _get_object(entry[0], tree_id, ROLE_BRANCH) if entry else None
+        if other is not None and other != branch_obj:
+            tree_id = None
+    if not tree_id:
+        tree_id = uuid.uuid4().hex
+
+    for obj, role in ((branch_obj, ROLE_BRANCH), (leaf_obj, ROLE_LEAF)):
+        if obj is None:
+            continue
+        if obj.get("eztree_id") != tree_id:
+            obj["eztree_id"] = tree_id
+        if obj.get("eztree_role") != role:
+            obj["eztree_role"] = role
+
+    _trees[tree_id] = (branch_obj.name, leaf_obj.name if leaf_obj else None)
+    return tree_id
+
+
+def iter_trees():
+    """Yield (branch_obj, leaf_obj) for every cached tree that still exists."""
+    for tree_id, (branch_name, leaf_name) in list(_trees.items()):
+        branch_obj = _get_object(branch_name, tree_id, ROLE_BRANCH)
+        if branch_obj:
+            yield branch_obj, _get_object(leaf_name, tree_id, ROLE_LEAF)
+
+
+def rebuild():
+    _trees.clear()
+    leaves = {}
+    for obj in bpy.data.objects:
+        tree_id = obj.get("eztree_id")
+        role = obj.get("eztree_role")
+        if not tree_id:
+            continue
+        if role == ROLE_BRANCH:
+            # Keep the first branch per id, copies are re-tagged when they are edited
+            _trees.setdefault(tree_id, (obj.name, None))
+        elif role == ROLE_LEAF:
+            leaves.setdefault(tree_id, obj.name)
+
+    for tree_id, leaf_name in leaves.items():
+        if tree_id in _trees:
+            _trees[tree_id] = (_trees[tree_id][0], leaf_name)
+
+
+@persistent
+def _on_load_post(*args):
+    rebuild()
+
+
+def register():
+    if _on_load_post not in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.append(_on_load_post)
+
+
+def unregister():
+    if _on_load_post in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(_on_load_post)
+    _trees.clear()
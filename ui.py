@@ -1,4 +1,5 @@
 import bpy
+from . import tree_registry
 
 class EZTree_PT_Base:
     bl_space_type = 'VIEW_3D'
@@ -17,22 +18,15 @@ class EZTree_PT_Main(EZTree_PT_Base, bpy.types.Panel):
         # If active object has eztree_props, use it (Live Edit Mode)
         # Else use Scene props (New Tree Mode)
         
-        obj = context.active_object
-        if obj and hasattr(obj, "eztree_props") and obj.eztree_props.branch.levels > 0: 
-            # Check levels > 0 is a heuristic to see if populated? 
-            # Or just check if it's the "TreeBranch" object.
-            # Best check: Is it an EZ-Tree object?
-            # We assume if it has the pointer property initialized it is one. 
-            # Note: PointerProperty is always present on Object type, 
-            # but we can check if it has meaningful data? 
-            # Actually weak reference. 
-            # Better: Check if name starts with TreeBranch or we tag it.
-            # Let's assume user works with generated trees.
+        obj = tree_registry.get_branch(context.active_object)
+        if obj:
+            # Leaves are edited through the branch object holding the props
             props = obj.eztree_props
             layout.label(text=f"Editing: {obj.name}", icon='EDITMODE_HLT')
         else:
             props = context.scene.eztree_props
             layout.label(text="Creating New Tree", icon='ADD')
+            layout.prop(props, "output_mode", expand=True)
         
         # Presets Menu (Only allow applying presets to Scene props for creation? 
         # Or apply to Live object too? Live is better!)
@@ -42,13 +36,26 @@ class EZTree_PT_Main(EZTree_PT_Base, bpy.types.Panel):
         # Operator `EZTree_OT_ApplyPresetMenu` calls `apply_preset(context.scene.eztree_props)`. 
         # We need to update that operator too.
         row.operator_menu_enum("eztree.apply_preset_menu", "preset_enum", text="Select Preset")
+        
+        layout.prop(context.scene, "eztree_batch_edit")
 
         layout.separator()
         
-        layout.operator("eztree.generate", text="Generate Tree", icon='OUTLINER_OB_MESH')
+        layout.operator("eztree.generate_modal", text="Generate Tree", icon='OUTLINER_OB_MESH')
         layout.operator("eztree.add_wind", text="Add Wind Animation", icon='FORCE_WIND')
+        layout.operator("eztree.add_wind_selected", text="Add Wind to Selected", icon='FORCE_WIND')
+        layout.operator("eztree.bake_wind", text="Bake Wind", icon='RENDER_ANIMATION')
+        layout.operator("eztree.export_gltf", text="Export Selected (.glb)", icon='EXPORT').scope = 'SELECTED'
+        row = layout.row(align=True)
+        row.operator("eztree.save_compact", text="Save Geometry", icon='FILE_TICK')
+        row.operator("eztree.load_compact", text="Load Geometry", icon='FILE_FOLDER')
+        layout.operator("eztree.stream_to_disk", text="Stream to Disk", icon='DISK_DRIVE')
         
-        layout.prop(props, "seed")
+        row = layout.row(align=True)
+        row.prop(props, "seed")
+        row.prop(context.scene, "eztree_prefetch", text="", icon='FORWARD')
+        if context.scene.eztree_prefetch:
+            layout.prop(context.scene, "eztree_prefetch_range")
         layout.prop(props, "type")
 
 class EZTree_PT_Bark(EZTree_PT_Base, bpy.types.Panel):
@@ -59,8 +66,8 @@ class EZTree_PT_Bark(EZTree_PT_Base, bpy.types.Panel):
 
     def draw(self, context):
         layout = self.layout
-        obj = context.active_object
-        if obj and hasattr(obj, "eztree_props") and "TreeBranch" in obj.name: # Simple name check for now
+        obj = tree_registry.get_branch(context.active_object)
+        if obj:
              props = obj.eztree_props.bark
         else:
              props = context.scene.eztree_props.bark
@@ -72,6 +79,7 @@ class EZTree_PT_Bark(EZTree_PT_Base, bpy.types.Panel):
         col = layout.column(align=True)
         col.prop(props, "textureScaleX")
         col.prop(props, "textureScaleY")
+        layout.prop(context.scene, "eztree_texture_proxies")
 
 class EZTree_PT_Branch(EZTree_PT_Base, bpy.types.Panel):
     bl_label = "Branches"
@@ -81,8 +89,8 @@ class EZTree_PT_Branch(EZTree_PT_Base, bpy.types.Panel):
 
     def draw(self, context):
         layout = self.layout
-        obj = context.active_object
-        if obj and hasattr(obj, "eztree_props") and "TreeBranch" in obj.name:
+        obj = tree_registry.get_branch(context.active_object)
+        if obj:
              props = obj.eztree_props.branch
         else:
              props = context.scene.eztree_props.branch
@@ -139,6 +147,19 @@ class EZTree_PT_Branch(EZTree_PT_Base, bpy.types.Panel):
             if i < props.levels and i < 3: # Can't have children at max level or if no prop
                 col.separator()
                 col.prop(props, f"children_{i}", text=f"Branches (Level {i+1} Count)")
+        
+        box = layout.box()
+        box.label(text="Pruning", icon='MOD_DECIM')
+        col = box.column(align=True)
+        col.prop(props, "pruneSize")
+        row = col.row(align=True)
+        row.prop(props, "prunePixels")
+        row.prop(props, "pruneDistance", text="At")
+        
+        if obj and obj.type == 'MESH':
+            row = layout.row(align=True)
+            row.operator("eztree.reseed_branch", icon='EYEDROPPER')
+            row.operator("eztree.reset_branch_seeds", text="", icon='LOOP_BACK')
 
 class EZTree_PT_Leaves(EZTree_PT_Base, bpy.types.Panel):
     bl_label = "Leaves"
@@ -148,8 +169,8 @@ class EZTree_PT_Leaves(EZTree_PT_Base, bpy.types.Panel):
 
     def draw(self, context):
         layout = self.layout
-        obj = context.active_object
-        if obj and hasattr(obj, "eztree_props") and "TreeBranch" in obj.name:
+        obj = tree_registry.get_branch(context.active_object)
+        if obj:
              props = obj.eztree_props.leaves
         else:
              props = context.scene.eztree_props.leaves
@@ -163,12 +184,48 @@ class EZTree_PT_Leaves(EZTree_PT_Base, bpy.types.Panel):
         layout.prop(props, "sizeVariance")
         layout.prop(props, "tint")
         layout.prop(props, "alphaTest")
+        
+        box = layout.box()
+        box.prop(props, "cullHidden")
+        col = box.column(align=True)
+        col.active = props.cullHidden
+        col.prop(props, "cullVisibility")
+        col.prop(props, "cullSamples")
+
+class EZTree_PT_Forest(EZTree_PT_Base, bpy.types.Panel):
+    bl_label = "Forest"
+    bl_idname = "EZTREE_PT_forest"
+    bl_parent_id = "EZTREE_PT_main"
+    bl_options = {'DEFAULT_CLOSED'}
+
+    def draw(self, context):
+        layout = self.layout
+        settings = context.scene.eztree_forest
+        
+        box = layout.box()
+        box.label(text="Variant Pool", icon='OUTLINER_COLLECTION')
+        box.prop(settings, "variant_count")
+        box.operator_menu_enum("eztree.forest_build_variants", "preset", text="Build Variant Pool")
+        
+        box = layout.box()
+        box.label(text="Placement", icon='PARTICLE_POINT')
+        box.prop(settings, "surface")
+        col = box.column(align=True)
+        col.prop(settings, "density")
+        col.prop(settings, "max_count")
+        row = box.row(align=True)
+        row.prop(settings, "scale_min", text="Scale Min")
+        row.prop(settings, "scale_max", text="Max")
+        box.prop(settings, "seed")
+        box.operator("eztree.forest_scatter", icon='OUTLINER_OB_GROUP_INSTANCE')
+        box.operator("eztree.export_gltf", text="Export Forest (.glb)", icon='EXPORT').scope = 'FOREST'
 
 classes = (
     EZTree_PT_Main,
     EZTree_PT_Bark,
     EZTree_PT_Branch,
     EZTree_PT_Leaves,
+    EZTree_PT_Forest,
 )
 
 def register():
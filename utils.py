@@ -1,3 +1,5 @@
+import hashlib
+import json
 from .params import TreeOptions, BarkOptions, BranchOptions, LeafOptions
 from .enums import BarkType, Billboard, LeafType, TreeType
 
@@ -61,6 +63,10 @@ def props_to_options(props) -> TreeOptions:
     opts.branch.twist = {
         0: b.twist_0, 1: b.twist_1, 2: b.twist_2, 3: b.twist_3
     }
+    opts.branch.pruneSize = b.pruneSize
+    opts.branch.prunePixels = b.prunePixels
+    opts.branch.pruneDistance = b.pruneDistance
+    opts.branch.seedOverrides = json.loads(b.seedOverrides) if b.seedOverrides else {}
     
     # Leaves
     l = props.leaves
@@ -76,5 +82,171 @@ def props_to_options(props) -> TreeOptions:
     opts.leaves.tint = (int(r * 255) << 16) + (int(g * 255) << 8) + int(b * 255)
     
     opts.leaves.alphaTest = l.alphaTest
+    opts.leaves.cullHidden = l.cullHidden
+    opts.leaves.cullVisibility = l.cullVisibility
+    opts.leaves.cullSamples = l.cullSamples
     
     return opts
+
+def hex_to_rgb(hex_val):
+    return (((hex_val >> 16) & 255) / 255.0,
+            ((hex_val >> 8) & 255) / 255.0,
+            (hex_val & 255) / 255.0)
+
+def preset_to_options(json_data) -> TreeOptions:
+    """Build TreeOptions straight from preset JSON, without going through props."""
+    opts = TreeOptions()
+    
+    if 'seed' in json_data: opts.seed = json_data['seed']
+    if 'type' in json_data: opts.type = TreeType(json_data['type'])
+    
+    if 'bark' in json_data:
+        b = json_data['bark']
+        if 'type' in b: opts.bark.type = BarkType(b['type'])
+        if 'tint' in b: opts.bark.tint = b['tint']
+        if 'flatShading' in b: opts.bark.flatShading = b['flatShading']
+        if 'textured' in b: opts.bark.textured = b['textured']
+        if 'textureScale' in b:
+            opts.bark.textureScale = {'x': b['textureScale'].get('x', 1),
+                                      'y': b['textureScale'].get('y', 1)}
+    
+    if 'leaves' in json_data:
+        l = json_data['leaves']
+        if 'type' in l: opts.leaves.type = LeafType(l['type'])
+        if 'billboard' in l: opts.leaves.billboard = Billboard(l['billboard'])
+        for key in ('angle', 'count', 'start', 'size', 'sizeVariance', 'tint', 'alphaTest',
+                    'cullHidden', 'cullVisibility', 'cullSamples'):
+            if key in l:
+                setattr(opts.leaves, key, l[key])
+    
+    if 'branch' in json_data:
+        br = json_data['branch']
+        if 'levels' in br: opts.branch.levels = br['levels']
+        for key in ('pruneSize', 'prunePixels', 'pruneDistance'):
+            if key in br:
+                setattr(opts.branch, key, br[key])
+        if 'seedOverrides' in br:
+            opts.branch.seedOverrides = dict(br['seedOverrides'])
+        
+        # JSON object keys are strings, the options use int levels
+        for key in ('angle', 'children', 'gnarliness', 'length', 'radius',
+                    'sections', 'segments', 'start', 'taper', 'twist'):
+            if key in br:
+                getattr(opts.branch, key).update({int(k): v for k, v in br[key].items()})
+        
+        if 'force' in br:
+            f = br['force']
+            if 'direction' in f: opts.branch.force['direction'] = dict(f['direction'])
+            if 'strength' in f: opts.branch.force['strength'] = f['strength']
+    
+    return opts
+
+def options_to_json(options):
+    """Preset JSON of options, the inverse of preset_to_options."""
+    b = options.branch
+    l = options.leaves
+    return {
+        'seed': options.seed,
+        'type': options.type.value,
+        'bark': {
+            'type': options.bark.type.value,
+            'tint': options.bark.tint,
+            'flatShading': options.bark.flatShading,
+            'textured': options.bark.textured,
+            'textureScale': dict(options.bark.textureScale),
+        },
+        'branch': {
+            'levels': b.levels,
+            'angle': dict(b.angle),
+            'children': dict(b.children),
+            'force': {'direction': dict(b.force['direction']), 'strength': b.force['strength']},
+            'gnarliness': dict(b.gnarliness),
+            'length': dict(b.length),
+            'radius': dict(b.radius),
+            'sections': dict(b.sections),
+            'segments': dict(b.segments),
+            'start': dict(b.start),
+            'taper': dict(b.taper),
+            'twist': dict(b.twist),
+            'pruneSize': b.pruneSize,
+            'prunePixels': b.prunePixels,
+            'pruneDistance': b.pruneDistance,
+            'seedOverrides': dict(b.seedOverrides),
+        },
+        'leaves': {
+            'type': l.type.value,
+            'billboard': l.billboard.value,
+            'angle': l.angle,
+            'count': l.count,
+            'start': l.start,
+            'size': l.size,
+            'sizeVariance': l.sizeVariance,
+            'tint': l.tint,
+            'alphaTest': l.alphaTest,
+            'cullHidden': l.cullHidden,
+            'cullVisibility': l.cullVisibility,
+            'cullSamples': l.cullSamples,
+        },
+    }
+
+def geometry_options_dict(options, include_seed=True):
+    """Plain dict of every option that affects generated geometry.
+
+    Material-only settings (tints, texture types and scales, alpha) are left
+    out so trees that only differ in shading still share geometry.
+    """
+    b = options.branch
+    l = options.leaves
+    data = {
+        'type': options.type.value,
+        'bark': {'flatShading': options.bark.flatShading},
+        'branch': {
+            'levels': b.levels,
+            'angle': b.angle,
+            'children': b.children,
+            'force': b.force,
+            'gnarliness': b.gnarliness,
+            'length': b.length,
+            'radius': b.radius,
+            'sections': b.sections,
+            'segments': b.segments,
+            'start': b.start,
+            'taper': b.taper,
+            'twist': b.twist,
+        },
+        'leaves': {
+            'billboard': l.billboard.value,
+            'angle': l.angle,
+            'count': l.count,
+            'start': l.start,
+            'size': l.size,
+            'sizeVariance': l.sizeVariance,
+        },
+    }
+    if b.pruneSize or b.prunePixels:
+        # Only when pruning, so trees without it keep their hash
+        data['branch']['prune'] = [b.pruneSize, b.prunePixels, b.pruneDistance if b.prunePixels else 0]
+    if b.seedOverrides:
+        data['branch']['seedOverrides'] = b.seedOverrides
+    if l.cullHidden:
+        data['leaves']['cull'] = [l.cullVisibility, l.cullSamples]
+    if include_seed:
+        data['seed'] = options.seed
+    return data
+
+def options_hash(options, include_seed=True):
+    """Stable hash of the geometry-relevant options, safe to store in .blend files."""
+    data = _round_floats(geometry_options_dict(options, include_seed))
+    canonical = json.dumps(data, sort_keys=True, separators=(',', ':'))
+    return hashlib.md5(canonical.encode()).hexdigest()
+
+def _round_floats(value):
+    # Values that went through float32 props should still compare equal.
+    # Keys become strings so level dicts sort like their JSON form.
+    if isinstance(value, float):
+        return round(value, 5)
+    if isinstance(value, dict):
+        return {str(k): _round_floats(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_round_floats(v) for v in value]
+    return value
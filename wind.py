@@ -1,26 +1,93 @@
 import bpy
+from .generator import CHAIN_LEVELS
 
-def add_wind_modifier(obj):
+WIND_GROUP_NAME = "EZTree_Wind_NodeGroup"
+WIND_MODIFIER = "EZTree_Wind"
+# Bump when the node setup changes, existing groups are rebuilt on next use
+WIND_GROUP_VERSION = 4
+
+def new_socket(ng, name, in_out, socket_type):
+    # Blender 4.0+
+    if hasattr(ng, "interface"):
+        return ng.interface.new_socket(name, in_out=in_out, socket_type=socket_type)
+    # Blender < 4.0
+    sockets = ng.inputs if in_out == 'INPUT' else ng.outputs
+    return sockets.new(socket_type, name)
+
+def _socket_identifier(node_group, name):
+    # Blender 4.0+
+    if hasattr(node_group, "interface"):
+        for item in node_group.interface.items_tree:
+            if item.name == name and getattr(item, "in_out", 'INPUT') == 'INPUT':
+                return item.identifier
+    # Blender < 4.0
+    elif hasattr(node_group, "inputs"):
+        for item in node_group.inputs:
+            if item.name == name:
+                return item.identifier
+    return None
+
+def set_modifier_input(mod, name, value):
+    identifier = _socket_identifier(mod.node_group, name)
+    if identifier:
+        mod[identifier] = value
+
+def get_modifier_input(mod, name, default=None):
+    identifier = _socket_identifier(mod.node_group, name)
+    if identifier and identifier in mod:
+        value = mod[identifier]
+        # Vector inputs are IDPropertyArrays
+        return tuple(value) if hasattr(value, "__len__") else value
+    return default
+
+def remove_time_driver(obj, mod):
+    """Drop the per-object `frame / 24` driver older versions put on the Time input."""
+    identifier = _socket_identifier(mod.node_group, "Time")
+    if not identifier or not obj.animation_data:
+        return
+    data_path = f'modifiers["{mod.name}"]["{identifier}"]'
+    if obj.animation_data.drivers.find(data_path):
+        mod.driver_remove(f'["{identifier}"]')
+        # Time is a phase offset now, the clock comes from the scene
+        mod[identifier] = 0.0
+
+def _remove_time_drivers(node_group):
+    for obj in bpy.data.objects:
+        for mod in getattr(obj, "modifiers", ()):
+            if mod.type == 'NODES' and mod.node_group == node_group:
+                remove_time_driver(obj, mod)
+
+def get_wind_node_group():
+    node_group = bpy.data.node_groups.get(WIND_GROUP_NAME)
+    if not node_group:
+        return create_wind_node_group(WIND_GROUP_NAME)
+    
+    if node_group.get("eztree_version") != WIND_GROUP_VERSION:
+        # Older group from a previous version: keep the interface, rebuild the nodes
+        node_group.nodes.clear()
+        build_wind_nodes(node_group)
+        _remove_time_drivers(node_group)
+    return node_group
+
+def add_wind_modifier(obj, node_group=None, phase=0.0):
+    """Add the wind modifier to obj, or point an existing one at the current group.
+
+    The group reads the scene clock itself, phase only offsets this object's time.
+    """
     # Ensure object is a Mesh
     if obj.type != 'MESH':
-        return
+        return None
 
     # Check if modifier exists
-    mod_name = "EZTree_Wind"
-    mod = obj.modifiers.get(mod_name)
+    mod = obj.modifiers.get(WIND_MODIFIER)
     if not mod:
-        mod = obj.modifiers.new(name=mod_name, type='NODES')
+        mod = obj.modifiers.new(name=WIND_MODIFIER, type='NODES')
     
     # Check if node group exists
-    group_name = "EZTree_Wind_NodeGroup"
-    node_group = bpy.data.node_groups.get(group_name)
-    if not node_group:
-        node_group = create_wind_node_group(group_name)
-    
-    mod.node_group = node_group
-    
-    # Set default input values if needed
-    # (Node group defaults handle this)
+    mod.node_group = node_group or get_wind_node_group()
+    remove_time_driver(obj, mod)
+    set_modifier_input(mod, "Time", phase)
+    return mod
 
 def create_wind_node_group(name):
     # Create new node group
@@ -33,11 +100,6 @@ def create_wind_node_group(name):
     # Cleaner way for 4.0+ interface vs 3.x... using explicit node creation for simplicity/compatibility
     # We will just use Group Input / Group Output nodes and configure them
     
-    input_node = ng.nodes.new('NodeGroupInput')
-    output_node = ng.nodes.new('NodeGroupOutput')
-    input_node.location = (-800, 0)
-    output_node.location = (800, 0)
-    
     # Setup Inputs (Blender 4.0+ uses interface items, 3.6 uses inputs.new)
     # Check version? Let's try flexible approach or assume 4.0? 
     # User didn't specify version. 3.6 LTS or 4.0 usually. 
@@ -67,73 +129,167 @@ def create_wind_node_group(name):
         ng.inputs.new('NodeSocketVector', 'Strength')
         ng.outputs.new('NodeSocketGeometry', 'Geometry')
     
-    # Defaults
-    # Setting defaults on the node group inputs is tricky via API across versions.
-    # We'll set them on the modifier usually.
+    build_wind_nodes(ng)
+    return ng
+
+def attribute_output(node):
+    # Before 4.0 Named Attribute has one output per data type, only one is enabled
+    for socket in node.outputs:
+        if socket.enabled and socket.name == "Attribute":
+            return socket
+    return node.outputs[0]
+
+def build_wind_nodes(ng):
+    # Hierarchical bending driven by the attributes the generator bakes per vertex:
+    # every vertex of a branch samples the noise at the branch pivot, so a branch
+    # sways as one piece, and the sway is weighted by flexibility (1 - stiffness)
+    # and distance along the branch. Trunks barely move, twigs move most.
+    # On top of its own sway a vertex carries the sway of every ancestor at the
+    # point its branch grows from (eztree_pivot_k / eztree_weight_k), so a child
+    # moves with its parent and the joints stay attached.
+    # Meshes without the attributes fall back to per-vertex noise.
+    input_node = ng.nodes.new('NodeGroupInput')
+    output_node = ng.nodes.new('NodeGroupOutput')
+    input_node.location = (-1400, 0)
+    output_node.location = (1000, 0)
     
-    # Create Nodes
+    links = ng.links
+    
+    def named_attribute(name, data_type, location):
+        node = ng.nodes.new('GeometryNodeInputNamedAttribute')
+        node.data_type = data_type
+        node.inputs['Name'].default_value = name
+        node.location = location
+        return node
+    
+    def math_node(operation, location, vector=False):
+        node = ng.nodes.new('ShaderNodeVectorMath' if vector else 'ShaderNodeMath')
+        node.operation = operation
+        node.location = location
+        return node
+    
+    def sway(sample, time, weight, location):
+        # (noise(sample / Scale, time) - 0.5) * Strength * weight
+        x, y = location
+        scaled = math_node('DIVIDE', (x, y), vector=True)
+        links.new(sample, scaled.inputs[0])
+        links.new(input_node.outputs[2], scaled.inputs[1])
+        
+        noise = ng.nodes.new('ShaderNodeTexNoise')
+        noise.noise_dimensions = '4D'
+        noise.location = (x + 200, y)
+        links.new(scaled.outputs['Vector'], noise.inputs['Vector'])
+        links.new(time, noise.inputs['W'])
+        
+        centered = math_node('SUBTRACT', (x + 400, y), vector=True)
+        centered.inputs[1].default_value = (0.5, 0.5, 0.5)
+        links.new(noise.outputs['Color'], centered.inputs[0])
+        
+        strength = math_node('MULTIPLY', (x + 600, y), vector=True)
+        links.new(centered.outputs['Vector'], strength.inputs[0])
+        links.new(input_node.outputs[3], strength.inputs[1])
+        
+        weighted = math_node('SCALE', (x + 800, y), vector=True)
+        links.new(strength.outputs['Vector'], weighted.inputs[0])
+        links.new(weight, weighted.inputs['Scale'])
+        return weighted.outputs['Vector']
     
     # Position
     pos_node = ng.nodes.new('GeometryNodeInputPosition')
-    pos_node.location = (-600, 200)
-    
-    # Vector Math: Scale Position (Pos / Scale)
-    vec_scale = ng.nodes.new('ShaderNodeVectorMath')
-    vec_scale.operation = 'DIVIDE'
-    vec_scale.location = (-400, 200)
+    pos_node.location = (-1200, 400)
     
-    # Noise Texture (4D)
-    noise = ng.nodes.new('ShaderNodeTexNoise')
-    noise.noise_dimensions = '4D'
-    noise.location = (-200, 200)
+    # Baked attributes
+    attr_pivot = named_attribute("eztree_pivot", 'FLOAT_VECTOR', (-1200, 250))
+    attr_level = named_attribute("eztree_level", 'FLOAT', (-1200, 50))
+    attr_along = named_attribute("eztree_along", 'FLOAT', (-1200, -150))
+    attr_stiff = named_attribute("eztree_stiffness", 'FLOAT', (-1200, -350))
     
-    # Vector Math: Subtract 0.5 (Center noise around 0)
-    vec_sub = ng.nodes.new('ShaderNodeVectorMath')
-    vec_sub.operation = 'SUBTRACT'
-    vec_sub.inputs[1].default_value = (0.5, 0.5, 0.5)
-    vec_sub.location = (0, 200)
+    # Noise sample point: the branch pivot, or the vertex itself without attributes
+    # sample = pos + exists * (pivot - pos)
+    pivot_delta = math_node('SUBTRACT', (-1000, 300), vector=True)
+    links.new(attribute_output(attr_pivot), pivot_delta.inputs[0])
+    links.new(pos_node.outputs['Position'], pivot_delta.inputs[1])
     
-    # Vector Math: Multiply by Strength
-    vec_mult = ng.nodes.new('ShaderNodeVectorMath')
-    vec_mult.operation = 'MULTIPLY'
-    vec_mult.location = (200, 200)
+    pivot_mask = math_node('SCALE', (-800, 300), vector=True)
+    links.new(pivot_delta.outputs['Vector'], pivot_mask.inputs[0])
     
-    # Set Position
-    set_pos = ng.nodes.new('GeometryNodeSetPosition')
-    set_pos.location = (400, 0)
+    sample_pos = math_node('ADD', (-600, 300), vector=True)
+    links.new(pos_node.outputs['Position'], sample_pos.inputs[0])
+    links.new(pivot_mask.outputs['Vector'], sample_pos.inputs[1])
     
-    # Linkage
-    links = ng.links
+    if 'Exists' in attr_pivot.outputs:
+        links.new(attr_pivot.outputs['Exists'], pivot_mask.inputs['Scale'])
+    else:
+        pivot_mask.inputs['Scale'].default_value = 1.0
     
-    # Input Geometry -> Set Pos Geometry
-    links.new(input_node.outputs[0], set_pos.inputs['Geometry'])
-    # Set Pos Geometry -> Output
-    links.new(set_pos.outputs['Geometry'], output_node.inputs[0])
+    # One clock for every tree: scene seconds follow the frame rate and need no
+    # drivers. The Time input is a per-object phase offset on top of it.
+    clock = math_node('ADD', (-600, 100))
+    links.new(input_node.outputs[1], clock.inputs[1])
+    try:
+        scene_time = ng.nodes.new('GeometryNodeInputSceneTime')
+        scene_time.location = (-800, 100)
+        links.new(scene_time.outputs['Seconds'], clock.inputs[0])
+    except RuntimeError:
+        # Scene Time arrived in Blender 3.1, before that Time has to be animated
+        clock.inputs[0].default_value = 0.0
     
-    # Input Time -> Noise W
-    # Input node outputs index depends on creation order. 0=Geo, 1=Time, 2=Scale, 3=Strength
-    links.new(input_node.outputs[1], noise.inputs['W'])
+    # Offset the time per level so limbs and twigs are out of phase
+    phase = math_node('MULTIPLY_ADD', (-400, 100))
+    links.new(attribute_output(attr_level), phase.inputs[0])
+    phase.inputs[1].default_value = 0.37
+    links.new(clock.outputs['Value'], phase.inputs[2])
     
-    # Input Scale -> Vec Scale (Divide by Scale)
-    # Position -> Vec Scale [0]
-    links.new(pos_node.outputs['Position'], vec_scale.inputs[0])
-    # Scale -> Vec Scale [1] (Wait, Vector Divide by Float? No, Vector Math Divide expects Vector.
-    # Need to verify if Vector Math accepts Float connection to Vector input (implicit conversion). Yes usually.)
-    links.new(input_node.outputs[2], vec_scale.inputs[1])
+    # Bend weight = (1 - stiffness) * along, zero where the branch leaves its parent
+    flex = math_node('SUBTRACT', (-1000, -300))
+    flex.inputs[0].default_value = 1.0
+    links.new(attribute_output(attr_stiff), flex.inputs[1])
     
-    # Vec Scale -> Noise Vector
-    links.new(vec_scale.outputs['Vector'], noise.inputs['Vector'])
+    weight = math_node('MULTIPLY', (-800, -200))
+    links.new(flex.outputs['Value'], weight.inputs[0])
+    links.new(attribute_output(attr_along), weight.inputs[1])
     
-    # Noise Color -> Vec Sub
-    links.new(noise.outputs['Color'], vec_sub.inputs[0])
+    if 'Exists' in attr_stiff.outputs:
+        # Without attributes the weight is 1: exists * (weight - 1) + 1
+        weight_minus_one = math_node('SUBTRACT', (-600, -200))
+        links.new(weight.outputs['Value'], weight_minus_one.inputs[0])
+        weight_minus_one.inputs[1].default_value = 1.0
+        
+        masked_weight = math_node('MULTIPLY_ADD', (-400, -200))
+        links.new(attr_stiff.outputs['Exists'], masked_weight.inputs[0])
+        links.new(weight_minus_one.outputs['Value'], masked_weight.inputs[1])
+        masked_weight.inputs[2].default_value = 1.0
+        weight = masked_weight
     
-    # Vec Sub -> Vec Mult
-    links.new(vec_sub.outputs['Vector'], vec_mult.inputs[0])
+    offset = sway(sample_pos.outputs['Vector'], phase.outputs['Value'],
+                  weight.outputs['Value'], (-200, 300))
     
-    # Input Strength -> Vec Mult [1]
-    links.new(input_node.outputs[3], vec_mult.inputs[1])
+    # Ancestor sway: the level k ancestor samples at its own pivot with the
+    # level k phase, exactly as its own vertices do. Missing attributes read
+    # as zero weight and add nothing.
+    for k in range(CHAIN_LEVELS):
+        y = -600 - 300 * k
+        ancestor_pivot = named_attribute(f"eztree_pivot_{k}", 'FLOAT_VECTOR', (-1200, y))
+        ancestor_weight = named_attribute(f"eztree_weight_{k}", 'FLOAT', (-1200, y - 150))
+        
+        ancestor_phase = math_node('ADD', (-400, y))
+        links.new(clock.outputs['Value'], ancestor_phase.inputs[0])
+        ancestor_phase.inputs[1].default_value = 0.37 * k
+        
+        ancestor_sway = sway(attribute_output(ancestor_pivot), ancestor_phase.outputs['Value'],
+                             attribute_output(ancestor_weight), (-200, y))
+        
+        total = math_node('ADD', (700, y), vector=True)
+        links.new(offset, total.inputs[0])
+        links.new(ancestor_sway, total.inputs[1])
+        offset = total.outputs['Vector']
     
-    # Vec Mult -> Set Pos Offset
-    links.new(vec_mult.outputs['Vector'], set_pos.inputs['Offset'])
+    # Set Position
+    set_pos = ng.nodes.new('GeometryNodeSetPosition')
+    set_pos.location = (800, 0)
+    links.new(input_node.outputs[0], set_pos.inputs['Geometry'])
+    links.new(offset, set_pos.inputs['Offset'])
+    links.new(set_pos.outputs['Geometry'], output_node.inputs[0])
     
+    ng["eztree_version"] = WIND_GROUP_VERSION
     return ng
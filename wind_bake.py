@@ -0,0 +1,353 @@
+import bpy
+import math
+import os
+import struct
+import zlib
+from array import array
+from .wind import WIND_MODIFIER, new_socket, set_modifier_input, get_modifier_input
+
+VAT_MODIFIER = "EZTree_WindVAT"
+CACHE_MODIFIER = "EZTree_WindCache"
+VAT_GROUP_NAME = "EZTree_VAT_NodeGroup"
+# Widest texture we write, longer vertex lists wrap onto several rows per frame
+VAT_MAX_WIDTH = 4096
+QUANT_MAX = 65535
+
+
+def bake_directory():
+    # Next to the .blend when it is saved, so the bakes travel with the file
+    if bpy.data.filepath:
+        return bpy.path.abspath("//eztree_bake")
+    return os.path.join(bpy.app.tempdir, "eztree_bake")
+
+
+def sample_wind(context, obj, frame_start, frame_end):
+    """Evaluate obj for every frame in the range.
+
+    Returns the rest positions and one flat xyz array per frame.
+    """
+    scene = context.scene
+    n = len(obj.data.vertices)
+    rest = array('f', [0.0]) * (n * 3)
+    obj.data.vertices.foreach_get("co", rest)
+
+    # Sample the live wind, not a previous bake
+    toggled = []
+    for mod in obj.modifiers:
+        live = mod.name == WIND_MODIFIER
+        if mod.name in {WIND_MODIFIER, VAT_MODIFIER, CACHE_MODIFIER} and mod.show_viewport != live:
+            toggled.append(mod)
+            mod.show_viewport = live
+
+    frames = []
+    current = scene.frame_current
+    try:
+        for frame in range(frame_start, frame_end + 1):
+            scene.frame_set(frame)
+            depsgraph = context.evaluated_depsgraph_get()
+            eval_obj = obj.evaluated_get(depsgraph)
+            mesh = eval_obj.to_mesh()
+            try:
+                if len(mesh.vertices) != n:
+                    raise ValueError(f"{obj.name}: modifiers change the vertex count, cannot bake")
+                co = array('f', [0.0]) * (n * 3)
+                mesh.vertices.foreach_get("co", co)
+                frames.append(co)
+            finally:
+                eval_obj.to_mesh_clear()
+    finally:
+        for mod in toggled:
+            mod.show_viewport = not mod.show_viewport
+        scene.frame_set(current)
+
+    return rest, frames
+
+
+def sample_loop(context, obj, frame_start, frame_end, blend):
+    """Sample the range as a seamless loop.
+
+    The wind is not periodic over an arbitrary range, so the last frame
+    would jump back to the first. Sample `blend` frames past the end and
+    cross-fade them into the first ones: the loop then starts where the
+    wind would have gone next and eases back into the sampled motion.
+    """
+    blend = max(0, min(blend, frame_end - frame_start))
+    rest, frames = sample_wind(context, obj, frame_start, frame_end + blend)
+    count = len(frames) - blend
+    for i in range(blend):
+        w = (i + 1) / (blend + 1)
+        head, tail = frames[i], frames[count + i]
+        for j in range(len(head)):
+            head[j] = (1.0 - w) * tail[j] + w * head[j]
+    return rest, frames[:count]
+
+
+def bake_groups(objects):
+    """Group objects that move identically, {file name: [objects]}.
+
+    One mesh with the same wind inputs (phase, scale, strength) gives the
+    same motion, objects with their own phase need a bake of their own.
+    """
+    groups = {}
+    for obj in objects:
+        mod = obj.modifiers.get(WIND_MODIFIER)
+        inputs = tuple(get_modifier_input(mod, name) for name in ("Time", "Scale", "Strength"))
+        groups.setdefault((obj.data.name, inputs), []).append(obj)
+
+    named = {}
+    for (mesh_name, _inputs), group in groups.items():
+        name = bpy.path.clean_name(mesh_name)
+        if name in named:
+            # Same mesh, other phase
+            name = f"{name}_{bpy.path.clean_name(group[0].name)}"
+        named[name] = group
+    return named
+
+
+def disable_live_wind(obj):
+    mod = obj.modifiers.get(WIND_MODIFIER)
+    if mod:
+        mod.show_viewport = False
+        mod.show_render = False
+
+
+# --- Point cache ---
+
+def write_pc2(filepath, frames, frame_start):
+    n = len(frames[0]) // 3 if frames else 0
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    with open(filepath, 'wb') as f:
+        # POINTCACHE2 header: signature, version, points, start frame, sample rate, samples
+        f.write(struct.pack('<12siiffi', b'POINTCACHE2\0', 1, n, float(frame_start), 1.0, len(frames)))
+        for co in frames:
+            co.tofile(f)
+
+
+def bake_point_cache(context, name, objects, frame_start, frame_end, blend=0):
+    """Bake objects moving alike (see bake_groups) into a single .pc2 file they all read."""
+    obj = objects[0]
+    rest, frames = sample_loop(context, obj, frame_start, frame_end, blend)
+    filepath = os.path.join(bake_directory(), f"{name}.pc2")
+    write_pc2(filepath, frames, frame_start)
+
+    for target in objects:
+        mod = target.modifiers.get(CACHE_MODIFIER)
+        if not mod:
+            mod = target.modifiers.new(name=CACHE_MODIFIER, type='MESH_CACHE')
+        mod.cache_format = 'PC2'
+        mod.filepath = bpy.path.relpath(filepath) if bpy.data.filepath else filepath
+        mod.frame_start = frame_start
+        mod.deform_mode = 'OVERWRITE'
+        disable_live_wind(target)
+    return filepath
+
+
+# --- Vertex animation texture ---
+
+def write_png16(filepath, width, height, values):
+    """Write 16-bit RGB values (row-major, bottom row first) as a PNG."""
+    def chunk(tag, data):
+        return (struct.pack('>I', len(data)) + tag + data
+                + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff))
+
+    row_len = width * 3
+    raw = bytearray()
+    # PNG stores the top row first, Blender images start at the bottom
+    for y in reversed(range(height)):
+        raw.append(0)  # filter: none
+        row = values[y * row_len:(y + 1) * row_len]
+        raw += struct.pack(f'>{row_len}H', *row)
+
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    with open(filepath, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 16, 2, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(bytes(raw), 6)))
+        f.write(chunk(b'IEND', b''))
+
+
+def quantize_offsets(rest, frames):
+    """Quantize per-frame offsets from rest to 16 bits.
+
+    Returns (values, offset_min, offset_range) where values holds one xyz
+    triple per vertex per frame.
+    """
+    mins = [math.inf] * 3
+    maxs = [-math.inf] * 3
+    for co in frames:
+        for axis in range(3):
+            for k in range(axis, len(co), 3):
+                d = co[k] - rest[k]
+                if d < mins[axis]:
+                    mins[axis] = d
+                if d > maxs[axis]:
+                    maxs[axis] = d
+
+    ranges = [max(hi - lo, 1e-8) if lo <= hi else 1e-8 for lo, hi in zip(mins, maxs)]
+    mins = [lo if lo != math.inf else 0.0 for lo in mins]
+
+    values = array('H')
+    for co in frames:
+        for k in range(len(co)):
+            axis = k % 3
+            q = (co[k] - rest[k] - mins[axis]) / ranges[axis]
+            values.append(max(0, min(QUANT_MAX, int(q * QUANT_MAX + 0.5))))
+    return values, mins, ranges
+
+
+def _vat_layout(n_verts, n_frames):
+    width = max(1, min(n_verts, VAT_MAX_WIDTH))
+    rows = max(1, math.ceil(n_verts / width))
+    return width, rows, rows * n_frames
+
+
+def write_vat(filepath, values, n_verts, n_frames):
+    width, rows, height = _vat_layout(n_verts, n_frames)
+    padded = array('H', [0]) * (width * height * 3)
+    frame_len = n_verts * 3
+    for frame in range(n_frames):
+        start = frame * rows * width * 3
+        padded[start:start + frame_len] = values[frame * frame_len:(frame + 1) * frame_len]
+    write_png16(filepath, width, height, padded)
+    return width, rows, height
+
+
+def get_vat_node_group():
+    ng = bpy.data.node_groups.get(VAT_GROUP_NAME)
+    if ng:
+        return ng
+
+    ng = bpy.data.node_groups.new(name=VAT_GROUP_NAME, type='GeometryNodeTree')
+    new_socket(ng, "Geometry", 'INPUT', 'NodeSocketGeometry')
+    new_socket(ng, "Texture", 'INPUT', 'NodeSocketImage')
+    new_socket(ng, "Offset Min", 'INPUT', 'NodeSocketVector')
+    new_socket(ng, "Offset Range", 'INPUT', 'NodeSocketVector')
+    new_socket(ng, "Width", 'INPUT', 'NodeSocketFloat')
+    new_socket(ng, "Rows", 'INPUT', 'NodeSocketFloat')
+    new_socket(ng, "Frames", 'INPUT', 'NodeSocketFloat')
+    new_socket(ng, "Start Frame", 'INPUT', 'NodeSocketFloat')
+    new_socket(ng, "Geometry", 'OUTPUT', 'NodeSocketGeometry')
+
+    nodes = ng.nodes
+    links = ng.links
+
+    def math_node(operation, location, vector=False):
+        node = nodes.new('ShaderNodeVectorMath' if vector else 'ShaderNodeMath')
+        node.operation = operation
+        node.location = location
+        return node
+
+    group_in = nodes.new('NodeGroupInput')
+    group_in.location = (-1400, 0)
+    group_out = nodes.new('NodeGroupOutput')
+    # 0 Geometry, 1 Texture, 2 Offset Min, 3 Offset Range, 4 Width, 5 Rows, 6 Frames, 7 Start Frame
+    inp = group_in.outputs
+
+    index = nodes.new('GeometryNodeInputIndex')
+    index.location = (-1200, 300)
+    scene_time = nodes.new('GeometryNodeInputSceneTime')
+    scene_time.location = (-1200, -200)
+
+    # Looping frame index: floor(wrap(frame - start, frames, 0))
+    rel_frame = math_node('SUBTRACT', (-1000, -200))
+    links.new(scene_time.outputs['Frame'], rel_frame.inputs[0])
+    links.new(inp[7], rel_frame.inputs[1])
+    wrapped = math_node('WRAP', (-800, -200))
+    links.new(rel_frame.outputs['Value'], wrapped.inputs[0])
+    links.new(inp[6], wrapped.inputs[1])
+    wrapped.inputs[2].default_value = 0.0
+    frame_idx = math_node('FLOOR', (-600, -200))
+    links.new(wrapped.outputs['Value'], frame_idx.inputs[0])
+
+    # Pixel of this vertex: x = index % width, y = frame * rows + index // width
+    px = math_node('MODULO', (-1000, 300))
+    links.new(index.outputs['Index'], px.inputs[0])
+    links.new(inp[4], px.inputs[1])
+    row_div = math_node('DIVIDE', (-1000, 100))
+    links.new(index.outputs['Index'], row_div.inputs[0])
+    links.new(inp[4], row_div.inputs[1])
+    row = math_node('FLOOR', (-800, 100))
+    links.new(row_div.outputs['Value'], row.inputs[0])
+    py = math_node('MULTIPLY_ADD', (-400, 0))
+    links.new(frame_idx.outputs['Value'], py.inputs[0])
+    links.new(inp[5], py.inputs[1])
+    links.new(row.outputs['Value'], py.inputs[2])
+
+    # Texel centers in 0..1
+    height = math_node('MULTIPLY', (-600, -400))
+    links.new(inp[5], height.inputs[0])
+    links.new(inp[6], height.inputs[1])
+
+    u_center = math_node('ADD', (-800, 300))
+    links.new(px.outputs['Value'], u_center.inputs[0])
+    u_center.inputs[1].default_value = 0.5
+    u = math_node('DIVIDE', (-600, 300))
+    links.new(u_center.outputs['Value'], u.inputs[0])
+    links.new(inp[4], u.inputs[1])
+
+    v_center = math_node('ADD', (-200, 0))
+    links.new(py.outputs['Value'], v_center.inputs[0])
+    v_center.inputs[1].default_value = 0.5
+    v = math_node('DIVIDE', (0, 0))
+    links.new(v_center.outputs['Value'], v.inputs[0])
+    links.new(height.outputs['Value'], v.inputs[1])
+
+    uv = nodes.new('ShaderNodeCombineXYZ')
+    uv.location = (200, 200)
+    links.new(u.outputs['Value'], uv.inputs['X'])
+    links.new(v.outputs['Value'], uv.inputs['Y'])
+
+    tex = nodes.new('GeometryNodeImageTexture')
+    tex.location = (400, 300)
+    tex.interpolation = 'Closest'
+    tex.extension = 'EXTEND'
+    links.new(inp[1], tex.inputs['Image'])
+    links.new(uv.outputs['Vector'], tex.inputs['Vector'])
+
+    # offset = min + color * range
+    scaled = math_node('MULTIPLY', (600, 300), vector=True)
+    links.new(tex.outputs['Color'], scaled.inputs[0])
+    links.new(inp[3], scaled.inputs[1])
+    offset = math_node('ADD', (800, 300), vector=True)
+    links.new(scaled.outputs['Vector'], offset.inputs[0])
+    links.new(inp[2], offset.inputs[1])
+
+    set_pos = nodes.new('GeometryNodeSetPosition')
+    set_pos.location = (1000, 0)
+    links.new(inp[0], set_pos.inputs['Geometry'])
+    links.new(offset.outputs['Vector'], set_pos.inputs['Offset'])
+    group_out.location = (1200, 0)
+    links.new(set_pos.outputs['Geometry'], group_out.inputs[0])
+
+    return ng
+
+
+def bake_vat(context, name, objects, frame_start, frame_end, blend=0):
+    """Bake objects moving alike (see bake_groups) into a single 16-bit vertex animation texture."""
+    obj = objects[0]
+    rest, frames = sample_loop(context, obj, frame_start, frame_end, blend)
+    n_verts = len(rest) // 3
+    values, mins, ranges = quantize_offsets(rest, frames)
+
+    filepath = os.path.join(bake_directory(), f"{name}_vat.png")
+    width, rows, _height = write_vat(filepath, values, n_verts, len(frames))
+
+    image = bpy.data.images.load(filepath, check_existing=True)
+    image.reload()
+    image.colorspace_settings.name = 'Non-Color'
+
+    node_group = get_vat_node_group()
+    for target in objects:
+        mod = target.modifiers.get(VAT_MODIFIER)
+        if not mod:
+            mod = target.modifiers.new(name=VAT_MODIFIER, type='NODES')
+        mod.node_group = node_group
+        set_modifier_input(mod, "Texture", image)
+        set_modifier_input(mod, "Offset Min", mins)
+        set_modifier_input(mod, "Offset Range", ranges)
+        set_modifier_input(mod, "Width", float(width))
+        set_modifier_input(mod, "Rows", float(rows))
+        set_modifier_input(mod, "Frames", float(len(frames)))
+        set_modifier_input(mod, "Start Frame", float(frame_start))
+        disable_live_wind(target)
+    return filepath